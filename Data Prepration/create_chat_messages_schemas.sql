@@ -19,7 +19,7 @@ CREATE TABLE chat_messages (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX idx_chat_messages_thread_id ON chat_messages(thread_id)
+CREATE INDEX idx_chat_messages_thread_id ON chat_messages(thread_id);
 
 -- SQL script to update chat_messages table with new columns for ChatGPT-like features
 
@@ -42,3 +42,54 @@ CREATE INDEX IF NOT EXISTS idx_chat_messages_message_type ON chat_messages(messa
 -- Add comment to explain the purpose of these columns
 COMMENT ON COLUMN chat_messages.message_type IS 'Type of message (text, code, error, suggestion, greeting, etc.)';
 COMMENT ON COLUMN chat_messages.metadata IS 'Additional metadata for the message in JSON format';
+
+-- Shared application cache used when CACHE_BACKEND=postgres (also created on startup)
+-- UNLOGGED skips the write-ahead log: writes are cheap and the content is dropped after a crash
+-- Entries are only served while the user and scope generations they were computed at are current
+CREATE UNLOGGED TABLE IF NOT EXISTS app_cache (
+    namespace VARCHAR(50) NOT NULL,
+    cache_key CHAR(32) NOT NULL,
+    user_id VARCHAR(50) NOT NULL,
+    scope VARCHAR(300) NOT NULL,
+    value JSONB NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    user_generation BIGINT NOT NULL DEFAULT 0,
+    scope_generation BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, cache_key)
+);
+
+ALTER TABLE app_cache
+    ADD COLUMN IF NOT EXISTS user_generation BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS scope_generation BIGINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_app_cache_expires_at ON app_cache (expires_at);
+-- Invalidation bumps generations instead of deleting a user's entries, so this index is no longer read
+DROP INDEX IF EXISTS idx_app_cache_user_scope;
+
+-- Generation of every invalidated user (scope '') and (user, scope) pair, taken from a sequence so it never repeats
+CREATE UNLOGGED TABLE IF NOT EXISTS app_cache_generations (
+    namespace VARCHAR(50) NOT NULL,
+    user_id VARCHAR(50) NOT NULL,
+    scope VARCHAR(300) NOT NULL,
+    generation BIGINT NOT NULL,
+    bumped_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (namespace, user_id, scope)
+);
+
+CREATE INDEX IF NOT EXISTS idx_app_cache_generations_bumped_at ON app_cache_generations (bumped_at);
+CREATE SEQUENCE IF NOT EXISTS app_cache_generation_seq;
+
+-- Keyset pagination of chat history: WHERE thread_id = ? AND message_id < ? ORDER BY message_id
+-- is a single range scan on this index (it also serves the per-thread COUNT(*) as an index-only scan)
+CREATE INDEX IF NOT EXISTS idx_chat_messages_thread_message ON chat_messages (thread_id, message_id);
+
+-- The composite index covers every lookup of the single-column index it replaces
+DROP INDEX IF EXISTS idx_chat_messages_thread_id;
+
+-- Covering index for the chats list: WHERE user_id = ? ORDER BY last_updated_at DESC, thread_id DESC
+-- with a (last_updated_at, thread_id) keyset cursor is an index-only range scan
+CREATE INDEX IF NOT EXISTS idx_chat_threads_user_updated
+    ON chat_threads (user_id, last_updated_at DESC, thread_id DESC) INCLUDE (chat_name);
+
+-- The covering index serves every lookup of the single-column user_id index
+DROP INDEX IF EXISTS idx_chat_threads_user_id;
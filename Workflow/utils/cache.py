@@ -0,0 +1,287 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+# Marker for cache misses, so None can be cached as a value
+MISSING = object()
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Roughly estimate the memory held by a value, in bytes.
+
+    Containers are walked recursively (to a bounded depth), which is enough to
+    account for SQL result sets (lists of tuples) and formatted strings.
+
+    Args:
+        value: The value to measure.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _depth + 1) for item in value)
+    return size
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and a byte budget.
+
+    Entries are evicted least-recently-used first whenever the cache holds more
+    than `max_entries` entries or `max_bytes` estimated bytes. Expired entries
+    are dropped on read, and `sweep` removes them incrementally so maintenance
+    never has to scan the whole cache at once.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 300):
+        """
+        Args:
+            max_entries: Maximum number of entries.
+            max_bytes: Maximum estimated size of all values, in bytes.
+            default_ttl: Seconds an entry stays valid unless another TTL is given.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0, "rejected": 0}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, MISSING, count=False) is not MISSING
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        """
+        Return the value for a key if present and not expired.
+
+        Args:
+            key: Cache key.
+            default: Value returned on a miss.
+            count: Whether to record the lookup in the hit/miss counters.
+
+        Returns:
+            The cached value or `default`.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] <= time.time():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+
+            if entry is None:
+                if count:
+                    self._stats["misses"] += 1
+                return default
+
+            self._data.move_to_end(key)
+            if count:
+                self._stats["hits"] += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store a value, evicting least recently used entries to stay within budget.
+
+        Args:
+            key: Cache key.
+            value: Value to cache.
+            ttl: Seconds the entry stays valid (defaults to `default_ttl`).
+
+        Returns:
+            bool: False if the value alone exceeds the byte budget and was not cached.
+        """
+        size = estimate_size(value)
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+            if size > self.max_bytes:
+                self._stats["rejected"] += 1
+                return False
+
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            self._stats["sets"] += 1
+
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+            return True
+
+    def delete(self, key: Hashable) -> bool:
+        """
+        Remove a key.
+
+        Returns:
+            bool: True if the key was present.
+        """
+        with self._lock:
+            if key not in self._data:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def sweep(self, max_items: int = 500) -> int:
+        """
+        Remove expired entries, examining at most `max_items` of the oldest entries.
+
+        Entries are kept in least-recently-used order, so the oldest entries are
+        the most likely to have expired; each call does bounded work.
+
+        Args:
+            max_items: Maximum number of entries to examine.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        now = time.time()
+        removed = 0
+        with self._lock:
+            keys = [key for _, key in zip(range(max_items), self._data)]
+            for key in keys:
+                if self._data[key][1] <= now:
+                    self._remove(key)
+                    removed += 1
+            self._stats["expirations"] += removed
+        return removed
+
+    def stats(self) -> dict:
+        """Return size, memory and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                **self._stats,
+            }
+
+
+class ScopedCache:
+    """
+    Cache keyed by user, scope and parameters, with O(1) invalidation.
+
+    Every user and every (user, scope) pair carries a generation number that is
+    part of the cache key. Invalidating a scope (or a whole user) bumps its
+    generation, so older entries can no longer be reached and simply age out of
+    the underlying LRU; no scan over the cached keys is needed.
+    """
+
+    def __init__(self, store: TTLCache):
+        """
+        Args:
+            store: The LRU/TTL cache holding the entries.
+        """
+        self.store = store
+
+        # (user_id, scope) -> (generation, bumped_at), ordered by bump time
+        self._generations: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _generation(self, user_id: str, scope: str) -> int:
+        entry = self._generations.get((str(user_id), scope))
+        return entry[0] if entry else 0
+
+    def key(self, user_id: str, scope: str, params: Optional[dict] = None) -> Tuple:
+        """
+        Build the cache key for a user's scope and parameters at the current generation.
+
+        Args:
+            user_id: Owner of the cached data.
+            scope: Cached resource, e.g. "chats" or "chat:<thread_id>".
+            params: Request parameters distinguishing entries within the scope.
+
+        Returns:
+            Tuple: The cache key.
+        """
+        with self._lock:
+            user_generation = self._generation(user_id, "")
+            scope_generation = self._generation(user_id, scope)
+        frozen_params = tuple(sorted((params or {}).items()))
+        return (str(user_id), user_generation, scope, scope_generation, frozen_params)
+
+    def get(self, key: Tuple, default: Any = None) -> Any:
+        """Return the value for a key built by `key`, or `default`."""
+        return self.store.get(key, default)
+
+    def set(self, key: Tuple, value: Any) -> bool:
+        """Store a value under a key built by `key`, with the store's default TTL."""
+        return self.store.set(key, value)
+
+    def invalidate(self, user_id: str, scope: str = "") -> None:
+        """
+        Invalidate all entries of a user's scope, or all of the user's entries if no scope is given.
+
+        Args:
+            user_id: Owner of the cached data.
+            scope: Scope to invalidate; empty for every scope of the user.
+        """
+        with self._lock:
+            self._counter += 1
+            key = (str(user_id), scope)
+            self._generations[key] = (self._counter, time.time())
+            self._generations.move_to_end(key)
+
+    def sweep(self, max_items: int = 500) -> int:
+        """
+        Expire cache entries and forget generations older than the longest entry TTL.
+
+        A generation can be forgotten once every entry written before it was
+        bumped has expired, because no reachable entry can refer to it anymore.
+
+        Args:
+            max_items: Maximum number of entries and generations to examine.
+
+        Returns:
+            int: Number of cache entries and generations removed.
+        """
+        removed = self.store.sweep(max_items)
+        cutoff = time.time() - self.store.default_ttl
+        with self._lock:
+            for _ in range(max_items):
+                if not self._generations:
+                    break
+                key, (_, bumped_at) = next(iter(self._generations.items()))
+                if bumped_at > cutoff:
+                    break
+                del self._generations[key]
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        """Return the underlying cache counters and the number of tracked generations."""
+        with self._lock:
+            generations = len(self._generations)
+        return {**self.store.stats(), "generations": generations}
@@ -0,0 +1,380 @@
+import asyncio
+import datetime
+import decimal
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from typing import Any, Coroutine, Dict, Optional, Tuple
+
+from Workflow.utils.cache import MISSING, ScopedCache, TTLCache
+from Workflow.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+CACHE_TABLE = "app_cache"
+GENERATIONS_TABLE = "app_cache_generations"
+GENERATION_SEQUENCE = "app_cache_generation_seq"
+
+CREATE_CACHE_TABLE_SQL = f"""
+CREATE UNLOGGED TABLE IF NOT EXISTS {CACHE_TABLE} (
+    namespace VARCHAR(50) NOT NULL,
+    cache_key CHAR(32) NOT NULL,
+    user_id VARCHAR(50) NOT NULL,
+    scope VARCHAR(300) NOT NULL,
+    value JSONB NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    user_generation BIGINT NOT NULL DEFAULT 0,
+    scope_generation BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, cache_key)
+);
+ALTER TABLE {CACHE_TABLE}
+    ADD COLUMN IF NOT EXISTS user_generation BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS scope_generation BIGINT NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_{CACHE_TABLE}_expires_at ON {CACHE_TABLE} (expires_at);
+-- Invalidation bumps generations instead of deleting a user's entries, so this index is no longer read
+DROP INDEX IF EXISTS idx_{CACHE_TABLE}_user_scope;
+
+CREATE UNLOGGED TABLE IF NOT EXISTS {GENERATIONS_TABLE} (
+    namespace VARCHAR(50) NOT NULL,
+    user_id VARCHAR(50) NOT NULL,
+    scope VARCHAR(300) NOT NULL,
+    generation BIGINT NOT NULL,
+    bumped_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (namespace, user_id, scope)
+);
+CREATE INDEX IF NOT EXISTS idx_{GENERATIONS_TABLE}_bumped_at ON {GENERATIONS_TABLE} (bumped_at);
+CREATE SEQUENCE IF NOT EXISTS {GENERATION_SEQUENCE};
+"""
+
+# Current (user, scope) generations of an entry; %(namespace)s, %(user_id)s and %(scope)s are bound by the caller
+CURRENT_GENERATIONS_SQL = f"""
+    SELECT
+        COALESCE((SELECT generation FROM {GENERATIONS_TABLE}
+                  WHERE namespace = %(namespace)s AND user_id = %(user_id)s AND scope = ''), 0) AS user_generation,
+        COALESCE((SELECT generation FROM {GENERATIONS_TABLE}
+                  WHERE namespace = %(namespace)s AND user_id = %(user_id)s AND scope = %(scope)s), 0) AS scope_generation
+"""
+
+def _json_default(value: Any) -> Any:
+    """Serialize values returned by the databases the way `str()` renders them."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time, decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _params_key(user_id: str, scope: str, params: Optional[dict]) -> str:
+    raw = json.dumps([str(user_id), scope, params or {}], sort_keys=True, default=str)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+class CacheBackend:
+    """
+    Interface of the application caches.
+
+    Entries are grouped by namespace (e.g. "api" for chat lists and history,
+    "sql" for query results) and addressed by the owning user, a scope within
+    that user's data and the request parameters. A scope, or all of a user's
+    scopes, can be invalidated at once.
+
+    `get` also returns the version of the cache state it observed; passing it
+    to `set` stores the value computed after a miss under that state, so a
+    write that races with an invalidation of its scope is never served
+    afterwards.
+    """
+
+    async def setup(self) -> None:
+        """Prepare the backend (e.g. create tables). Called once on startup."""
+
+    async def get(self, namespace: str, user_id: str, scope: str, params: Optional[dict] = None) -> Tuple[Any, Any]:
+        """Return the cached value, or None on a miss, and the observed version to pass to `set`."""
+        raise NotImplementedError
+
+    async def set(
+        self, namespace: str, user_id: str, scope: str, params: Optional[dict], value: Any, version: Any = None
+    ) -> None:
+        """Store a value with the namespace's TTL, under `version` if given and the current state otherwise."""
+        raise NotImplementedError
+
+    async def invalidate(self, namespace: str, user_id: str, scope: str = "") -> None:
+        """Invalidate one scope of a user, or all of the user's scopes if no scope is given."""
+        raise NotImplementedError
+
+    async def sweep(self, max_items: int = 500) -> int:
+        """Remove up to `max_items` expired entries and return how many were removed."""
+        raise NotImplementedError
+
+    async def stats(self) -> dict:
+        """Return backend counters."""
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Per-process backend: one ScopedCache per namespace."""
+
+    def __init__(self, ttl: float = 300, max_entries: int = 10000, max_bytes: int = 128 * 1024 * 1024):
+        """
+        Args:
+            ttl: Seconds an entry stays valid.
+            max_entries: Maximum number of entries per namespace.
+            max_bytes: Maximum estimated size of the values per namespace, in bytes.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._namespaces: Dict[str, ScopedCache] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: str) -> ScopedCache:
+        with self._lock:
+            if namespace not in self._namespaces:
+                self._namespaces[namespace] = ScopedCache(
+                    TTLCache(max_entries=self.max_entries, max_bytes=self.max_bytes, default_ttl=self.ttl)
+                )
+            return self._namespaces[namespace]
+
+    async def get(self, namespace, user_id, scope, params=None):
+        cache = self._namespace(namespace)
+        key = cache.key(user_id, scope, params)
+        value = cache.get(key, MISSING)
+        # The key embeds the generations it was built at, so it is the version
+        return (None if value is MISSING else value), key
+
+    async def set(self, namespace, user_id, scope, params, value, version=None):
+        cache = self._namespace(namespace)
+        cache.set(version or cache.key(user_id, scope, params), value)
+
+    async def invalidate(self, namespace, user_id, scope=""):
+        self._namespace(namespace).invalidate(user_id, scope)
+
+    async def sweep(self, max_items=500):
+        with self._lock:
+            caches = list(self._namespaces.values())
+        return sum(cache.sweep(max_items) for cache in caches)
+
+    async def stats(self):
+        with self._lock:
+            caches = dict(self._namespaces)
+        return {"backend": "memory", **{namespace: cache.stats() for namespace, cache in caches.items()}}
+
+
+class PostgresCacheBackend(CacheBackend):
+    """
+    Backend shared by all workers, stored in an unlogged Postgres table.
+
+    Unlogged tables skip the write-ahead log, which makes writes cheap; their
+    content is lost after a crash, which is fine for a cache. As in ScopedCache,
+    every user and (user, scope) pair has a generation, stored in its own table
+    and taken from a sequence so it never repeats. Entries record the
+    generations they were computed at and are only served while those are
+    current; invalidation bumps a generation, so every worker sees it on its
+    next read and older entries age out through `sweep`.
+    """
+
+    def __init__(self, pool, ttl: float = 300):
+        """
+        Args:
+            pool: The async Postgres connection pool.
+            ttl: Seconds an entry stays valid.
+        """
+        self.pool = pool
+        self.ttl = ttl
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "stale_sets": 0, "invalidations": 0, "errors": 0}
+
+    async def setup(self):
+        async with self.pool.connection() as conn:
+            await conn.execute(CREATE_CACHE_TABLE_SQL)
+            await conn.commit()
+
+    async def get(self, namespace, user_id, scope, params=None):
+        cache_key = _params_key(user_id, scope, params)
+        try:
+            with span("postgres", "cache_get"):
+                async with self.pool.connection() as conn:
+                    # The generations and the entry are read in one round trip
+                    cur = await conn.execute(
+                        f"""
+                        SELECT g.user_generation, g.scope_generation, c.value
+                        FROM ({CURRENT_GENERATIONS_SQL}) g
+                        LEFT JOIN {CACHE_TABLE} c
+                            ON c.namespace = %(namespace)s AND c.cache_key = %(cache_key)s AND c.expires_at > now()
+                            AND c.user_generation = g.user_generation AND c.scope_generation = g.scope_generation
+                        """,
+                        {"namespace": namespace, "user_id": str(user_id), "scope": scope, "cache_key": cache_key}
+                    )
+                    user_generation, scope_generation, value = await cur.fetchone()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"Shared cache read failed: {e}")
+            return None, None
+
+        self._stats["misses" if value is None else "hits"] += 1
+        return value, (user_generation, scope_generation)
+
+    async def set(self, namespace, user_id, scope, params, value, version=None):
+        cache_key = _params_key(user_id, scope, params)
+        # Without an observed version, the value is stored at the current generations
+        user_generation, scope_generation = version or (None, None)
+
+        try:
+            payload = json.dumps(value, default=_json_default)
+            with span("postgres", "cache_set"):
+                async with self.pool.connection() as conn:
+                    # A write never replaces an entry computed at newer generations
+                    cur = await conn.execute(
+                        f"""
+                        INSERT INTO {CACHE_TABLE}
+                            (namespace, cache_key, user_id, scope, value, expires_at, user_generation, scope_generation)
+                        SELECT %(namespace)s, %(cache_key)s, %(user_id)s, %(scope)s, %(value)s::jsonb,
+                               now() + make_interval(secs => %(ttl)s),
+                               COALESCE(%(user_generation)s, g.user_generation),
+                               COALESCE(%(scope_generation)s, g.scope_generation)
+                        FROM ({CURRENT_GENERATIONS_SQL}) g
+                        ON CONFLICT (namespace, cache_key)
+                        DO UPDATE SET
+                            value = EXCLUDED.value,
+                            expires_at = EXCLUDED.expires_at,
+                            user_generation = EXCLUDED.user_generation,
+                            scope_generation = EXCLUDED.scope_generation
+                        WHERE ({CACHE_TABLE}.user_generation, {CACHE_TABLE}.scope_generation)
+                              <= (EXCLUDED.user_generation, EXCLUDED.scope_generation)
+                        """,
+                        {
+                            "namespace": namespace,
+                            "cache_key": cache_key,
+                            "user_id": str(user_id),
+                            "scope": scope,
+                            "value": payload,
+                            "ttl": self.ttl,
+                            "user_generation": user_generation,
+                            "scope_generation": scope_generation,
+                        }
+                    )
+                    await conn.commit()
+            self._stats["sets" if cur.rowcount else "stale_sets"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"Shared cache write failed: {e}")
+
+    async def invalidate(self, namespace, user_id, scope=""):
+        try:
+            async with self.pool.connection() as conn:
+                await conn.execute(
+                    f"""
+                    INSERT INTO {GENERATIONS_TABLE} (namespace, user_id, scope, generation, bumped_at)
+                    VALUES (%s, %s, %s, nextval('{GENERATION_SEQUENCE}'), now())
+                    ON CONFLICT (namespace, user_id, scope)
+                    DO UPDATE SET generation = EXCLUDED.generation, bumped_at = EXCLUDED.bumped_at
+                    """,
+                    (namespace, str(user_id), scope)
+                )
+                await conn.commit()
+            self._stats["invalidations"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"Shared cache invalidation failed: {e}")
+
+    async def sweep(self, max_items=500):
+        try:
+            async with self.pool.connection() as conn:
+                cur = await conn.execute(
+                    f"""
+                    DELETE FROM {CACHE_TABLE} WHERE ctid IN (
+                        SELECT ctid FROM {CACHE_TABLE} WHERE expires_at <= now() LIMIT %s
+                    )
+                    """,
+                    (max_items,)
+                )
+                removed = cur.rowcount
+
+                # Every entry written before a generation older than the TTL has expired, so it can be forgotten
+                cur = await conn.execute(
+                    f"""
+                    DELETE FROM {GENERATIONS_TABLE} WHERE ctid IN (
+                        SELECT ctid FROM {GENERATIONS_TABLE}
+                        WHERE bumped_at <= now() - make_interval(secs => %s) LIMIT %s
+                    )
+                    """,
+                    (self.ttl, max_items)
+                )
+                await conn.commit()
+                return removed + cur.rowcount
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"Shared cache sweep failed: {e}")
+            return 0
+
+    async def stats(self):
+        return {"backend": "postgres", **self._stats}
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_cache_backend() -> CacheBackend:
+    """
+    Return the application cache backend selected by the CACHE_BACKEND setting.
+
+    Returns:
+        CacheBackend: The shared backend instance.
+    """
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                from Workflow.utils.config import get_config
+
+                config = get_config()
+                if config.CACHE_BACKEND == "postgres":
+                    _backend = PostgresCacheBackend(config.postgres_pool, ttl=config.CACHE_TTL_SECONDS)
+                else:
+                    _backend = InMemoryCacheBackend(
+                        ttl=config.CACHE_TTL_SECONDS,
+                        max_entries=config.CACHE_MAX_ENTRIES,
+                        max_bytes=config.CACHE_MAX_BYTES
+                    )
+    return _backend
+
+
+def bind_event_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Register the application's event loop so worker threads can reach async backends."""
+    global _loop
+    _loop = loop
+
+
+def run_sync(coro: Coroutine, timeout: float = 5.0, default: Any = None) -> Any:
+    """
+    Run a cache coroutine from a worker thread on the application's event loop.
+
+    Args:
+        coro: The coroutine to run.
+        timeout: Seconds to wait for the result.
+        default: Value returned if the loop is unavailable or the call fails.
+
+    Returns:
+        The coroutine's result, or `default`.
+    """
+    loop = _loop
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    # Blocking on the loop from its own thread would deadlock
+    if loop is None or loop.is_closed() or running is loop:
+        coro.close()
+        return default
+
+    try:
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+    except Exception as e:
+        logger.error(f"Cache call from worker thread failed: {e}")
+        return default
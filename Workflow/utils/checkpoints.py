@@ -0,0 +1,251 @@
+import logging
+from typing import Dict, List, Sequence
+
+from Workflow.utils.metrics import CHECKPOINT_ROWS_DELETED, CHECKPOINT_THREADS_COMPACTED, timed
+
+logger = logging.getLogger(__name__)
+
+# Tables written by the LangGraph Postgres checkpointer
+CHECKPOINT_TABLES = ("checkpoint_writes", "checkpoint_blobs", "checkpoints")
+
+# Checkpoints of the given threads beyond the latest %s of each namespace, newest first
+# (checkpoint ids are time-ordered, which is also how the checkpointer finds the latest one)
+EXPIRED_CHECKPOINTS_QUERY = """
+    SELECT thread_id, checkpoint_ns, checkpoint_id
+    FROM (
+        SELECT thread_id, checkpoint_ns, checkpoint_id,
+               row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS position
+        FROM checkpoints
+        WHERE thread_id = ANY(%s)
+    ) ranked
+    WHERE position > %s
+"""
+
+
+def _count_deleted(deleted: Dict[str, int], reason: str) -> None:
+    for table, rows in deleted.items():
+        if rows:
+            CHECKPOINT_ROWS_DELETED.inc(rows, table=table, reason=reason)
+
+
+async def delete_thread_checkpoints(cur, thread_ids: Sequence[str], reason: str = "deleted_chat") -> Dict[str, int]:
+    """
+    Delete all checkpointer data of the given threads.
+
+    Runs on the caller's cursor, so it can share a transaction with the
+    deletion of the chats themselves.
+
+    Args:
+        cur: An async cursor of the chatbot database.
+        thread_ids: Threads to delete.
+        reason: Reason label of the deleted-rows metric.
+
+    Returns:
+        Dict[str, int]: Rows deleted per table.
+    """
+    deleted = {}
+    if thread_ids:
+        for table in CHECKPOINT_TABLES:
+            await cur.execute(f"DELETE FROM {table} WHERE thread_id = ANY(%s)", (list(thread_ids),))
+            deleted[table] = cur.rowcount
+        _count_deleted(deleted, reason)
+    return deleted
+
+
+async def delete_user_checkpoints(cur, user_id: str) -> Dict[str, int]:
+    """
+    Delete the checkpointer data of every chat of a user.
+
+    Must run before the user's rows in chat_threads are deleted.
+
+    Args:
+        cur: An async cursor of the chatbot database.
+        user_id: The user whose chats are being deleted.
+
+    Returns:
+        Dict[str, int]: Rows deleted per table.
+    """
+    await cur.execute("SELECT thread_id FROM chat_threads WHERE user_id = %s", (user_id,))
+    thread_ids = [row[0] for row in await cur.fetchall()]
+    return await delete_thread_checkpoints(cur, thread_ids)
+
+
+@timed("postgres", "checkpoint_prune")
+async def prune_orphaned_checkpoints(pool, batch_size: int = 100) -> dict:
+    """
+    Delete the checkpoints of threads whose chat no longer exists.
+
+    At most `batch_size` threads are pruned per call, so the job can run
+    periodically without long-running deletes.
+
+    Args:
+        pool: The async Postgres connection pool.
+        batch_size: Maximum number of threads to prune.
+
+    Returns:
+        dict: Number of threads pruned and rows deleted per table.
+    """
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT c.thread_id
+                FROM checkpoints c
+                WHERE NOT EXISTS (SELECT 1 FROM chat_threads t WHERE t.thread_id = c.thread_id)
+                GROUP BY c.thread_id
+                LIMIT %s
+                """,
+                (batch_size,)
+            )
+            thread_ids = [row[0] for row in await cur.fetchall()]
+
+            deleted = await delete_thread_checkpoints(cur, thread_ids, reason="orphaned_thread")
+            await conn.commit()
+
+    if thread_ids:
+        logger.info(f"Pruned checkpoints of {len(thread_ids)} deleted chats: {deleted}")
+    return {"threads": len(thread_ids), "deleted": deleted}
+
+
+class CheckpointCompactor:
+    """
+    Keeps only the latest checkpoints of every thread.
+
+    Each run walks the next `batch_size` threads in thread_id order,
+    continuing where the previous run stopped and starting over after the
+    last thread, so one run never scans or locks the whole table. For the
+    threads holding more than `keep` checkpoints, the older checkpoints and
+    their pending writes are deleted in one statement, together with the
+    channel blobs that only those checkpoints referred to.
+    """
+
+    def __init__(self, pool, keep: int = 5, batch_size: int = 200):
+        """
+        Args:
+            pool: The async Postgres connection pool.
+            keep: Checkpoints kept per thread (and namespace); at least 1.
+            batch_size: Threads examined per run.
+        """
+        self.pool = pool
+        self.keep = max(1, keep)
+        self.batch_size = batch_size
+        self._cursor = ""
+        self._stats = {
+            "passes": 0,
+            "threads_scanned": 0,
+            "threads_compacted": 0,
+            "deleted": {table: 0 for table in CHECKPOINT_TABLES},
+        }
+
+    async def _next_threads(self, cur) -> List[tuple]:
+        # Grouping on the primary key's leading column walks the index and stops after the batch
+        await cur.execute(
+            """
+            SELECT thread_id, COUNT(*)
+            FROM checkpoints
+            WHERE thread_id > %s
+            GROUP BY thread_id
+            ORDER BY thread_id
+            LIMIT %s
+            """,
+            (self._cursor, self.batch_size)
+        )
+        return await cur.fetchall()
+
+    async def _compact(self, cur, thread_ids: List[str]) -> Dict[str, int]:
+        # Only blobs at the channel versions of the deleted checkpoints are candidates: the checkpointer
+        # commits the blobs of a new checkpoint before the checkpoint itself, and those are always at newer
+        # versions. A candidate is deleted unless a remaining checkpoint still lists it. Every part of the
+        # statement sees the same snapshot, so the deleted checkpoints are excluded by hand.
+        await cur.execute(
+            f"""
+            WITH expired AS ({EXPIRED_CHECKPOINTS_QUERY}),
+            deleted_writes AS (
+                DELETE FROM checkpoint_writes w
+                USING expired e
+                WHERE w.thread_id = e.thread_id AND w.checkpoint_ns = e.checkpoint_ns AND w.checkpoint_id = e.checkpoint_id
+                RETURNING 1
+            ),
+            deleted AS (
+                DELETE FROM checkpoints c
+                USING expired e
+                WHERE c.thread_id = e.thread_id AND c.checkpoint_ns = e.checkpoint_ns AND c.checkpoint_id = e.checkpoint_id
+                RETURNING c.thread_id, c.checkpoint_ns, c.checkpoint
+            ),
+            candidates AS (
+                SELECT DISTINCT d.thread_id, d.checkpoint_ns, v.key AS channel, v.value AS version
+                FROM deleted d, jsonb_each_text(d.checkpoint -> 'channel_versions') v
+            ),
+            deleted_blobs AS (
+                DELETE FROM checkpoint_blobs b
+                USING candidates x
+                WHERE b.thread_id = x.thread_id AND b.checkpoint_ns = x.checkpoint_ns
+                  AND b.channel = x.channel AND b.version = x.version
+                  AND NOT EXISTS (
+                      SELECT 1 FROM checkpoints c
+                      WHERE c.thread_id = b.thread_id
+                        AND c.checkpoint_ns = b.checkpoint_ns
+                        AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+                        AND NOT EXISTS (
+                            SELECT 1 FROM expired e
+                            WHERE e.thread_id = c.thread_id AND e.checkpoint_ns = c.checkpoint_ns AND e.checkpoint_id = c.checkpoint_id
+                        )
+                  )
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM deleted_writes), (SELECT COUNT(*) FROM deleted), (SELECT COUNT(*) FROM deleted_blobs)
+            """,
+            (thread_ids, self.keep)
+        )
+        writes, checkpoints, blobs = await cur.fetchone()
+        _count_deleted({"checkpoint_writes": writes, "checkpoints": checkpoints}, "retention")
+        _count_deleted({"checkpoint_blobs": blobs}, "orphaned_blob")
+        return {"checkpoint_writes": writes, "checkpoint_blobs": blobs, "checkpoints": checkpoints}
+
+    @timed("postgres", "checkpoint_compaction")
+    async def run(self) -> dict:
+        """
+        Compact the next batch of threads.
+
+        Returns:
+            dict: Threads scanned and compacted, rows deleted per table, and whether a full pass finished.
+        """
+        deleted = {table: 0 for table in CHECKPOINT_TABLES}
+
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                rows = await self._next_threads(cur)
+                over_limit = [thread_id for thread_id, count in rows if count > self.keep]
+
+                if over_limit:
+                    async with conn.transaction():
+                        deleted.update(await self._compact(cur, over_limit))
+                await conn.commit()
+
+        finished_pass = len(rows) < self.batch_size
+        self._cursor = "" if finished_pass else rows[-1][0]
+
+        self._stats["threads_scanned"] += len(rows)
+        self._stats["threads_compacted"] += len(over_limit)
+        self._stats["passes"] += int(finished_pass)
+        for table, count in deleted.items():
+            self._stats["deleted"][table] += count
+        CHECKPOINT_THREADS_COMPACTED.inc(len(over_limit))
+
+        if over_limit:
+            logger.info(f"Compacted checkpoints of {len(over_limit)} threads to the latest {self.keep}: {deleted}")
+        return {
+            "threads_scanned": len(rows),
+            "threads_compacted": len(over_limit),
+            "deleted": deleted,
+            "finished_pass": finished_pass,
+        }
+
+    def stats(self) -> dict:
+        """Return cumulative progress: completed passes, threads and rows, and the current position."""
+        return {
+            **self._stats,
+            "deleted": dict(self._stats["deleted"]),
+            "keep": self.keep,
+            "cursor": self._cursor,
+        }
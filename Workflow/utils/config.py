@@ -1,8 +1,15 @@
 import os
+import threading
+from functools import cached_property
+from typing import Optional
+
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from psycopg_pool import ConnectionPool  # type: ignore
+from psycopg_pool import AsyncConnectionPool  # type: ignore
 import pyodbc
 
+from Workflow.utils.metrics import LLMMetricsCallback
+from Workflow.utils.sql_server_pool import SqlServerConnectionPool
+
 
 class Config:
     def __init__(self):
@@ -21,6 +28,13 @@ class Config:
             f"TrustServerCertificate={os.getenv('MOSEFAK_APP_TRUST_SERVER_CERTIFICATE')};"
         )
 
+        # SQL Server connection pool settings
+        self.MOSEFAK_APP_POOL_MIN_SIZE = int(os.getenv("MOSEFAK_APP_POOL_MIN_SIZE", 1))
+        self.MOSEFAK_APP_POOL_MAX_SIZE = int(os.getenv("MOSEFAK_APP_POOL_MAX_SIZE", 10))
+        self.MOSEFAK_APP_POOL_TIMEOUT = float(os.getenv("MOSEFAK_APP_POOL_TIMEOUT", 30))
+        self.MOSEFAK_APP_QUERY_TIMEOUT = int(os.getenv("MOSEFAK_APP_QUERY_TIMEOUT", 30))
+        self.MOSEFAK_APP_HEALTH_CHECK_SECONDS = float(os.getenv("MOSEFAK_APP_HEALTH_CHECK_SECONDS", 30))
+
         # Database configuration for PostgreSQL
         self.POSTGRES_DB_URI = os.getenv("POSTGRES_DB_URI")
         self.POSTGRES_CONNECTION_KWARGS = {
@@ -34,13 +48,70 @@ class Config:
         self.TEMPERATURE = float(os.getenv("TEMPERATURE", 0))
 
         # Application settings
-        self.NUMBER_OF_LAST_MESSAGES = int(os.getenv("NUMBER_OF_LAST_MESSAGES", -5))
+        # Token budget of the previous turns included in prompts
+        self.CONVERSATION_WINDOW_MAX_TOKENS = int(os.getenv("CONVERSATION_WINDOW_MAX_TOKENS", 1500))
+
+        # Rolling summary of long conversations: once a thread exceeds the trigger, its older turns are folded into
+        # a summary (after the response is sent) until the messages kept verbatim fit in the target
+        self.CONVERSATION_SUMMARY_ENABLED = os.getenv("CONVERSATION_SUMMARY_ENABLED", "True").lower() == "true"
+        self.CONVERSATION_SUMMARY_TRIGGER_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TRIGGER_TOKENS", 4000))
+        self.CONVERSATION_SUMMARY_TARGET_TOKENS = int(
+            os.getenv("CONVERSATION_SUMMARY_TARGET_TOKENS", self.CONVERSATION_SUMMARY_TRIGGER_TOKENS // 2)
+        )
+
+        # Application cache settings: "memory" (per process) or "postgres" (shared by all workers)
+        self.CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+        self.CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 300))
+        self.CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+        self.CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
+        # Periodic maintenance settings
+        self.MAINTENANCE_SWEEP_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_SWEEP_INTERVAL_SECONDS", 60))
+        self.MAINTENANCE_SWEEP_BATCH = int(os.getenv("MAINTENANCE_SWEEP_BATCH", 500))
+        self.CHECKPOINT_PRUNE_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", 3600))
+        self.CHECKPOINT_PRUNE_BATCH = int(os.getenv("CHECKPOINT_PRUNE_BATCH", 100))
+        # Checkpoint retention: latest checkpoints kept per thread, compacted a batch of threads at a time
+        self.CHECKPOINT_RETENTION_PER_THREAD = int(os.getenv("CHECKPOINT_RETENTION_PER_THREAD", 5))
+        self.CHECKPOINT_COMPACTION_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_COMPACTION_INTERVAL_SECONDS", 300))
+        self.CHECKPOINT_COMPACTION_BATCH = int(os.getenv("CHECKPOINT_COMPACTION_BATCH", 200))
+
+        # Doctor directory index settings
+        self.DOCTOR_INDEX_PATH = os.getenv("DOCTOR_INDEX_PATH", "doctor_index")
+        self.DOCTOR_INDEX_REFRESH_SECONDS = int(os.getenv("DOCTOR_INDEX_REFRESH_SECONDS", 600))
+        self.DOCTOR_INDEX_RETRY_SECONDS = int(os.getenv("DOCTOR_INDEX_RETRY_SECONDS", 30))
+
+        # Embedding-based intent router settings
+        self.INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "True").lower() == "true"
+        self.INTENT_ROUTER_MARGIN = float(os.getenv("INTENT_ROUTER_MARGIN", 0.05))
+        self.INTENT_ROUTER_MIN_SIMILARITY = float(os.getenv("INTENT_ROUTER_MIN_SIMILARITY", 0.6))
+
+        # Query intent classification for SQL generation: "rules" (local) or "llm"
+        self.QUERY_INTENT_CLASSIFIER = os.getenv("QUERY_INTENT_CLASSIFIER", "rules").lower()
+
+        # Send only the tables relevant to the question to the SQL prompt
+        self.SCHEMA_PRUNING_ENABLED = os.getenv("SCHEMA_PRUNING_ENABLED", "True").lower() == "true"
+
+        # Semantic cache of generated SQL settings
+        self.SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "True").lower() == "true"
+        self.SQL_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("SQL_CACHE_SIMILARITY_THRESHOLD", 0.95))
+        self.SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", 500))
+        self.SQL_CACHE_TTL_SECONDS = int(os.getenv("SQL_CACHE_TTL_SECONDS", 86400))
+
+        # Precomputed follow-up question bank settings
+        self.FOLLOWUP_BANK_ENABLED = os.getenv("FOLLOWUP_BANK_ENABLED", "True").lower() == "true"
+        self.FOLLOWUP_BANK_PATH = os.getenv("FOLLOWUP_BANK_PATH", "followup_bank")
+        self.FOLLOWUP_BANK_MIN_SIMILARITY = float(os.getenv("FOLLOWUP_BANK_MIN_SIMILARITY", 0.75))
 
-        # Initialize PostgreSQL connection pool
-        self.pool = ConnectionPool(
+        # FAISS index registry settings
+        self.FAISS_MMAP = os.getenv("FAISS_MMAP", "False").lower() == "true"
+        self.FAISS_RELOAD_CHECK_SECONDS = float(os.getenv("FAISS_RELOAD_CHECK_SECONDS", 5))
+
+        # Initialize PostgreSQL async connection pool (opened on application startup)
+        self.pool = AsyncConnectionPool(
             conninfo=str(self.POSTGRES_DB_URI),
             max_size=20,
-            kwargs=self.POSTGRES_CONNECTION_KWARGS
+            kwargs=self.POSTGRES_CONNECTION_KWARGS,
+            open=False
         )
 
     @staticmethod
@@ -51,16 +122,17 @@ class Config:
         
         return GOOGLE_API_KEY
 
-    @property
+    @cached_property
     def llm(self):
         chat_model = ChatGoogleGenerativeAI(
             model=f"{self.MODEL_NAME}",
             google_api_key=self.get_google_api_key(),
-            temperature=self.TEMPERATURE
+            temperature=self.TEMPERATURE,
+            callbacks=[LLMMetricsCallback(self.MODEL_NAME)]
         )
         return chat_model
 
-    @property
+    @cached_property
     def embeddings(self):
         return GoogleGenerativeAIEmbeddings(
             model=str(self.EMBEDDING_MODEL_NAME),
@@ -71,6 +143,41 @@ class Config:
     def mosefak_app_db(self):
         return pyodbc.connect(self.mosefak_app_conn_str)
 
+    @cached_property
+    def mosefak_app_pool(self):
+        return SqlServerConnectionPool(
+            connect=lambda: pyodbc.connect(self.mosefak_app_conn_str),
+            min_size=self.MOSEFAK_APP_POOL_MIN_SIZE,
+            max_size=self.MOSEFAK_APP_POOL_MAX_SIZE,
+            query_timeout=self.MOSEFAK_APP_QUERY_TIMEOUT,
+            checkout_timeout=self.MOSEFAK_APP_POOL_TIMEOUT,
+            health_check_interval=self.MOSEFAK_APP_HEALTH_CHECK_SECONDS
+        )
+
     @property
     def postgres_pool(self):
         return self.pool
+
+
+_config: Optional[Config] = None
+_config_lock = threading.Lock()
+
+
+def get_config() -> Config:
+    """
+    Return the application-wide Config, creating it on first use.
+
+    All modules share this instance, so the process holds a single Postgres
+    pool and reuses the same LLM and embedding clients (and their HTTP
+    sessions) instead of building new ones on every access.
+
+    Returns:
+        Config: The shared configuration.
+    """
+    global _config
+
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = Config()
+    return _config
@@ -0,0 +1,207 @@
+import math
+from typing import Any, List, Optional, Sequence, Tuple
+
+from Workflow.utils.cache import MISSING, TTLCache
+
+# Separator between turns, as in the prompts built by extract_messages
+TURN_SEPARATOR = "--------------------"
+
+# Rough characters per token of Gemini's tokenizer on English and Arabic text
+CHARS_PER_TOKEN = 4
+
+# Rendered windows by (message count, last message id, budget, summary); the nodes of one graph run share them
+_window_cache = TTLCache(max_entries=2048, max_bytes=32 * 1024 * 1024, default_ttl=600)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the number of tokens of a text without calling the tokenizer.
+
+    Args:
+        text: The text.
+
+    Returns:
+        int: Estimated token count.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def message_text(message: Any) -> str:
+    """
+    Return the text of a message, whether its content is a string or a list of parts.
+
+    Args:
+        message: A LangChain message.
+
+    Returns:
+        str: The text content.
+    """
+    content = message.content
+    if isinstance(content, str):
+        return content
+
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(str(part.get("text", "")))
+    return "".join(parts)
+
+
+def pair_turns(messages: Sequence[Any]) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Group messages into (human, ai) turns in conversation order.
+
+    A human message without an answer, or an answer without its question (e.g.
+    at the start of a trimmed history), becomes a turn with the other side None
+    instead of being paired with the wrong message. Consecutive AI messages are
+    joined into one answer; tool, system and other messages are skipped.
+
+    Args:
+        messages: LangChain messages, oldest first.
+
+    Returns:
+        List[Tuple[Optional[str], Optional[str]]]: (question, answer) pairs.
+    """
+    turns: List[Tuple[Optional[str], Optional[str]]] = []
+    for message in messages:
+        if message.type == "human":
+            turns.append((message_text(message), None))
+        elif message.type == "ai":
+            text = message_text(message)
+            if not text:
+                continue
+            if turns and turns[-1][0] is not None and turns[-1][1] is None:
+                turns[-1] = (turns[-1][0], text)
+            elif turns and turns[-1][1] is not None:
+                turns[-1] = (turns[-1][0], f"{turns[-1][1]}\n{text}")
+            else:
+                turns.append((None, text))
+    return turns
+
+
+def render_turn(question: Optional[str], answer: Optional[str]) -> str:
+    lines = []
+    if question is not None:
+        lines.append(f"Human: {question}")
+    if answer is not None:
+        lines.append(f"AI: {answer}")
+    lines.append(TURN_SEPARATOR)
+    return "\n".join(lines)
+
+
+def render_turns(messages: Sequence[Any]) -> str:
+    """Render all turns of the messages, oldest first."""
+    return "\n".join(render_turn(question, answer) for question, answer in pair_turns(messages))
+
+
+def build_conversation_window(messages: Sequence[Any], max_tokens: int, summary: str = "") -> str:
+    """
+    Render the most recent turns of a conversation that fit in a token budget.
+
+    The latest human message is the question being answered, which the prompts
+    include separately, so it is left out of the window. Turns are added from
+    the newest backwards until the next one would exceed the budget; if even
+    the newest turn does not fit, it is cut to the budget so the model still
+    sees the start of what was said last. The running summary of earlier,
+    removed turns comes first and counts against the budget.
+
+    Args:
+        messages: The conversation's messages, oldest first.
+        max_tokens: Token budget of the rendered window.
+        summary: Running summary of the turns no longer in messages.
+
+    Returns:
+        str: The turns, oldest first, in the "Human: ...\\nAI: ...\\n----" format.
+    """
+    header = f"Summary of the earlier conversation: {summary}\n{TURN_SEPARATOR}" if summary else ""
+    if header:
+        max_tokens = max(0, max_tokens - estimate_tokens(header) - 1)
+
+    history = list(messages)
+    if history and history[-1].type == "human":
+        history = history[:-1]
+
+    # Only the tail that can fill the budget needs pairing, however long the chat is
+    start, chars = len(history), 0
+    while start > 0 and chars <= max_tokens * CHARS_PER_TOKEN:
+        start -= 1
+        chars += len(message_text(history[start]))
+    history = history[max(0, start - 1):]
+
+    rendered: List[str] = []
+    used = 0
+    for question, answer in reversed(pair_turns(history)):
+        turn = render_turn(question, answer)
+        tokens = estimate_tokens(turn) + 1
+        if used + tokens > max_tokens:
+            if not rendered and max_tokens > 0:
+                # Keep the start of the newest turn, its question first
+                keep = max(0, max_tokens * CHARS_PER_TOKEN - len(TURN_SEPARATOR) - 5)
+                rendered.append(f"{turn[:keep]} ...\n{TURN_SEPARATOR}")
+            break
+        rendered.append(turn)
+        used += tokens
+
+    if header:
+        rendered.append(header)
+    return "\n".join(reversed(rendered))
+
+
+def window_questions(messages: Sequence[Any], max_tokens: int) -> List[str]:
+    """
+    Return the earlier questions of the turns that fit in a conversation window.
+
+    Uses the same budget as build_conversation_window, counting every message
+    from the newest backwards, and leaves out the question being answered.
+
+    Args:
+        messages: The conversation's messages, oldest first.
+        max_tokens: Token budget of the window.
+
+    Returns:
+        List[str]: The human messages in the window, oldest first.
+    """
+    history = list(messages)
+    if history and history[-1].type == "human":
+        history = history[:-1]
+
+    questions: List[str] = []
+    used = 0
+    for message in reversed(history):
+        text = message_text(message)
+        used += estimate_tokens(text)
+        if used > max_tokens:
+            break
+        if message.type == "human":
+            questions.append(text)
+    return questions[::-1]
+
+
+def conversation_window(messages: Sequence[Any], max_tokens: int, summary: str = "") -> str:
+    """
+    Memoized build_conversation_window for the messages of a checkpoint.
+
+    Messages in the graph state carry unique ids, so the message count and the
+    id of the last message identify the state a node sees; every node of the
+    same run gets the window rendered by the first one.
+
+    Args:
+        messages: The conversation's messages, oldest first.
+        max_tokens: Token budget of the rendered window.
+        summary: Running summary of the turns no longer in messages.
+
+    Returns:
+        str: The rendered window.
+    """
+    last_id = getattr(messages[-1], "id", None) if messages else None
+    if last_id is None:
+        return build_conversation_window(messages, max_tokens, summary)
+
+    key = (len(messages), last_id, max_tokens, summary)
+    window = _window_cache.get(key, MISSING)
+    if window is MISSING:
+        window = build_conversation_window(messages, max_tokens, summary)
+        _window_cache.set(key, window)
+    return window
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+
+from Workflow.utils.helper_functions import fetch_doctor_rows, format_doctor
+from Workflow.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+INDEX_VERSION_PREFIX = "index-"
+LEGACY_INDEX_FILES = ("index.faiss", "index.pkl")
+
+
+class DoctorDirectory:
+    """
+    Long-lived FAISS index over the doctor directory.
+
+    The directory holds one document per doctor, keyed by a hash of its formatted
+    entry. It is built once, persisted to disk together with a manifest of the
+    indexed entries, and refreshed incrementally: on each refresh the doctor rows
+    are re-read from SQL Server and only new or changed doctors are embedded,
+    while removed doctors are deleted from the index.
+
+    Every saved index goes to a new version directory and the manifest, written
+    last, names the current one, so a reader never loads index files from two
+    different saves.
+
+    Refreshes run in a background thread once the index is older than
+    `refresh_interval`, so requests keep using the current index in the meantime.
+    """
+
+    def __init__(
+        self, db, embeddings, directory: str = "doctor_index", refresh_interval: int = 600, retry_interval: int = 30
+    ):
+        """
+        Args:
+            db: SQL Server connection pool used to read the doctor rows.
+            embeddings: Embeddings model for the vector store.
+            directory: Directory where the index and its manifest are persisted.
+            refresh_interval: Seconds after which the index is refreshed from the database.
+            retry_interval: Seconds before a failed first build is retried.
+        """
+        self.db = db
+        self.embeddings = embeddings
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.retry_interval = min(retry_interval, refresh_interval)
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._index: Optional[FAISS] = None
+        self._entries: Dict[str, str] = {}
+        self._last_refresh = 0.0
+        self._last_error: Optional[str] = None
+        self._loaded = False
+
+    @staticmethod
+    def _entry_id(text: str) -> str:
+        return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+    @property
+    def listing(self) -> str:
+        """The formatted doctor directory, one doctor per line."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return "\n".join(entries) if entries else "No doctors available."
+
+    def _load(self) -> None:
+        """Load the persisted index and manifest from disk, if present."""
+        manifest_path = os.path.join(self.directory, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_path):
+            return
+
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+            index = None
+            if manifest.get("entries"):
+                # Manifests written before versioning kept the index files next to them
+                index_path = os.path.join(self.directory, manifest.get("index_dir") or "")
+                index = FAISS.load_local(index_path, self.embeddings, allow_dangerous_deserialization=True)
+
+            with self._lock:
+                self._index = index
+                self._entries = dict(manifest.get("entries", {}))
+                self._last_refresh = float(manifest.get("refreshed_at", 0.0))
+            logger.info(f"Loaded doctor directory index with {len(self._entries)} doctors from '{self.directory}'")
+        except Exception as e:
+            logger.error(f"Failed to load doctor directory index from '{self.directory}': {e}")
+
+    def _save(self, index: Optional[FAISS], entries: Dict[str, str], refreshed_at: float) -> None:
+        """Persist the index to a new version directory, switch the manifest to it and remove older versions."""
+        os.makedirs(self.directory, exist_ok=True)
+        index_dir = None
+        if index is not None:
+            index_dir = f"{INDEX_VERSION_PREFIX}{time.time_ns()}"
+            index.save_local(os.path.join(self.directory, index_dir))
+
+        manifest_path = os.path.join(self.directory, MANIFEST_FILENAME)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"refreshed_at": refreshed_at, "index_dir": index_dir, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+
+        # Older versions are unreachable once the manifest names the new one (or no index at all)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(INDEX_VERSION_PREFIX) and name != index_dir:
+                shutil.rmtree(path, ignore_errors=True)
+            elif name in LEGACY_INDEX_FILES:
+                os.remove(path)
+
+    @timed("faiss", "doctor_directory_refresh")
+    def refresh(self) -> bool:
+        """
+        Re-read the doctor rows and apply the difference to the index.
+
+        Only doctors whose formatted entry is new are embedded; entries that no
+        longer exist are removed. The updated index is built on a copy and swapped
+        in atomically, so concurrent searches never see a half-updated index.
+
+        Returns:
+            bool: True if the directory is up to date, False if the database could not be read.
+        """
+        with self._refresh_lock:
+            rows = fetch_doctor_rows(self.db)
+            if not isinstance(rows, list):
+                error = rows if isinstance(rows, str) else f"Unable to access doctor information: {rows.get('details')}"
+                logger.error(f"Doctor directory refresh failed: {error}")
+                with self._lock:
+                    self._last_error = error
+                    # Back off instead of retrying on every request; until a first index exists, only briefly
+                    backoff = self.refresh_interval if self._loaded else self.retry_interval
+                    self._last_refresh = time.time() - self.refresh_interval + backoff
+                return False
+
+            entries = {}
+            for row in rows:
+                text = format_doctor(row)
+                entries[self._entry_id(text)] = text
+
+            with self._lock:
+                current_index = self._index
+                current_entries = dict(self._entries)
+
+            added = [entry_id for entry_id in entries if entry_id not in current_entries]
+            removed = [entry_id for entry_id in current_entries if entry_id not in entries]
+
+            index = current_index
+            if not entries:
+                index = None
+            elif added or removed:
+                if current_index is None or len(removed) == len(current_entries):
+                    index = FAISS.from_texts(
+                        [entries[entry_id] for entry_id in added], self.embeddings, ids=added
+                    )
+                else:
+                    # Work on a copy so readers keep a consistent index until the swap
+                    index = FAISS.deserialize_from_bytes(
+                        current_index.serialize_to_bytes(), self.embeddings, allow_dangerous_deserialization=True
+                    )
+                    if removed:
+                        index.delete(removed)
+                    if added:
+                        index.add_texts([entries[entry_id] for entry_id in added], ids=added)
+
+            refreshed_at = time.time()
+            if added or removed or not self._loaded:
+                try:
+                    self._save(index, entries, refreshed_at)
+                except Exception as e:
+                    logger.error(f"Failed to persist doctor directory index: {e}")
+
+            with self._lock:
+                self._index = index
+                self._entries = entries
+                self._last_refresh = refreshed_at
+                self._last_error = None
+                self._loaded = True
+
+            logger.info(f"Doctor directory refreshed: {len(added)} added, {len(removed)} removed, {len(entries)} total")
+            return True
+
+    def invalidate(self) -> None:
+        """Mark the index as stale so the next access triggers a refresh."""
+        with self._lock:
+            self._last_refresh = 0.0
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(target=self.refresh, name="doctor-directory-refresh", daemon=True).start()
+
+    def get(self) -> Tuple[Optional[FAISS], str]:
+        """
+        Return the doctor index and the formatted directory listing.
+
+        The first call loads the persisted index (or builds it if none exists);
+        later calls return immediately and schedule a background refresh when
+        the index is older than the refresh interval.
+
+        Returns:
+            Tuple[Optional[FAISS], str]: The index (None if unavailable) and the listing
+            or an error message.
+        """
+        if not self._loaded:
+            with self._refresh_lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = self._index is not None
+            if not self._loaded and time.time() - self._last_refresh > self.refresh_interval:
+                self.refresh()
+        elif time.time() - self._last_refresh > self.refresh_interval:
+            self._refresh_in_background()
+
+        with self._lock:
+            index = self._index
+            error = self._last_error
+
+        if index is None:
+            return None, error or "No doctors available."
+        return index, self.listing
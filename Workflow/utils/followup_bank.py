@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_FLOW_TYPE = "system_flow"
+
+# Navigation questions the system-flow documentation answers, always part of the bank
+SYSTEM_FLOW_QUESTIONS = [
+    "How do I book an appointment with a doctor?",
+    "How can I cancel or reschedule my appointment?",
+    "Where can I see my upcoming appointments?",
+    "How do I pay for my appointment?",
+    "How do I search for a doctor by specialization?",
+    "How can I see a doctor's reviews and ratings?",
+    "How do I leave a review for a doctor?",
+    "How do I edit my profile information?",
+    "How do I change my password?",
+    "Where can I find my notifications?",
+    "How do I contact support?",
+    "How do I log out of the app?",
+]
+
+SYSTEM_FLOW_PROMPT = """
+The following is a section of the user documentation of a medical appointments app.
+Write up to 3 short questions a user of the app could ask that this section answers.
+Return only a JSON array of strings, nothing else.
+
+Section:
+{section}
+"""
+
+NORMALIZE_PATTERN = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _normalize(text: str) -> str:
+    """Lowercase a question and drop punctuation, so trivial variants compare equal."""
+    return NORMALIZE_PATTERN.sub(" ", text.lower()).strip()
+
+
+def _unit_vectors(vectors: Iterable[List[float]]) -> np.ndarray:
+    matrix = np.asarray(list(vectors), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def load_medical_questions(csv_path: str) -> List[Tuple[str, str]]:
+    """
+    Read the distinct questions of the medical advices dataset.
+
+    Args:
+        csv_path (str): Path to the CSV file with q_type, question and answer columns.
+
+    Returns:
+        List[Tuple[str, str]]: (question, q_type) pairs, first occurrence of each question.
+    """
+    df = pd.read_csv(csv_path, usecols=["q_type", "question"]).dropna(subset=["question"])
+    df["q_type"] = df["q_type"].fillna("general_info")
+
+    questions, seen = [], set()
+    for q_type, question in df[["q_type", "question"]].itertuples(index=False):
+        question = " ".join(str(question).split())
+        key = _normalize(question)
+        if key and key not in seen:
+            seen.add(key)
+            questions.append((question, str(q_type)))
+    return questions
+
+
+def generate_system_flow_questions(system_flow_dir: str, embeddings, llm) -> List[str]:
+    """
+    Ask the LLM, once per documentation chunk, for the questions the chunk answers.
+
+    Args:
+        system_flow_dir (str): Directory of the system-flow FAISS store.
+        embeddings: Embeddings model the store was built with.
+        llm: Chat model used to write the questions.
+
+    Returns:
+        List[str]: The generated questions.
+    """
+    store = FAISS.load_local(system_flow_dir, embeddings, allow_dangerous_deserialization=True)
+
+    questions = []
+    for doc_id in store.index_to_docstore_id.values():
+        section = store.docstore.search(doc_id).page_content
+        try:
+            content = llm.invoke(SYSTEM_FLOW_PROMPT.format(section=section)).content
+            match = re.search(r"\[.*\]", content, re.DOTALL)
+            if match:
+                questions.extend(q.strip() for q in json.loads(match.group(0)) if isinstance(q, str) and q.strip())
+        except Exception as e:
+            print(f"⚠️ Skipping a system-flow section, question generation failed. Error: {e}")
+    return questions
+
+
+def build_followup_bank(
+    csv_path: str,
+    embeddings,
+    save_path: str = "followup_bank",
+    system_flow_dir: Optional[str] = "system_flow",
+    llm=None,
+) -> None:
+    """
+    Build the follow-up question bank and save it as a FAISS store.
+
+    Every entry is a question users can be offered next, with its q_type in the
+    metadata (the dataset's q_type, or "system_flow" for app navigation). Vectors
+    are stored normalized, so the store's L2 distances map directly to cosine
+    similarities at query time.
+
+    Args:
+        csv_path (str): Path to the medical advices CSV file.
+        embeddings: Embeddings model; must be the one used at query time.
+        save_path (str): Directory where the bank is saved.
+        system_flow_dir (str): Directory of the system-flow FAISS store, or None to skip it.
+        llm: Chat model used to derive questions from the system-flow documentation;
+            without it only the built-in navigation questions are added.
+    """
+    entries = load_medical_questions(csv_path)
+
+    flow_questions = list(SYSTEM_FLOW_QUESTIONS)
+    if system_flow_dir and llm is not None:
+        flow_questions += generate_system_flow_questions(system_flow_dir, embeddings, llm)
+
+    seen = {_normalize(question) for question, _ in entries}
+    for question in flow_questions:
+        if _normalize(question) not in seen:
+            seen.add(_normalize(question))
+            entries.append((question, SYSTEM_FLOW_TYPE))
+
+    texts = [question for question, _ in entries]
+    vectors = _unit_vectors(embeddings.embed_documents(texts))
+
+    db = FAISS.from_embeddings(
+        list(zip(texts, vectors.tolist())),
+        embeddings,
+        metadatas=[{"q_type": q_type} for _, q_type in entries]
+    )
+
+    os.makedirs(save_path, exist_ok=True)
+    db.save_local(save_path)
+    print(f"Follow-up bank with {len(entries)} questions saved to: {save_path}")
+
+
+class FollowUpBank:
+    """
+    Suggests follow-up questions from the precomputed question bank.
+
+    The last answer (with its question) is embedded and matched against the
+    bank; the closest questions are picked across different q_types, so a
+    treatment answer is followed by e.g. symptoms and prevention questions of
+    the same condition. When no entry is similar enough the caller falls back
+    to generating suggestions with the LLM.
+    """
+
+    def __init__(self, registry, embeddings, directory: str = "followup_bank", min_similarity: float = 0.75, candidates: int = 20):
+        """
+        Args:
+            registry: FAISS registry the bank is loaded from.
+            embeddings: Embeddings model (ideally cached) the bank was built with.
+            directory: Directory of the bank's FAISS store.
+            min_similarity: Minimum cosine similarity of a suggested question.
+            candidates: Number of nearest bank entries to consider.
+        """
+        self.registry = registry
+        self.embeddings = embeddings
+        self.directory = directory
+        self.min_similarity = min_similarity
+        self.candidates = candidates
+        self._stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    @staticmethod
+    def _select(matches: List[Tuple[str, str, float]], count: int) -> List[Dict[str, str]]:
+        """Take the best question of each q_type first, then fill up by score."""
+        best_per_type, rest, seen_types = [], [], set()
+        for text, q_type, similarity in matches:
+            if q_type in seen_types:
+                rest.append((text, q_type, similarity))
+            else:
+                seen_types.add(q_type)
+                best_per_type.append((text, q_type, similarity))
+
+        chosen = (best_per_type + rest)[:count]
+        return [{"text": text, "type": q_type} for text, q_type, _ in chosen]
+
+    async def asuggest(
+        self,
+        question: str,
+        response: str,
+        count: int = 3,
+        asked: Iterable[str] = (),
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Suggest follow-up questions for an answer without calling the LLM.
+
+        Args:
+            question: The user's question.
+            response: The assistant's answer.
+            count: Number of questions to suggest.
+            asked: Questions already asked in the conversation, never suggested again.
+
+        Returns:
+            Optional[List[Dict[str, str]]]: Questions with their q_type, or None if no
+            bank entry is similar enough.
+        """
+        store = await asyncio.to_thread(self.registry.get, self.directory)
+        if store is None:
+            return None
+
+        try:
+            vector = await self.embeddings.aembed_query(f"{question.strip()}\n{response.strip()[:2000]}")
+            query = _unit_vectors([vector])[0]
+            results = await asyncio.to_thread(
+                store.similarity_search_with_score_by_vector, query.tolist(), k=self.candidates
+            )
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"Follow-up bank lookup failed, falling back to the LLM: {e}")
+            return None
+
+        excluded = {_normalize(question)} | {_normalize(text) for text in asked}
+        matches = []
+        for doc, distance in results:
+            # Squared L2 distance between unit vectors: d = 2 - 2 * cosine
+            similarity = 1.0 - float(distance) / 2.0
+            if similarity >= self.min_similarity and _normalize(doc.page_content) not in excluded:
+                matches.append((doc.page_content, doc.metadata.get("q_type", "follow-up"), similarity))
+
+        if not matches:
+            self._stats["misses"] += 1
+            top = 1.0 - float(results[0][1]) / 2.0 if results else 0.0
+            logger.info(f"Follow-up bank not confident (top similarity {top:.3f})")
+            return None
+
+        self._stats["hits"] += 1
+        return self._select(matches, count)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters."""
+        return dict(self._stats)
+
+
+if __name__ == "__main__":
+    from Workflow.utils.config import get_config
+
+    parser = argparse.ArgumentParser(description="Build the follow-up question bank.")
+    parser.add_argument("--csv", default=os.path.join("Data Prepration", "medical_advices.csv"))
+    parser.add_argument("--system-flow", default="system_flow", help="System-flow FAISS store, or '' to skip it")
+    parser.add_argument("--out", default=None, help="Output directory (defaults to FOLLOWUP_BANK_PATH)")
+    parser.add_argument("--no-llm", action="store_true", help="Only add the built-in navigation questions")
+    args = parser.parse_args()
+
+    config = get_config()
+    build_followup_bank(
+        args.csv,
+        config.embeddings,
+        save_path=args.out or config.FOLLOWUP_BANK_PATH,
+        system_flow_dir=args.system_flow or None,
+        llm=None if args.no_llm else config.llm,
+    )
@@ -1,5 +1,6 @@
 import ast
 import hashlib
+import logging
 import math
 import os
 import pydoc
@@ -20,10 +21,75 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain.chains import RetrievalQA
 from langchain.schema import Document
 from langchain_community.vectorstores import FAISS
+from langgraph.constants import TAG_NOSTREAM
+
+from Workflow.utils.cache import MISSING, TTLCache
+from Workflow.utils.cache_backends import PostgresCacheBackend, get_cache_backend, run_sync
+from Workflow.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Config for internal LLM calls whose output must not be streamed to the user
+INTERNAL_RUN_CONFIG = {"tags": [TAG_NOSTREAM]}
 
 # Initialize global cache manager
-query_cache = {}
 CACHE_TTL = 300  # 5 minutes in seconds
+query_cache = TTLCache(
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 1000)),
+    max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    default_ttl=CACHE_TTL
+)
+QUERY_CACHE_NAMESPACE = "sql"
+
+# Patterns of the per-request helpers, compiled once at import instead of on every call
+WHITESPACE_PATTERN = re.compile(r'\s+')
+LINKED_SERVER_QUALIFIED_PATTERN = re.compile(r'\[mosefak-app\]\.\[dbo\]\.(\[[\w-]+\])')
+LINKED_SERVER_FROM_PATTERN = re.compile(r'FROM\s+(\w+)')
+LINKED_SERVER_JOIN_PATTERN = re.compile(r'JOIN\s+(\w+)')
+
+ADMIN_INJECTION_PATTERNS = [
+    re.compile(pattern) for pattern in (
+        r";\s*select", r";\s*insert", r";\s*update", r";\s*delete",
+        r"/\*", r"\*/", r"xp_cmdshell", r"sp_executesql"
+    )
+]
+# (keyword, pattern): the keyword must occur for the pattern to match
+ADMIN_DANGEROUS_OPERATION_PATTERNS = [
+    (keyword, re.compile(pattern)) for keyword, pattern in (
+        ("drop", r"\bdrop\s+database\b"), ("drop", r"\bdrop\s+server\b"),
+        ("truncate", r"\btruncate\s+table\b"), ("delete", r"\bdelete\s+from\b\s+.*\bwhere\b\s+1\s*=\s*1"),
+        ("update", r"\bupdate\b\s+.*\bwhere\b\s+1\s*=\s*1")
+    )
+]
+INJECTION_PATTERNS = [
+    re.compile(pattern) for pattern in (
+        r";\s*select", r";\s*insert", r";\s*update", r";\s*delete",
+        r"--", r"/\*", r"\*/", r"xp_", r"sp_", r"exec\s+", r"execute\s+"
+    )
+]
+# Forbidden statements, matched on word boundaries to avoid false positives
+FORBIDDEN_OPERATION_PATTERNS = [
+    (operation, re.compile(r'\b' + operation + r'\b'), message) for operation, message in (
+        ("delete", "DELETE operations are not allowed"),
+        ("drop", "DROP operations are not allowed"),
+        ("alter", "ALTER operations are not allowed"),
+        ("truncate", "TRUNCATE operations are not allowed"),
+        ("update", "UPDATE operations are not allowed"),
+        ("insert", "INSERT operations are not allowed"),
+        ("create", "CREATE operations are not allowed"),
+        ("exec", "EXEC operations are not allowed"),
+    )
+]
+
+ERROR_CODE_PATTERN = re.compile(r'[\(\[](\d+)[\)\]]')
+MESSAGE_PATTERN = re.compile(r"(HumanMessage|AIMessage)\(content='(.*?)'[^)]*\)")
+ARABIC_PATTERN = re.compile("[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]")
+
+
+def shared_query_cache():
+    """Return the cache backend shared by all workers, or None if caching is per process."""
+    backend = get_cache_backend()
+    return backend if isinstance(backend, PostgresCacheBackend) else None
 
 def to_markdown(text):
     text = text.replace('•', '  *')
@@ -64,7 +130,7 @@ def get_cache_key(query: str, params: dict = None, user_id: str = None, user_rol
         str: Cache key as MD5 hash
     """
     # Normalize query by removing extra whitespace
-    normalized_query = re.sub(r'\s+', ' ', query.strip())
+    normalized_query = WHITESPACE_PATTERN.sub(' ', query.strip())
     
     # Create a hash of the query and parameters
     key_parts = [normalized_query]
@@ -78,7 +144,9 @@ def get_cache_key(query: str, params: dict = None, user_id: str = None, user_rol
     return hashlib.md5(''.join(key_parts).encode()).hexdigest()
 
 
-def get_cached_result(query: str, params: dict = None, user_id: str = None, user_role: str = None) -> Optional[Any]:
+def get_cached_result(
+    query: str, params: dict = None, user_id: str = None, user_role: str = None
+) -> Tuple[Optional[Any], Any]:
     """
     Get cached result for a query if available and not expired.
     
@@ -89,27 +157,36 @@ def get_cached_result(query: str, params: dict = None, user_id: str = None, user
         user_role: User role for role-specific caching
         
     Returns:
-        Optional[Any]: Cached result or None if not found or expired
+        Tuple[Optional[Any], Any]: Cached result or None if not found or expired, and the
+        shared cache version observed by the lookup, to pass to `cache_result`
     """
-    global query_cache
-    
     cache_key = get_cache_key(query, params, user_id, user_role)
     
-    if cache_key in query_cache:
-        entry = query_cache[cache_key]
-        # Check if entry is still valid
-        if time.time() - entry['timestamp'] < CACHE_TTL:
-            print(f"Cache hit for key: {cache_key}")
-            return entry['result']
-        else:
-            # Remove expired entry
-            del query_cache[cache_key]
+    # Expired entries are dropped by the cache on read
+    result = query_cache.get(cache_key, MISSING)
+    if result is not MISSING:
+        logger.debug(f"Cache hit for key: {cache_key}")
+        return result, None
+    
+    # Fall back to the results cached by other workers
+    shared = shared_query_cache()
+    version = None
+    if shared is not None:
+        result, version = run_sync(
+            shared.get(QUERY_CACHE_NAMESPACE, user_id or "", "query", {"key": cache_key}), default=(None, None)
+        )
+        if result is not None:
+            logger.debug(f"Shared cache hit for key: {cache_key}")
+            query_cache.set(cache_key, result)
+            return result, version
             
-    print(f"Cache miss for key: {cache_key}")
-    return None
+    logger.debug(f"Cache miss for key: {cache_key}")
+    return None, version
 
 
-def cache_result(query: str, result: Any, params: dict = None, user_id: str = None, user_role: str = None) -> Any:
+def cache_result(
+    query: str, result: Any, params: dict = None, user_id: str = None, user_role: str = None, version: Any = None
+) -> Any:
     """
     Cache the result of a query.
     
@@ -119,40 +196,37 @@ def cache_result(query: str, result: Any, params: dict = None, user_id: str = No
         params: Query parameters
         user_id: User ID for role-specific caching
         user_role: User role for role-specific caching
+        version: Shared cache version returned by `get_cached_result` before the query ran
         
     Returns:
         Any: The result (unchanged)
     """
-    global query_cache
-    
     cache_key = get_cache_key(query, params, user_id, user_role)
     
-    query_cache[cache_key] = {
-        'result': result,
-        'timestamp': time.time()
-    }
+    # The cache evicts least recently used entries to stay within its entry and byte limits
+    if not query_cache.set(cache_key, result):
+        logger.info(f"Result too large to cache for key: {cache_key}")
+        return result
     
-    # Perform cache maintenance if needed
-    if len(query_cache) > 1000:  # Arbitrary limit
-        maintain_cache()
+    # Share the result with the other workers
+    shared = shared_query_cache()
+    if shared is not None:
+        run_sync(shared.set(QUERY_CACHE_NAMESPACE, user_id or "", "query", {"key": cache_key}, result, version))
         
     return result
 
 
-def maintain_cache():
+def maintain_cache(max_items: int = 500) -> int:
     """
     Perform cache maintenance by removing expired entries.
-    """
-    global query_cache
-    
-    current_time = time.time()
-    expired_keys = [
-        k for k, v in query_cache.items() 
-        if current_time - v['timestamp'] >= CACHE_TTL
-    ]
     
-    for key in expired_keys:
-        del query_cache[key]
+    Args:
+        max_items: Maximum number of entries to examine in this pass
+        
+    Returns:
+        int: Number of expired entries removed
+    """
+    return query_cache.sweep(max_items)
 
 
 def adapt_query_for_linked_server(query: str) -> str:
@@ -168,28 +242,12 @@ def adapt_query_for_linked_server(query: str) -> str:
     # Get linked server name from environment variable with fallback
     linked_server = os.getenv("MOSEFAK_LINKED_SERVER_NAME", "mosefak-linked-server")
     
-    # Replace direct database references with linked server syntax
-    import re
-    
     # Replace table references in FROM and JOIN clauses
-    query = re.sub(
-        r'\[mosefak-app\]\.\[dbo\]\.(\[[\w-]+\])',
-        f'[{linked_server}].[mosefak-app].[dbo].\\1',
-        query
-    )
+    query = LINKED_SERVER_QUALIFIED_PATTERN.sub(f'[{linked_server}].[mosefak-app].[dbo].\\1', query)
     
     # Handle unbracketed references
-    query = re.sub(
-        r'FROM\s+(\w+)',
-        f'FROM [{linked_server}].[mosefak-app].[dbo].\\1',
-        query
-    )
-    
-    query = re.sub(
-        r'JOIN\s+(\w+)',
-        f'JOIN [{linked_server}].[mosefak-app].[dbo].\\1',
-        query
-    )
+    query = LINKED_SERVER_FROM_PATTERN.sub(f'FROM [{linked_server}].[mosefak-app].[dbo].\\1', query)
+    query = LINKED_SERVER_JOIN_PATTERN.sub(f'JOIN [{linked_server}].[mosefak-app].[dbo].\\1', query)
     
     return query
 
@@ -297,55 +355,28 @@ def validate_query_security(query: str, user_role: str = None) -> Tuple[bool, st
     # Admin users bypass most security checks but still protect against dangerous operations
     if user_role == "Admin":
         # Check for SQL injection patterns
-        sql_injection_patterns = [
-            r";\s*select", r";\s*insert", r";\s*update", r";\s*delete",
-            r"/\*", r"\*/", r"xp_cmdshell", r"sp_executesql"
-        ]
-        
-        for pattern in sql_injection_patterns:
-            if re.search(pattern, query_lower):
-                return False, f"Potential SQL injection detected: {pattern}"
+        for pattern in ADMIN_INJECTION_PATTERNS:
+            if pattern.search(query_lower):
+                return False, f"Potential SQL injection detected: {pattern.pattern}"
         
         # Check for extremely dangerous operations even for admin
-        dangerous_operations = [
-            r"\bdrop\s+database\b", r"\bdrop\s+server\b", 
-            r"\btruncate\s+table\b", r"\bdelete\s+from\b\s+.*\bwhere\b\s+1\s*=\s*1",
-            r"\bupdate\b\s+.*\bwhere\b\s+1\s*=\s*1"
-        ]
-        
-        for pattern in dangerous_operations:
-            if re.search(pattern, query_lower):
-                return False, f"Dangerous operation not allowed: {pattern}"
+        for keyword, pattern in ADMIN_DANGEROUS_OPERATION_PATTERNS:
+            if keyword in query_lower and pattern.search(query_lower):
+                return False, f"Dangerous operation not allowed: {pattern.pattern}"
         
         # Admin can perform other operations
         return True, "Query is safe to execute"
     
     # For non-admin users, apply strict security checks
     # Check for SQL injection patterns
-    sql_injection_patterns = [
-        r";\s*select", r";\s*insert", r";\s*update", r";\s*delete",
-        r"--", r"/\*", r"\*/", r"xp_", r"sp_", r"exec\s+", r"execute\s+"
-    ]
-    
-    for pattern in sql_injection_patterns:
-        if re.search(pattern, query_lower):
-            return False, f"Potential SQL injection detected: {pattern}"
+    for pattern in INJECTION_PATTERNS:
+        if pattern.search(query_lower):
+            return False, f"Potential SQL injection detected: {pattern.pattern}"
     
     # Check for forbidden operations
-    forbidden_operations = {
-        "delete": "DELETE operations are not allowed",
-        "drop": "DROP operations are not allowed",
-        "alter": "ALTER operations are not allowed",
-        "truncate": "TRUNCATE operations are not allowed",
-        "update": "UPDATE operations are not allowed",
-        "insert": "INSERT operations are not allowed",
-        "create": "CREATE operations are not allowed",
-        "exec": "EXEC operations are not allowed"
-    }
-    
-    for operation, message in forbidden_operations.items():
-        # Use word boundary to avoid false positives
-        if re.search(r'\b' + operation + r'\b', query_lower):
+    # A regex starting with \b has no literal prefix to scan for, so only run it when the word occurs
+    for operation, pattern, message in FORBIDDEN_OPERATION_PATTERNS:
+        if operation in query_lower and pattern.search(query_lower):
             return False, message
     
     # Validate basic SQL syntax
@@ -363,12 +394,12 @@ def validate_query_security(query: str, user_role: str = None) -> Tuple[bool, st
     return True, "Query is safe to execute"
 
 
-def execute_parameterized_query(conn, query: str, params: dict = None, user_id: str = None, user_role: str = None):
+def execute_parameterized_query(db, query: str, params: dict = None, user_id: str = None, user_role: str = None):
     """
     Execute a SQL query using parameterization to prevent SQL injection.
     
     Args:
-        conn: Database connection
+        db: SQL Server connection pool
         query: SQL query with parameter placeholders
         params: Dictionary of parameter values
         user_id: User ID for role-specific caching
@@ -381,7 +412,7 @@ def execute_parameterized_query(conn, query: str, params: dict = None, user_id:
         return "No data available."
     
     # Check cache first
-    cached_result = get_cached_result(query, params, user_id, user_role)
+    cached_result, cache_version = get_cached_result(query, params, user_id, user_role)
     if cached_result is not None:
         return cached_result
         
@@ -390,7 +421,7 @@ def execute_parameterized_query(conn, query: str, params: dict = None, user_id:
     if not is_safe:
         return f"Blocked due to security policy: {message}"
     
-    try:
+    def run(conn):
         with conn.cursor() as cursor:
             if params:
                 cursor.execute(query, params)
@@ -398,23 +429,27 @@ def execute_parameterized_query(conn, query: str, params: dict = None, user_id:
                 cursor.execute(query)
             
             result = cursor.fetchall()
-            processed_result = [tuple(row) for row in result]
-            
-            # Cache the result
-            cache_result(query, processed_result, params, user_id, user_role)
-            
-            return processed_result
+            return [tuple(row) for row in result]
+    
+    try:
+        # Run on a pooled connection, retrying transient failures on a fresh one
+        processed_result = db.run(run)
+        
+        # Cache the result
+        cache_result(query, processed_result, params, user_id, user_role, cache_version)
+        
+        return processed_result
     except Exception as e:
         error_result = handle_query_error(e, query, user_role=user_role)
         return error_result
 
 
-def execute_query(conn, query, user_id=None, user_role=None):
+def execute_query(db, query, user_id=None, user_role=None):
     """
     Wrapper function for execute_parameterized_query with linked server support.
     
     Args:
-        conn: Database connection
+        db: SQL Server connection pool
         query: SQL query string
         user_id: User ID for role-specific filtering and caching
         user_role: User role for permission-based query execution
@@ -430,7 +465,7 @@ def execute_query(conn, query, user_id=None, user_role=None):
         adapted_query = inject_user_context(adapted_query, user_id, user_role)
     
     # Execute the query with enhanced security and error handling
-    return execute_parameterized_query(conn, adapted_query, None, user_id, user_role)
+    return execute_parameterized_query(db, adapted_query, None, user_id, user_role)
 
 
 def handle_query_error(error, query, max_retries=3, user_role=None):
@@ -551,7 +586,7 @@ def extract_error_code(error_message):
         int: Error code if found, None otherwise
     """
     # Look for patterns like (42S02) or [42S02] in error messages
-    match = re.search(r'[\(\[](\d+)[\)\]]', error_message)
+    match = ERROR_CODE_PATTERN.search(error_message)
     if match:
         return int(match.group(1))
     return None
@@ -703,7 +738,7 @@ def query_as_list(db, query, user_id=None, user_role=None):
     Execute a query and return results as a list with enhanced error handling.
     
     Args:
-        db: Database connection
+        db: SQL Server connection pool
         query: SQL query
         user_id: User ID for role-specific caching
         user_role: User role for role-specific caching
@@ -719,12 +754,16 @@ def query_as_list(db, query, user_id=None, user_role=None):
         if user_id and user_role:
             adapted_query = inject_user_context(adapted_query, user_id, user_role)
             
-        cursor = db.cursor()
-        cursor.execute(adapted_query)
-        res = cursor.fetchall() or []  # Ensure it's always a list
-        cursor.close()
+        def run(conn):
+            cursor = conn.cursor()
+            cursor.execute(adapted_query)
+            rows = cursor.fetchall() or []  # Ensure it's always a list
+            cursor.close()
+            return rows
+        
+        res = db.run(run)
 
-        print(f"Raw query result: {res}")  # Debugging line
+        logger.debug(f"Raw query result: {res}")
 
         # Convert rows to a list of tuples (ensuring it's JSON serializable)
         cleaned_rows = [tuple(row) for row in res]
@@ -737,20 +776,19 @@ def query_as_list(db, query, user_id=None, user_role=None):
         return handle_query_error(e, query, user_role=user_role)
 
 
-def query_doctors_from_db(db, user_id=None, user_role=None) -> List[Tuple]:
+def fetch_doctor_rows(db, user_id=None, user_role=None):
     """
-    Query the database for doctor information with dynamic database name.
+    Query the database for the raw doctor directory rows with dynamic database name.
     
     Args:
-        db: Database connection
+        db: SQL Server connection pool
         user_id: User ID for role-specific caching
         user_role: User role for role-specific caching
         
     Returns:
-        List[Tuple]: Doctor information as tuples or error message
+        List[Tuple]: One row per doctor (name, working days, street, city, country, specializations)
+        or an error message string
     """
-    import os
-    
     # Get database name from environment variable with fallback
     db_name = os.getenv("MOSEFAK_APP_DATABASE_NAME", "mosefak-management")
     
@@ -789,17 +827,41 @@ def query_doctors_from_db(db, user_id=None, user_role=None) -> List[Tuple]:
             GROUP BY u.FirstName, u.LastName, ca.Street, ca.City, ca.Country;
         """
         
-        query_result = query_as_list(db, query, user_id, user_role)
-        
-        # Format doctor information into a readable string
-        formatted_output = format_doctors(query_result)
-        
-        return formatted_output
+        return query_as_list(db, query, user_id, user_role)
     except Exception as e:
         error_info = handle_query_error(e, query if 'query' in locals() else "Unknown query", user_role=user_role)
         return f"Error retrieving doctor information: {error_info}"
 
 
+def query_doctors_from_db(db, user_id=None, user_role=None) -> List[Tuple]:
+    """
+    Query the database for doctor information with dynamic database name.
+    
+    Args:
+        db: SQL Server connection pool
+        user_id: User ID for role-specific caching
+        user_role: User role for role-specific caching
+        
+    Returns:
+        List[Tuple]: Doctor information as tuples or error message
+    """
+    # Format doctor information into a readable string
+    return format_doctors(fetch_doctor_rows(db, user_id, user_role))
+
+
+def format_doctor(doctor) -> str:
+    """
+    Format a single doctor row into a human-readable sentence.
+    
+    Args:
+        doctor: Doctor row (name, working days, street, city, country, specializations)
+        
+    Returns:
+        str: Formatted doctor information
+    """
+    return f"{doctor[0]} is working on {doctor[1]} at {doctor[2]}, {doctor[3]}, {doctor[4]}, specializes in {doctor[5]}"
+
+
 def format_doctors(doctors) -> str:
     """
     Format doctor information into a human-readable string.
@@ -821,10 +883,7 @@ def format_doctors(doctors) -> str:
         return "No doctors available."
 
     try:
-        return "\n".join([
-            f"{doctor[0]} is working on {doctor[1]} at {doctor[2]}, {doctor[3]}, {doctor[4]}, specializes in {doctor[5]}"
-            for doctor in doctors
-        ])
+        return "\n".join([format_doctor(doctor) for doctor in doctors])
     except Exception as e:
         return f"Error formatting doctor information: {str(e)}"
 
@@ -840,11 +899,8 @@ def extract_messages(input_string):
             - human_messages: List of human messages.
             - ai_messages: List of AI messages.
     """
-    # Regex pattern to match HumanMessage and AIMessage content
-    pattern = r"(HumanMessage|AIMessage)\(content='(.*?)'[^)]*\)"
-
-    # Find all matches
-    matches = re.findall(pattern, input_string)
+    # Find all HumanMessage and AIMessage contents
+    matches = MESSAGE_PATTERN.findall(input_string)
 
     # Separate variables for human and AI messages
     human_messages = []
@@ -866,6 +922,7 @@ def extract_messages(input_string):
     return structured_conversation
 
 
+@timed("faiss", "build")
 def create_faiss_index(text: str, embeddings: Any) -> FAISS:
     """
     Process raw text into Document objects and split them into chunks.
@@ -883,6 +940,7 @@ def create_faiss_index(text: str, embeddings: Any) -> FAISS:
     return faiss_index
 
 
+@timed("retrieval", "retrieval_qa")
 def retrieve_context(faiss_index: FAISS, query: str, llm) -> Dict[str, str]:
     """
     Retrieve relevant context from the FAISS index.
@@ -900,6 +958,24 @@ def retrieve_context(faiss_index: FAISS, query: str, llm) -> Dict[str, str]:
     return retrieval_qa.invoke(query)
 
 
+@timed("retrieval", "retrieval_qa")
+async def aretrieve_context(faiss_index: FAISS, query: str, llm) -> Dict[str, str]:
+    """
+    Asynchronously retrieve relevant context from the FAISS index.
+
+    Parameters:
+    - faiss_index (FAISS): The FAISS index.
+    - query (str): The query to search for.
+    - llm: Language model for generating responses.
+
+    Returns:
+    - Dict[str, str]: Retrieved context.
+    """
+    retriever = faiss_index.as_retriever()
+    retrieval_qa = RetrievalQA.from_llm(llm=llm, retriever=retriever)
+    return await retrieval_qa.ainvoke(query, config=INTERNAL_RUN_CONFIG)
+
+
 def generate_response(
     system_message: ChatPromptTemplate,
     messages: List[Any],
@@ -945,17 +1021,7 @@ def generate_response(
     return chain.invoke(input_data)
 
 
-def translate_question(question: str, llm: Any):
-    """
-    Translate a question to English.
-    
-    Args:
-        question: Question in any language
-        llm: Language model
-        
-    Returns:
-        str: Translated question in English
-    """
+def _translation_chain(llm: Any):
     prompt = PromptTemplate(
         input_variables=["question"],
         template=
@@ -965,16 +1031,45 @@ def translate_question(question: str, llm: Any):
         """,
     )
 
-    rag_chain = (
+    return (
         RunnablePassthrough()
         | prompt
         | llm
         | StrOutputParser()
     )
 
-    response = rag_chain.invoke({"question": question})
 
-    print("Translated Q: ", response)
+def translate_question(question: str, llm: Any):
+    """
+    Translate a question to English.
+    
+    Args:
+        question: Question in any language
+        llm: Language model
+        
+    Returns:
+        str: Translated question in English
+    """
+    response = _translation_chain(llm).invoke({"question": question})
+
+    logger.info(f"Translated Q: {response}")
+    return response
+
+
+async def atranslate_question(question: str, llm: Any):
+    """
+    Asynchronously translate a question to English.
+    
+    Args:
+        question: Question in any language
+        llm: Language model
+        
+    Returns:
+        str: Translated question in English
+    """
+    response = await _translation_chain(llm).ainvoke({"question": question}, config=INTERNAL_RUN_CONFIG)
+
+    logger.info(f"Translated Q: {response}")
     return response
 
 
@@ -988,8 +1083,7 @@ def contains_arabic(text: str) -> bool:
     Returns:
         bool: True if text contains Arabic characters
     """
-    arabic_pattern = re.compile("[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]+")
-    return bool(arabic_pattern.search(text))
+    return ARABIC_PATTERN.search(text) is not None
 
 
 def is_safe_sql_query(query):
@@ -1005,17 +1099,7 @@ def is_safe_sql_query(query):
     return validate_query_security(query)
 
 
-def classify_query_intent(question: str, llm: Any) -> str:
-    """
-    Classify the intent of a user's question for better SQL generation.
-    
-    Args:
-        question: User's question
-        llm: Language model
-        
-    Returns:
-        str: Query intent classification
-    """
+def _query_intent_chain(llm: Any):
     prompt = PromptTemplate(
         input_variables=["question"],
         template=
@@ -1032,15 +1116,15 @@ def classify_query_intent(question: str, llm: Any) -> str:
         Intent:""",
     )
 
-    chain = (
+    return (
         RunnablePassthrough()
         | prompt
         | llm
         | StrOutputParser()
     )
 
-    response = chain.invoke({"question": question})
-    
+
+def _normalize_query_intent(response: str) -> str:
     # Clean up and normalize the response
     intent = response.strip().upper()
     
@@ -1055,6 +1139,102 @@ def classify_query_intent(question: str, llm: Any) -> str:
     return "SIMPLE"
 
 
+def classify_query_intent(question: str, llm: Any) -> str:
+    """
+    Classify the intent of a user's question for better SQL generation.
+    
+    Args:
+        question: User's question
+        llm: Language model
+        
+    Returns:
+        str: Query intent classification
+    """
+    response = _query_intent_chain(llm).invoke({"question": question})
+    return _normalize_query_intent(response)
+
+
+async def aclassify_query_intent(question: str, llm: Any) -> str:
+    """
+    Asynchronously classify the intent of a user's question for better SQL generation.
+    
+    Args:
+        question: User's question
+        llm: Language model
+        
+    Returns:
+        str: Query intent classification
+    """
+    response = await _query_intent_chain(llm).ainvoke({"question": question}, config=INTERNAL_RUN_CONFIG)
+    return _normalize_query_intent(response)
+
+
+# Keyword rules for local query intent detection, checked in order
+QUERY_INTENT_RULES = [
+    ("GROUPING", re.compile(
+        r"\b(each|per|grouped|group by|breakdown|broken down|by (?:doctor|clinic|city|specialization|month|day|status|type))\b|لكل",
+        re.IGNORECASE
+    )),
+    ("AGGREGATION", re.compile(
+        r"\b(how many|how much|count|number of|total|sum|average|avg|mean|maximum|minimum|max|min)\b|كم|عدد|مجموع|متوسط",
+        re.IGNORECASE
+    )),
+    ("SORTING", re.compile(
+        r"\b(sort|sorted|order by|in order|ordered|latest|earliest|newest|oldest|top \d+|highest|lowest|most recent)\b|ترتيب|أحدث|أقدم",
+        re.IGNORECASE
+    )),
+]
+
+QUERY_INTENT_ENTITY_PATTERN = re.compile(
+    r"\b(doctor|patient|appointment|clinic|specialization|specialty|review|award|education|experience|"
+    r"notification|payment|schedule|working time|period)s?\b",
+    re.IGNORECASE
+)
+
+# Conditions on column values: comparisons, statuses, date ranges and named values.
+# Bare prepositions ("for", "in", "on") are not enough; almost every question has one
+QUERY_INTENT_FILTER_PATTERN = re.compile(
+    r"\b(?:where|whose|more than|less than|greater than|fewer than|higher than|lower than|at least|at most|"
+    r"equal to|(?:over|under|above|below|exceeding)\s+\$?\d+|between\s+\S+\s+and|"
+    r"(?:after|before|since|until)\s+(?:\d+|the\b|last\b|next\b|this\b|today|yesterday|tomorrow|"
+    r"jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)|"
+    r"(?:this|last|next|past)\s+(?:\d+\s+)?(?:day|week|month|year)s?|today|yesterday|tomorrow|"
+    r"in\s+(?:\d{4}|january|february|march|april|may|june|july|august|september|october|november|december)|"
+    r"pending|paid|unpaid|cancell?ed|confirmed|completed|unread|upcoming|failed|refunded|"
+    r"named|called|specialized in|located in|rated|rating)\b"
+    r"|[<>]=?|!=|أكثر من|أقل من|بين|بعد|قبل|منذ|اليوم|غدا|أمس|هذا الأسبوع|هذا الشهر|حالة|غير مقروءة|ملغ",
+    re.IGNORECASE
+)
+
+
+def detect_query_intent(question: str) -> str:
+    """
+    Classify the intent of a database question with local keyword rules.
+    
+    This replaces the separate LLM round-trip of `classify_query_intent` on the
+    SQL path; the categories are the same.
+    
+    Args:
+        question: User's question
+        
+    Returns:
+        str: Query intent classification
+    """
+    for intent, pattern in QUERY_INTENT_RULES:
+        if pattern.search(question):
+            return intent
+    
+    # Questions touching more than one entity usually need a join
+    entities = {match.lower().rstrip("s") for match in QUERY_INTENT_ENTITY_PATTERN.findall(question)}
+    if len(entities) > 1:
+        return "JOINING"
+    
+    if QUERY_INTENT_FILTER_PATTERN.search(question):
+        return "FILTERING"
+    
+    return "SIMPLE"
+
+
 def get_example_queries(intent: str, user_role: str) -> str:
     """
     Get example queries for a specific intent and user role.
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Exemplar questions per category, taken from the classify_user_intent prompt
+INTENT_EXEMPLARS: Dict[str, List[str]] = {
+    "query_related": [
+        "How many patients visited the clinic last month?",
+        "Show me the appointment schedule for Dr. Smith.",
+        "List all available doctors next Monday.",
+        "I need to know information about my profile",
+    ],
+    "medical_related": [
+        "What are the symptoms of diabetes?",
+        "How can I lower my blood pressure?",
+        "What is the treatment for migraines?",
+        "Hi, How are you?",
+        "Hello!",
+    ],
+    "doctor_recommendation_related": [
+        "I have chest pain and feel dizzy. Which doctor should I see?",
+        "My child has a rash. Can you recommend a doctor?",
+        "I need an eye specialist for blurry vision.",
+        "Which doctor should I visit for stomach pain?",
+    ],
+    "system_flow_related": [
+        "How do I book an appointment on this app?",
+        "Where can I find my medical history in the system?",
+        "How do I change my profile settings?",
+        "What does the \"Notifications\" tab do?",
+        "How do I log out of the app?",
+    ],
+    "out_of_scope": [
+        "How do I learn programming?",
+        "What's the weather like today?",
+        "Can you help me with my homework?",
+        "Tell me about the history of Egypt.",
+        "How do I cook pasta?",
+    ],
+}
+
+
+class IntentRouter:
+    """
+    Routes a question to a workflow category by embedding similarity.
+
+    Each category is represented by its exemplar questions. A question is scored
+    against every category by its nearest exemplar, and the top category is used
+    only when it is similar enough and clearly ahead of the runner-up; otherwise
+    the caller falls back to LLM classification.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        exemplars: Dict[str, List[str]] = INTENT_EXEMPLARS,
+        margin: float = 0.05,
+        min_similarity: float = 0.6,
+    ):
+        """
+        Args:
+            embeddings: Embeddings model (ideally cached) used for exemplars and questions.
+            exemplars: Exemplar questions per category.
+            margin: Minimum score gap between the top two categories.
+            min_similarity: Minimum cosine similarity of the top category.
+        """
+        self.embeddings = embeddings
+        self.exemplars = exemplars
+        self.margin = margin
+        self.min_similarity = min_similarity
+
+        self._labels: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    async def _ensure_exemplars(self) -> None:
+        if self._matrix is not None:
+            return
+
+        async with self._lock:
+            if self._matrix is not None:
+                return
+
+            labels, texts = [], []
+            for category, questions in self.exemplars.items():
+                labels.extend([category] * len(questions))
+                texts.extend(questions)
+
+            vectors = await self.embeddings.aembed_documents(texts)
+            self._labels = labels
+            self._matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+
+    def _score(self, vector: List[float]) -> List[Tuple[str, float]]:
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+        similarities = self._matrix @ query
+
+        scores: Dict[str, float] = {}
+        for label, similarity in zip(self._labels, similarities):
+            if similarity > scores.get(label, -1.0):
+                scores[label] = float(similarity)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    async def aroute(self, question: str) -> Optional[str]:
+        """
+        Pick a category for the question without calling the LLM.
+
+        Args:
+            question: The user's question.
+
+        Returns:
+            Optional[str]: The category, or None if the match is not confident enough.
+        """
+        try:
+            await self._ensure_exemplars()
+            vector = await self.embeddings.aembed_query(question.strip())
+        except Exception as e:
+            logger.error(f"Intent router embedding failed, falling back to the LLM: {e}")
+            return None
+
+        ranked = self._score(vector)
+        (top_label, top_score), second_score = ranked[0], ranked[1][1] if len(ranked) > 1 else -1.0
+
+        if top_score < self.min_similarity or top_score - second_score < self.margin:
+            logger.info(f"Intent router not confident ({top_label}: {top_score:.3f}, margin {top_score - second_score:.3f})")
+            return None
+
+        logger.info(f"Intent router selected {top_label} ({top_score:.3f}, margin {top_score - second_score:.3f})")
+        return top_label
@@ -0,0 +1,113 @@
+import asyncio
+import inspect
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+class MaintenanceScheduler:
+    """
+    Runs periodic maintenance jobs on the application's event loop.
+
+    Each job runs in its own task every `interval` seconds, so a slow job never
+    delays the others. Jobs are expected to do bounded work per run (e.g. sweep
+    at most N cache entries); a failing run is logged and retried on the next
+    tick. The outcome of every job's last run is kept for the health endpoint.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def add_job(self, name: str, func: Job, interval: float, run_immediately: bool = False) -> None:
+        """
+        Register a job.
+
+        Args:
+            name: Unique job name, used in the stats.
+            func: Callable (sync or async) doing one bounded unit of work.
+            interval: Seconds between runs.
+            run_immediately: Run once right after start instead of waiting a full interval.
+        """
+        self._jobs[name] = {
+            "func": func,
+            "interval": interval,
+            "run_immediately": run_immediately,
+            "stats": {
+                "interval_seconds": interval,
+                "runs": 0,
+                "failures": 0,
+                "last_run": None,
+                "last_duration_ms": None,
+                "last_result": None,
+                "last_error": None,
+            },
+        }
+
+    async def run_job(self, name: str) -> Optional[Any]:
+        """
+        Run a job once and record its stats.
+
+        Args:
+            name: The job name.
+
+        Returns:
+            The job's result, or None if it failed.
+        """
+        job = self._jobs[name]
+        stats = job["stats"]
+        started = time.perf_counter()
+        result = None
+
+        try:
+            outcome = job["func"]()
+            if inspect.isawaitable(outcome):
+                outcome = await outcome
+            result = outcome
+            stats["last_error"] = None
+        except Exception as e:
+            stats["failures"] += 1
+            stats["last_error"] = str(e)
+            logger.error(f"Maintenance job '{name}' failed: {e}")
+        finally:
+            stats["runs"] += 1
+            stats["last_run"] = datetime.now().isoformat()
+            stats["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            stats["last_result"] = result
+        return result
+
+    async def _loop(self, name: str) -> None:
+        job = self._jobs[name]
+        if not job["run_immediately"]:
+            await asyncio.sleep(job["interval"])
+
+        while True:
+            await self.run_job(name)
+            await asyncio.sleep(job["interval"])
+
+    def start(self) -> None:
+        """Start every registered job on the running event loop."""
+        for name in self._jobs:
+            if name not in self._tasks or self._tasks[name].done():
+                self._tasks[name] = asyncio.create_task(self._loop(name), name=f"maintenance:{name}")
+        logger.info(f"Maintenance scheduler started with jobs: {', '.join(self._jobs)}")
+
+    async def stop(self) -> None:
+        """Cancel all running jobs and wait for them to finish."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        """Return the last-run stats of every job."""
+        return {
+            name: {**job["stats"], "running": name in self._tasks and not self._tasks[name].done()}
+            for name, job in self._jobs.items()
+        }
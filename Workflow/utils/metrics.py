@@ -0,0 +1,271 @@
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add `amount` to the series selected by the labels."""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation in the series selected by the labels."""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """Return (count, sum) of every series, keyed by its label values."""
+        with self._lock:
+            return {key: (count, total) for key, (_, total, count) in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, str(bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, '+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics, rendered together for the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Return the counter with this name, creating it on first use."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Return the histogram with this name, creating it on first use."""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = MetricsRegistry()
+
+SPAN_SECONDS = registry.histogram(
+    "mosefak_span_duration_seconds",
+    "Duration of workflow nodes, steps and external calls.",
+    ("kind", "name", "status")
+)
+LLM_CALL_SECONDS = registry.histogram(
+    "mosefak_llm_call_duration_seconds",
+    "Duration of LLM calls by model and the workflow node that made them.",
+    ("model", "node", "status")
+)
+LLM_TOKENS = registry.counter(
+    "mosefak_llm_tokens_total",
+    "Tokens used by LLM calls, by model, node and direction (input or output).",
+    ("model", "node", "direction")
+)
+CHECKPOINT_ROWS_DELETED = registry.counter(
+    "mosefak_checkpoint_rows_deleted_total",
+    "Checkpointer rows deleted, by table and reason (retention, orphaned_blob, deleted_chat or orphaned_thread).",
+    ("table", "reason")
+)
+CHECKPOINT_THREADS_COMPACTED = registry.counter(
+    "mosefak_checkpoint_threads_compacted_total",
+    "Threads whose checkpoints were trimmed to the retention limit."
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "mosefak_http_request_duration_seconds",
+    "Time until the response starts, by method, route and status code.",
+    ("method", "route", "status")
+)
+
+# Name of the span the current task is in, so nested spans can be logged with their parent
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(kind: str, name: str) -> Iterator[None]:
+    """
+    Time a block of work and record it in the span histogram.
+
+    Works in sync and async code; each finished span is also logged at debug
+    level as a structured line with its parent span.
+
+    Args:
+        kind: Category of work, e.g. "node", "step", "sql_server", "postgres", "faiss" or "embeddings".
+        name: Name of the node, step or call.
+    """
+    path = f"{kind}:{name}"
+    parent = _current_span.get()
+    token = _current_span.set(path)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        _current_span.reset(token)
+        SPAN_SECONDS.observe(duration, kind=kind, name=name, status=status)
+        logger.debug(f"span={path} parent={parent or '-'} status={status} duration_ms={duration * 1000:.1f}")
+
+
+def timed(kind: str, name: Optional[str] = None):
+    """
+    Decorator recording every call of a sync or async function as a span.
+
+    Args:
+        kind: Category of work.
+        name: Span name (defaults to the function's name).
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(kind, span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    Records the latency and token usage of every call made through a chat model.
+
+    Calls are labelled with the LangGraph node they run in, so the cost of
+    classification, SQL generation and answer generation can be told apart.
+    """
+
+    def __init__(self, model: str):
+        """
+        Args:
+            model: Model name used as the metrics label.
+        """
+        self.model = str(model)
+        self._runs: Dict[Any, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, metadata: Optional[dict]) -> None:
+        node = (metadata or {}).get("langgraph_node", "-")
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), str(node))
+
+    def _finish(self, run_id, status: str) -> Optional[str]:
+        with self._lock:
+            started, node = self._runs.pop(run_id, (None, "-"))
+        if started is not None:
+            LLM_CALL_SECONDS.observe(time.perf_counter() - started, model=self.model, node=node, status=status)
+        return node
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs) -> None:
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs) -> None:
+        self._start(run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        node = self._finish(run_id, "ok")
+
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+        if not usage:
+            usage = (response.llm_output or {}).get("usage_metadata") or {}
+
+        for direction in ("input", "output"):
+            tokens = usage.get(f"{direction}_tokens")
+            if tokens:
+                LLM_TOKENS.inc(tokens, model=self.model, node=node, direction=direction)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._finish(run_id, "error")
@@ -1,23 +1,33 @@
+import asyncio
 import os
 import sys
 from dotenv import load_dotenv
+from langchain_core.messages import RemoveMessage
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langgraph.config import get_stream_writer
+from langgraph.graph import END
 from langsmith import traceable
 
 load_dotenv()
 
-from Workflow.utils.config import Config
+from Workflow.utils.config import get_config
+from Workflow.utils.conversation import conversation_window, estimate_tokens, message_text, render_turns, window_questions
 from Workflow.utils.helper_functions import (
-    contains_arabic, create_faiss_index, execute_query, extract_messages, 
-    format_doctors, query_doctors_from_db, remove_sql_block, retrieve_context, 
-    translate_question, process_query_results, validate_query_security,
-    get_cache_key, get_cached_result, cache_result, classify_query_intent,
+    INTERNAL_RUN_CONFIG, contains_arabic, execute_query, 
+    remove_sql_block, aretrieve_context, 
+    atranslate_question, process_query_results, validate_query_security,
+    aclassify_query_intent, detect_query_intent,
     get_example_queries, handle_query_error
 )
+from Workflow.utils.doctor_directory import DoctorDirectory
+from Workflow.utils.intent_router import IntentRouter
+from Workflow.utils.metrics import span
+from Workflow.utils.schema_index import load_relevant_tables_info
+from Workflow.utils.sql_cache import SemanticSQLCache, is_follow_up
 from Workflow.utils.tables_info import load_tables_info
-from Workflow.utils.vector_store import load_faiss_index
+from Workflow.utils.vector_store import cached_embeddings, load_faiss_index
 from Workflow.utils.state import State
 
 import logging
@@ -26,19 +36,74 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-config = Config()
+config = get_config()
 
-mosefak_app_db = config.mosefak_app_db
+mosefak_app_pool = config.mosefak_app_pool
 llm = config.llm
 embeddings = config.embeddings
 MODEL_NAME = config.MODEL_NAME
 
-NUMBER_OF_LAST_MESSAGES = config.NUMBER_OF_LAST_MESSAGES
+CONVERSATION_WINDOW_MAX_TOKENS = config.CONVERSATION_WINDOW_MAX_TOKENS
+CONVERSATION_SUMMARY_TRIGGER_TOKENS = config.CONVERSATION_SUMMARY_TRIGGER_TOKENS
+CONVERSATION_SUMMARY_TARGET_TOKENS = config.CONVERSATION_SUMMARY_TARGET_TOKENS
+
+# Shared doctor directory index, built once and refreshed incrementally
+doctor_directory = DoctorDirectory(
+    mosefak_app_pool,
+    embeddings,
+    directory=config.DOCTOR_INDEX_PATH,
+    refresh_interval=config.DOCTOR_INDEX_REFRESH_SECONDS,
+    retry_interval=config.DOCTOR_INDEX_RETRY_SECONDS
+)
+
+# Local router that answers most classifications without an LLM call
+intent_router = IntentRouter(
+    cached_embeddings,
+    margin=config.INTENT_ROUTER_MARGIN,
+    min_similarity=config.INTENT_ROUTER_MIN_SIMILARITY
+) if config.INTENT_ROUTER_ENABLED else None
+
+# Generated SQL templates reused across users of the same role
+sql_cache = SemanticSQLCache(
+    cached_embeddings,
+    similarity_threshold=config.SQL_CACHE_SIMILARITY_THRESHOLD,
+    max_entries=config.SQL_CACHE_MAX_ENTRIES,
+    ttl=config.SQL_CACHE_TTL_SECONDS
+) if config.SQL_CACHE_ENABLED else None
+
+
+async def run_db(func, *args):
+    """
+    Run a blocking SQL Server call in a worker thread so it does not block the event loop.
+
+    Args:
+        func: Function taking the SQL Server connection pool as its first argument.
+        args: Remaining positional arguments for the function.
+
+    Returns:
+        The function's return value.
+    """
+    return await asyncio.to_thread(func, mosefak_app_pool, *args)
+
+
+def report_progress(status: str) -> None:
+    """
+    Emit a progress event on the graph's custom stream for streaming clients.
+
+    Args:
+        status: Short name of the step that is starting.
+    """
+    try:
+        get_stream_writer()({"status": status})
+    except Exception:
+        # Not running inside a streamed graph run
+        pass
 
 @traceable(metadata={"llm": MODEL_NAME})
-def classify_user_intent(state: State) -> str:
+async def classify_user_intent(state: State) -> str:
     """
-    Uses the LLM to classify the user question into one of five categories:
+    Classifies the user question into one of five categories, using the local
+    embedding router when it is confident and the LLM otherwise:
     - "query_related" for database queries and medical advice.
     - "medical_related" for medical advice or information
     - "doctor_recommendation_related" for doctor recommendations
@@ -51,11 +116,17 @@ def classify_user_intent(state: State) -> str:
     Returns:
         One of the five category strings.
     """
+    question = state["messages"][-1].content
 
-    messages = str(state["messages"][NUMBER_OF_LAST_MESSAGES:])
-    structured_conversation = extract_messages(messages)
+    if intent_router is not None:
+        with span("step", "intent_router"):
+            category = await intent_router.aroute(question)
+        if category:
+            state["category"] = category
+            logger.info(f"Query Category (router): {state['category']}")
+            return state["category"]
 
-    question = state["messages"][-1].content
+    structured_conversation = conversation_window(state["messages"], CONVERSATION_WINDOW_MAX_TOKENS, state.get("summary", ""))
 
     prompt_template = ChatPromptTemplate([
         (
@@ -116,24 +187,76 @@ def classify_user_intent(state: State) -> str:
         | StrOutputParser()
     )
 
-    response = chain.invoke(structured_conversation)
+    response = await chain.ainvoke(structured_conversation, config=INTERNAL_RUN_CONFIG)
     state["category"] = response
 
-    print("Query Category: ", state["category"])
+    logger.info(f"Query Category: {state['category']}")
     return state["category"]
 
+async def run_generated_query(cleaned_query: str, question: str, user_id: str, user_role: str):
+    """
+    Validate, execute and format a generated SQL query.
+
+    Args:
+        cleaned_query: The SQL query without its code block.
+        question: The user's question.
+        user_id: ID of the requesting user.
+        user_role: Role of the requesting user.
+
+    Returns:
+        Tuple[dict, bool]: The state update and whether the query ran successfully.
+    """
+    # If the generated SQL query is "Not Available", return an empty result
+    if cleaned_query.strip().lower() == "not available":
+        return {"SQLResult": "No data available for this request.", "SQLQuery": "Not Available"}, False
+    
+    # Validate query security
+    is_safe, message = validate_query_security(cleaned_query)
+    logger.info(f"validate_query_security: {message}")
+    if not is_safe:
+        error_result = {
+            "SQLResult": f"Query blocked: {message}",
+            "SQLQuery": cleaned_query,
+            "error": "Security violation"
+        }
+        return error_result, False
+        
+    # Execute the query with enhanced security and caching
+    with span("step", "sql_execution"):
+        query_result = await run_db(execute_query, cleaned_query, user_id, user_role)
+    
+    # Process and format the results
+    processed_result = process_query_results(
+        query_result, 
+        page=1, 
+        format_type="default",
+        original_question=question
+    )
+    
+    logger.info(f"Mosefak App SQL Result: {processed_result}")
+    
+    # Prepare the final result
+    result = {
+        "SQLResult": processed_result,
+        "SQLQuery": cleaned_query
+    }
+    
+    return result, isinstance(query_result, list)
+
 @traceable(metadata={"llm": MODEL_NAME, "embedding": "FAISS"})
-def write_and_execute_query(state: State):
+async def write_and_execute_query(state: State):
     """
     Enhanced SQL Database Chain with improved performance, security, and user experience.
     
     Enhancements:
-    - Query caching
+    - Semantic caching of generated SQL per role
     - Parameterized queries
     - Advanced error handling
     - Result processing and formatting
-    - Query intent classification
+    - Query intent classification (local rules by default)
     """
+    report_progress("querying_database")
+
     # Extract state information
     payload = state["payload"]
     user_role = payload.get("role")
@@ -143,32 +266,47 @@ def write_and_execute_query(state: State):
         return {"error": "Missing user role or ID."}
     
 
-    print("user_id: ", user_id)
-    print("payload: ", payload)
-    print("user_role: ", user_role)
-    print("type(user_role): ", type(user_role))
-    
-    # Load appropriate tables info based on role
-    tables_info = load_tables_info(role=user_role)
+    logger.debug(f"user_id: {user_id}, user_role: {user_role}, payload: {payload}")
     
     # Extract conversation history and question
-    messages = str(state["messages"][NUMBER_OF_LAST_MESSAGES:])
-    structured_conversation = extract_messages(messages)
+    structured_conversation = conversation_window(state["messages"], CONVERSATION_WINDOW_MAX_TOKENS, state.get("summary", ""))
     question = state["messages"][-1].content
     
-    # Check cache for similar questions
-    cache_key = f"{user_id}:{user_role}:{question}"
-    cached_result = get_cached_result(cache_key)
-    
-    if cached_result:
-        print("Cache hit: Using cached result")
-        return cached_result
-    
+    # Load the tables info for the role, pruned to the tables relevant to the question
+    if config.SCHEMA_PRUNING_ENABLED:
+        history = " ".join(window_questions(state["messages"], CONVERSATION_WINDOW_MAX_TOKENS))
+        tables_info = load_relevant_tables_info(user_role, question, history)
+    else:
+        tables_info = load_tables_info(role=user_role)
     
+    async def retrieve_doctor_context():
+        with span("step", "doctor_lookup"):
+            # Use the shared doctor directory index instead of embedding the doctor list per request
+            doctor_index, _ = await asyncio.to_thread(doctor_directory.get)
+
+            # Retrieve relevant context using the latest message
+            return await aretrieve_context(doctor_index, question, llm) if doctor_index else {"result": ""}
+
     try:
+        # Reuse SQL generated earlier for the same or an equivalent question; follow-ups
+        # depend on their conversation, so only standalone questions use the cache
+        use_sql_cache = sql_cache is not None and not (structured_conversation and is_follow_up(question))
+        cached_query = await sql_cache.alookup(question, user_role, user_id) if use_sql_cache else None
+        if cached_query:
+            logger.info("SQL cache hit: skipping query generation")
+            result, _ = await run_generated_query(cached_query, question, user_id, user_role)
+            return result
+
         # Classify query intent for better SQL generation
-        query_intent = classify_query_intent(question, llm)
-        print(f"Query intent classified as: {query_intent}")
+        async def classify_query_intent():
+            with span("step", "query_intent"):
+                if config.QUERY_INTENT_CLASSIFIER == "llm":
+                    return await aclassify_query_intent(question, llm)
+                return detect_query_intent(question)
+
+        # Overlap the intent classification with the doctor context retrieval
+        query_intent, context = await asyncio.gather(classify_query_intent(), retrieve_doctor_context())
+        logger.info(f"Query intent classified as: {query_intent}")
         
         # Get example queries for this intent and role
         examples = get_example_queries(query_intent, user_role)
@@ -277,17 +415,9 @@ def write_and_execute_query(state: State):
                 ("user", question)
             ])
 
-        # Query database for doctor information
-        proper_nouns = query_doctors_from_db(mosefak_app_db, user_id, user_role)
-
-        faiss_index = create_faiss_index(proper_nouns, embeddings)
-
-        # Retrieve relevant context using the latest message
-        context = retrieve_context(faiss_index, question, llm)
-
         context_text = (
             f"- **The Unique Values to correct user spelling or use for filters**:\n {context}"
-        ) if not any(word in context["result"].lower() for word in ["sorry", "عذرًا", "آسف", "نأسف", "متأسف"]) \
+        ) if context["result"] and not any(word in context["result"].lower() for word in ["sorry", "عذرًا", "آسف", "نأسف", "متأسف"]) \
         else ""
 
         input_data = {
@@ -300,9 +430,8 @@ def write_and_execute_query(state: State):
             "examples": examples
         }
 
-        print("Messages: ", messages)
-        print("________________________________________________________________________")
-        print("context_text: ", context_text)
+        logger.debug(f"Conversation window: {structured_conversation}")
+        logger.debug(f"context_text: {context_text}")
 
         # Generate response using the chain
         chain = (
@@ -313,51 +442,19 @@ def write_and_execute_query(state: State):
         )
 
         # Invoke the chain to get the AI-generated response
-        response = chain.invoke(input_data)
+        with span("step", "sql_generation"):
+            response = await chain.ainvoke(input_data, config=INTERNAL_RUN_CONFIG)
         logger.info("Successfully retrieved response from chain")
 
         cleaned_query = remove_sql_block(response)
         logger.info(f"MosefakApp_SQLQuery: {cleaned_query}")
 
-        # If the generated SQL query is "Not Available", return an empty result
-        if cleaned_query.strip().lower() == "not available":
-            result = {"SQLResult": "No data available for this request.", "SQLQuery": "Not Available"}
-            cache_result(cache_key, result)
-            return result
-        
-        # Validate query security
-        is_safe, message = validate_query_security(cleaned_query)
-        print("validate_query_security: ", message)
-        if not is_safe:
-            error_result = {
-                "SQLResult": f"Query blocked: {message}",
-                "SQLQuery": cleaned_query,
-                "error": "Security violation"
-            }
-            return error_result
-            
-        # Execute the query with enhanced security and caching
-        query_result = execute_query(mosefak_app_db, cleaned_query, user_id, user_role)
-        
-        # Process and format the results
-        processed_result = process_query_results(
-            query_result, 
-            page=1, 
-            format_type="default",
-            original_question=question
-        )
-        
-        logger.info(f"Mosefak App SQL Result: {processed_result}")
-        
-        # Prepare the final result
-        result = {
-            "SQLResult": processed_result,
-            "SQLQuery": cleaned_query
-        }
-        
-        # Cache the result
-        cache_result(cache_key, result)
-        
+        result, executed = await run_generated_query(cleaned_query, question, user_id, user_role)
+
+        # Only queries that passed validation and ran successfully are reused
+        if executed and use_sql_cache:
+            await sql_cache.astore(question, user_role, user_id, cleaned_query)
+
         return result
         
     except Exception as e:
@@ -366,7 +463,7 @@ def write_and_execute_query(state: State):
         return {"SQLResult": error_result, "SQLQuery": "Error", "error": str(e)}
 
 @traceable(metadata={"llm": MODEL_NAME})
-def generate_answer(state: State):
+async def generate_answer(state: State):
     """
     Generate a professional and structured response with enhanced formatting and explanations.
     
@@ -376,6 +473,8 @@ def generate_answer(state: State):
     - Rich formatting of results
     - Error explanation in user-friendly terms
     """
+    report_progress("generating_answer")
+
     # Check if there was an error in the SQL chain
     if "error" in state:
         error_info = state["error"]
@@ -396,7 +495,7 @@ def generate_answer(state: State):
         4. Maintains a professional and friendly tone
         """
         
-        response = llm.invoke(prompt)
+        response = await llm.ainvoke(prompt)
         return {"messages": [response]}
     
     # Process successful results
@@ -434,12 +533,12 @@ def generate_answer(state: State):
     {visualization_suggestion}
     """
 
-    response = llm.invoke(prompt)
-    print("LLM Generated Response:", response)
+    response = await llm.ainvoke(prompt)
+    logger.debug(f"LLM Generated Response: {response}")
     return {"messages": [response]}
 
 @traceable(metadata={"llm": MODEL_NAME})
-def question_answer(state: State):
+async def question_answer(state: State):
     """
     Provides empathetic and informative medical advice responses to user questions.
     
@@ -449,10 +548,11 @@ def question_answer(state: State):
     Returns:
         Updated state with the generated response.
     """
-    print("state['messages']", state["messages"])
+    report_progress("retrieving_medical_context")
+
+    logger.debug(f"state['messages']: {state['messages']}")
 
-    messages = str(state["messages"][NUMBER_OF_LAST_MESSAGES:])
-    structured_conversation = extract_messages(messages)
+    structured_conversation = conversation_window(state["messages"], CONVERSATION_WINDOW_MAX_TOKENS, state.get("summary", ""))
 
     question = state["messages"][-1].content
 
@@ -462,7 +562,7 @@ def question_answer(state: State):
 
     if is_arabic:
         response_langauge = "Arabic"
-        question = translate_question(question=question, llm=llm)
+        question = await atranslate_question(question=question, llm=llm)
 
     # Enhanced medical advice template with more empathetic and informative guidance
     prompt_template = ChatPromptTemplate([
@@ -511,14 +611,14 @@ def question_answer(state: State):
     ])
 
     faiss_index = load_faiss_index("faiss_index")
-    context = retrieve_context(faiss_index, question, llm)
+    context = await aretrieve_context(faiss_index, question, llm)
     
     sorry_words = ["sorry", "عذرًا", "آسف", "نأسف", "متأسف"]  
     context_text = (  
         f"- The Result from our data:\n {context['result']}" 
     ) if not any(word in context["result"].lower() for word in sorry_words) else " "
 
-    print("Retrieved Context: ", context["result"])
+    logger.debug(f"Retrieved Context: {context['result']}")
 
     chain = (
         RunnablePassthrough()
@@ -526,16 +626,18 @@ def question_answer(state: State):
         | llm
     )
 
-    response = chain.invoke({"context_text": context_text, "messages": structured_conversation, "response_langauge": response_langauge})
+    response = await chain.ainvoke({"context_text": context_text, "messages": structured_conversation, "response_langauge": response_langauge})
 
     return {"messages": [response]}
 
 @traceable(metadata={"llm": MODEL_NAME})
-def recommend_doctor(state: State):
+async def recommend_doctor(state: State):
     """
     Combines robust error handling, multilingual support, payload-based authorization,
     and FAISS‐based context retrieval to recommend doctors.
     """
+    report_progress("finding_doctors")
+
     # --- Extract and validate payload ---
     payload = state.get("payload", {})
     user_id = payload.get("user_id")
@@ -544,20 +646,19 @@ def recommend_doctor(state: State):
         return {"messages": ["Error: Missing user ID or role."]}
 
     # --- Prepare conversation history ---
-    raw_msgs = str(state["messages"][NUMBER_OF_LAST_MESSAGES:])
-    structured_conversation = extract_messages(raw_msgs)
+    structured_conversation = conversation_window(state["messages"], CONVERSATION_WINDOW_MAX_TOKENS, state.get("summary", ""))
     question = state["messages"][-1].content
 
     # --- Language detection & translation ---
     is_arabic = contains_arabic(question)
     response_language = "Arabic" if is_arabic else "English"
     if is_arabic:
-        question = translate_question(question=question, llm=llm)
+        question = await atranslate_question(question=question, llm=llm)
 
     try:
-        # --- Query doctor info with enhanced error check ---
-        doctors_info = query_doctors_from_db(mosefak_app_db, user_id, user_role)
-        if isinstance(doctors_info, str) and ("error" in doctors_info.lower() or "unable to access" in doctors_info.lower()):
+        # --- Get the shared doctor directory index and listing ---
+        doctor_index, doctors_info = await asyncio.to_thread(doctor_directory.get)
+        if doctor_index is None:
             if is_arabic:
                 return {"messages": ["""
                 عذراً، لا يمكنني الوصول إلى معلومات الأطباء في الوقت الحالي.
@@ -571,9 +672,8 @@ def recommend_doctor(state: State):
                 If symptoms are severe or persistent, please seek a specialist as soon as possible.
                 """]}
 
-        # --- Build FAISS index over the formatted doctor info and retrieve focused context ---
-        faiss_idx = create_faiss_index(doctors_info, embeddings)
-        context = retrieve_context(faiss_idx, question, llm).get("result", "")
+        # --- Retrieve focused context from the doctor directory index ---
+        context = (await aretrieve_context(doctor_index, question, llm)).get("result", "")
 
         # --- Assemble the system prompt with both raw list and retrieved snippet ---
         prompt_template = ChatPromptTemplate([
@@ -606,7 +706,7 @@ def recommend_doctor(state: State):
 
         # --- Invoke the LLM chain ---
         chain = RunnablePassthrough() | prompt_template | llm
-        response = chain.invoke({"messages": structured_conversation})
+        response = await chain.ainvoke({"messages": structured_conversation})
 
         return {"messages": [response]}
 
@@ -624,7 +724,7 @@ def recommend_doctor(state: State):
             """]}
 
 @traceable(metadata={"llm": MODEL_NAME})
-def system_flow_qa(state: State):
+async def system_flow_qa(state: State):
     """
     Handles system-related questions with enhanced error handling and multilingual support.
     
@@ -634,8 +734,9 @@ def system_flow_qa(state: State):
     Returns:
         Updated state with the generated response.
     """
-    messages = str(state["messages"][NUMBER_OF_LAST_MESSAGES:])
-    structured_conversation = extract_messages(messages)
+    report_progress("retrieving_system_guide")
+
+    structured_conversation = conversation_window(state["messages"], CONVERSATION_WINDOW_MAX_TOKENS, state.get("summary", ""))
     question = state["messages"][-1].content
 
     response_langauge = "English"
@@ -646,7 +747,7 @@ def system_flow_qa(state: State):
         response_langauge = "Arabic"
         if llm is None:
             raise ValueError("LLM is not initialized. Cannot translate question.")
-        question = translate_question(question=question, llm=llm)
+        question = await atranslate_question(question=question, llm=llm)
 
     try:
         # Load FAISS index and check if it’s valid
@@ -660,8 +761,8 @@ def system_flow_qa(state: State):
 
         # Retrieve context
         role_query = f"As a {user_role}, {question}"
-        context = retrieve_context(faiss_index, role_query, llm)
-        print("Retrieval Context:", context)
+        context = await aretrieve_context(faiss_index, role_query, llm)
+        logger.debug(f"Retrieval Context: {context}")
 
         # Define prompt template
         prompt_template = ChatPromptTemplate([
@@ -693,7 +794,7 @@ def system_flow_qa(state: State):
 
         # Construct and invoke chain
         chain = RunnablePassthrough() | prompt_template | llm
-        response = chain.invoke({
+        response = await chain.ainvoke({
             "user_role": user_role,
             "messages": structured_conversation,
             "context": context["result"],
@@ -705,7 +806,7 @@ def system_flow_qa(state: State):
     except Exception as e:
         # Fallback response in case of errors
         error_message = str(e)
-        print(f"Error in system_flow_qa: {error_message}")
+        logger.error(f"Error in system_flow_qa: {error_message}")
         
         if is_arabic:
             return {"messages": ["""
@@ -723,9 +824,112 @@ def system_flow_qa(state: State):
 
             We apologize for this service interruption.
             """]}
-        
+
+
+def summary_split(messages) -> int:
+    """
+    Index of the first message kept verbatim when the conversation is summarized.
+
+    The newest messages are kept while they fit in CONVERSATION_SUMMARY_TARGET_TOKENS,
+    well below the trigger, so a summarized thread takes several turns to reach
+    the trigger again. The split moves forward to the start of a turn so no kept
+    answer loses its question; the latest turn is always kept.
+
+    Args:
+        messages: The conversation's messages, oldest first.
+
+    Returns:
+        int: Split index; 0 if there is nothing to summarize.
+    """
+    split, kept = len(messages), 0
+    while split > 0:
+        kept += estimate_tokens(message_text(messages[split - 1]))
+        if kept > CONVERSATION_SUMMARY_TARGET_TOKENS:
+            break
+        split -= 1
+
+    while split < len(messages) and messages[split].type != "human":
+        split += 1
+    if split == len(messages):
+        split = max((i for i, message in enumerate(messages) if message.type == "human"), default=0)
+    return split
+
+
+def should_summarize(state: State) -> str:
+    """
+    Decide whether the thread's messages exceed the token threshold for summarization.
+
+    Args:
+        state: The current state of the workflow.
+
+    Returns:
+        "summarize_conversation" or END.
+    """
+    messages = state["messages"]
+    tokens = sum(estimate_tokens(message_text(message)) for message in messages)
+    if tokens > CONVERSATION_SUMMARY_TRIGGER_TOKENS and summary_split(messages) > 0:
+        return "summarize_conversation"
+    return END
+
+
+async def summarize_conversation(state: State):
+    """
+    Fold the older turns of a long conversation into the running summary.
+
+    The summarized messages are removed from the state, so the checkpoint
+    written for the thread stops growing with every turn; prompts get the
+    summary through the conversation window instead. Applied by
+    Workflow.asummarize after the response has been sent.
+
+    Args:
+        state: The current state of the workflow.
+
+    Returns:
+        dict: The new summary and RemoveMessage updates for the summarized messages.
+    """
+    messages = state["messages"]
+    split = summary_split(messages)
+    if split == 0:
+        return {}
+
+    older = messages[:split]
+    prompt_template = ChatPromptTemplate([
+        (
+            "human",
+            """
+            You maintain a running summary of a conversation between a patient and a medical assistant.
+            Update the summary with the new turns below. Keep the facts later questions may refer to:
+            symptoms, conditions, medications, doctors, appointments and the user's preferences.
+            Write at most 200 words, in the language of the conversation, and return only the summary.
+
+            Current summary:
+            {summary}
+
+            New turns:
+            {turns}
+            """
+        )
+    ])
+    chain = prompt_template | llm | StrOutputParser()
+
+    try:
+        summary = await chain.ainvoke(
+            {"summary": state.get("summary") or "(none)", "turns": render_turns(older)},
+            config=INTERNAL_RUN_CONFIG
+        )
+    except Exception as e:
+        # Keep the messages; the next turn tries again
+        logger.error(f"Conversation summarization failed: {e}")
+        return {}
+
+    logger.info(f"Summarized {len(older)} messages into the running summary")
+    return {
+        "summary": summary.strip(),
+        "messages": [RemoveMessage(id=message.id) for message in older]
+    }
+
 @traceable(metadata={"llm": MODEL_NAME})
-def handle_out_of_scope(state: State):
+async def handle_out_of_scope(state: State):
     """
     Handles questions that are outside the medical domain of the chatbot.
     Provides a friendly response explaining the chatbot's purpose and limitations.
@@ -736,7 +940,7 @@ def handle_out_of_scope(state: State):
     Returns:
         Updated state with the generated response.
     """
-    print("Handling out-of-scope question")
+    logger.info("Handling out-of-scope question")
     
     question = state["messages"][-1].content
     
@@ -785,7 +989,7 @@ def handle_out_of_scope(state: State):
         | llm
     )
     
-    response = chain.invoke({})
+    response = await chain.ainvoke({})
     
     return {"messages": [response]}
 
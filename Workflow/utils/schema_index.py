@@ -0,0 +1,300 @@
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from Workflow.utils.tables_info import load_tables_info
+
+PRIVATE_MARKER = "## Private"
+
+TABLE_PATTERN = re.compile(
+    r"(?P<private>##\s*Private\s*\n)?\s*CREATE TABLE\s+(?P<name>(?:\[[^\]]+\]\.)*\[(?P<table>[^\]]+)\])\s*\((?P<body>.*?)\n\);",
+    re.IGNORECASE | re.DOTALL
+)
+COLUMN_PATTERN = re.compile(r"^\s*\[(?P<column>[^\]]+)\]\s+(?P<type>[A-Za-z0-9_]+(?:\([^)]*\))?)", re.MULTILINE)
+FOREIGN_KEY_PATTERN = re.compile(
+    r"FOREIGN KEY\s*\(\[(?P<column>[^\]]+)\]\)\s*REFERENCES\s*(?:\[[^\]]+\]\.)*\[(?P<table>[^\]]+)\]\s*\(\[(?P<ref_column>[^\]]+)\]\)",
+    re.IGNORECASE
+)
+PRIMARY_KEY_PATTERN = re.compile(r"PRIMARY KEY\s*\((?P<columns>[^)]*)\)", re.IGNORECASE)
+CAMEL_CASE_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# User id columns that join the Users table across databases without a declared foreign key
+IMPLICIT_REFERENCES = {"AppUserId": "Users", "PatientId": "Users", "UserId": "Users"}
+
+# Audit columns that never help answer a question
+AUDIT_COLUMNS = {
+    "CreatedByUserId", "FirstUpdatedTime", "LastUpdatedTime", "FirstUpdatedByUserId",
+    "LastUpdatedByUserId", "DeletedTime", "DeletedByUserId", "ConcurrencyStamp", "SecurityStamp",
+}
+
+# Words users say for a table that do not appear in its name or columns (English and Arabic)
+TABLE_SYNONYMS = {
+    "Appointments": ["appointment", "booking", "book", "visit", "reservation", "schedule", "موعد", "مواعيد", "حجز", "كشف"],
+    "AppointmentTypes": ["fee", "price", "cost", "consultation", "duration", "سعر", "رسوم", "تكلفة"],
+    "Doctors": ["doctor", "dr", "physician", "license", "طبيب", "دكتور", "أطباء", "دكاترة"],
+    "Clinics": ["clinic", "address", "location", "city", "عيادة", "عيادات", "عنوان"],
+    "WorkingTimes": ["working", "available", "availability", "day", "open", "مواعيد العمل", "متاح"],
+    "Periods": ["hour", "shift", "ساعة", "ساعات"],
+    "Reviews": ["review", "rating", "rate", "rated", "feedback", "تقييم", "تقييمات", "مراجعة"],
+    "Specializations": ["specialization", "specialty", "speciality", "specialist", "department", "تخصص", "أخصائي"],
+    "Payments": ["payment", "paid", "pay", "transaction", "amount", "دفع", "مدفوعات", "فاتورة"],
+    "Notifications": ["notification", "alert", "unread", "إشعار", "إشعارات", "تنبيه"],
+    "Awards": ["award", "prize", "جائزة", "جوائز"],
+    "Educations": ["education", "degree", "university", "study", "تعليم", "شهادة", "جامعة"],
+    "Experiences": ["experience", "hospital", "job", "worked", "خبرة", "خبرات", "مستشفى"],
+    "ContactUs": ["contact", "message", "complaint", "تواصل", "شكوى"],
+    "Users": ["profile", "name", "email", "phone", "gender", "birth", "age", "patient", "user", "account",
+              "ملف", "اسم", "بريد", "هاتف", "عمر", "مريض", "حساب"],
+    "Roles": ["role", "دور"],
+}
+
+# Generic words that match too many columns to be a useful signal
+STOP_WORDS = {"id", "is", "at", "the", "a", "an", "of", "my", "me", "i", "do", "to", "in", "on", "for", "and", "or", "what", "how", "many"}
+
+
+def _stem(word: str) -> str:
+    """Reduce an English word to a crude singular form for matching."""
+    word = word.lower()
+    for suffix, replacement in (("ies", "y"), ("ses", "s"), ("s", "")):
+        if len(word) > 3 and word.endswith(suffix) and not word.endswith("ss"):
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def _split_identifier(identifier: str) -> List[str]:
+    """Split a CamelCase or snake_case identifier into lowercase stems."""
+    return [_stem(part) for part in CAMEL_CASE_PATTERN.findall(identifier.replace("_", " "))]
+
+
+@dataclass
+class TableSchema:
+    """A parsed CREATE TABLE block."""
+
+    name: str
+    qualified_name: str
+    private: bool
+    columns: List[Tuple[str, str]]
+    primary_key: List[str]
+    foreign_keys: List[Tuple[str, str, str]]
+    ddl: str
+    name_terms: Set[str] = field(default_factory=set)
+    column_terms: Set[str] = field(default_factory=set)
+
+    def references(self) -> Iterable[Tuple[str, str, str, bool]]:
+        """Yield (column, table, referenced column, implicit) for every link to another table."""
+        declared = {column for column, _, _ in self.foreign_keys}
+        for column, table, ref_column in self.foreign_keys:
+            yield column, table, ref_column, False
+        for column, _ in self.columns:
+            table = IMPLICIT_REFERENCES.get(column)
+            if table and table != self.name and column not in declared:
+                yield column, table, "Id", True
+
+    def to_compact(self, tables: Dict[str, "TableSchema"]) -> str:
+        """Render the table as a single compact definition with its join hints."""
+        columns = ", ".join(
+            f"{column} {data_type}{' PK' if column in self.primary_key else ''}"
+            for column, data_type in self.columns
+            if column not in AUDIT_COLUMNS
+        )
+        lines = [PRIVATE_MARKER] if self.private else []
+        lines.append(f"{self.qualified_name} ({columns})")
+        for column, table, ref_column, _ in self.references():
+            target = tables[table].qualified_name if table in tables else f"[{table}]"
+            lines.append(f"  -- {column} -> {target}.[{ref_column}]")
+        return "\n".join(lines)
+
+
+class SchemaIndex:
+    """
+    Index over the CREATE TABLE blocks of a role's tables info.
+
+    Tables are scored lexically against the question through their names,
+    column names and known synonyms. The matching tables, the tables they
+    reference and the tables on the join paths between them are rendered as a
+    compact schema, so the SQL prompt only carries the part of the schema the
+    question needs.
+    """
+
+    def __init__(self, tables_info: str, min_score: float = 2.0):
+        """
+        Args:
+            tables_info: The DDL text with CREATE TABLE blocks.
+            min_score: Minimum score for a table to be selected directly.
+        """
+        self.tables_info = tables_info
+        self.min_score = min_score
+        self.tables: Dict[str, TableSchema] = {}
+        self._graph: Dict[str, Set[str]] = {}
+        self._parse()
+
+    def _parse(self) -> None:
+        for match in TABLE_PATTERN.finditer(self.tables_info):
+            body = match.group("body")
+            name = match.group("table")
+            primary_key = PRIMARY_KEY_PATTERN.search(body)
+            table = TableSchema(
+                name=name,
+                qualified_name=match.group("name"),
+                private=bool(match.group("private")),
+                columns=[(m.group("column"), m.group("type")) for m in COLUMN_PATTERN.finditer(body)],
+                primary_key=re.findall(r"\[([^\]]+)\]", primary_key.group("columns")) if primary_key else [],
+                foreign_keys=[(m.group("column"), m.group("table"), m.group("ref_column")) for m in FOREIGN_KEY_PATTERN.finditer(body)],
+                ddl=match.group(0).strip(),
+            )
+            table.name_terms = set(_split_identifier(name)) | {_stem(name)}
+            table.column_terms = {
+                term
+                for column, _ in table.columns
+                if column not in AUDIT_COLUMNS
+                for term in _split_identifier(column)
+            } - STOP_WORDS
+            self.tables[name] = table
+
+        for name, table in self.tables.items():
+            self._graph.setdefault(name, set())
+            for _, target, _, _ in table.references():
+                if target in self.tables:
+                    self._graph[name].add(target)
+                    self._graph.setdefault(target, set()).add(name)
+
+    def score(self, text: str) -> Dict[str, float]:
+        """
+        Score every table against a piece of text.
+
+        Args:
+            text: The question (or conversation) to match.
+
+        Returns:
+            Dict[str, float]: Score per table name, only for tables that matched.
+        """
+        lowered = text.lower()
+        words = {_stem(word) for word in WORD_PATTERN.findall(lowered)} - STOP_WORDS
+
+        scores: Dict[str, float] = {}
+        for name, table in self.tables.items():
+            score = 3.0 * len(words & table.name_terms) + 1.0 * len(words & table.column_terms)
+            for synonym in TABLE_SYNONYMS.get(name, []):
+                if synonym.isascii():
+                    if _stem(synonym) in words:
+                        score += 2.0
+                elif synonym in lowered:
+                    score += 2.0
+            if score:
+                scores[name] = score
+        return scores
+
+    def _join_path(self, source: str, target: str) -> List[str]:
+        """Shortest chain of tables linking two tables, excluding the endpoints."""
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            if current == target:
+                break
+            for neighbour in self._graph.get(current, ()):
+                if neighbour not in previous:
+                    previous[neighbour] = current
+                    queue.append(neighbour)
+
+        if target not in previous:
+            return []
+        path, node = [], previous[target]
+        while node is not None and node != source:
+            path.append(node)
+            node = previous[node]
+        return path
+
+    def select_tables(self, question: str, history: str = "") -> List[str]:
+        """
+        Pick the tables relevant to a question.
+
+        Args:
+            question: The user's question.
+            history: Earlier user messages, weighted lower, so follow-up questions keep their tables.
+
+        Returns:
+            List[str]: Table names in schema order, or an empty list if nothing matched.
+        """
+        scores = self.score(question)
+        for name, score in self.score(history).items():
+            scores[name] = scores.get(name, 0.0) + 0.5 * score
+
+        selected = {name for name, score in scores.items() if score >= self.min_score}
+        if not selected:
+            return []
+
+        # Tables referenced by the selected ones, so their keys can be resolved
+        for name in list(selected):
+            for _, target, _, _ in self.tables[name].references():
+                if target in self.tables:
+                    selected.add(target)
+
+        # Intermediate tables needed to join the selected ones
+        anchors = sorted(selected)
+        for i, source in enumerate(anchors):
+            for target in anchors[i + 1:]:
+                selected.update(self._join_path(source, target))
+
+        return [name for name in self.tables if name in selected]
+
+    def compact_schema(self, question: str, history: str = "") -> Optional[str]:
+        """
+        Build the compact schema for a question.
+
+        Args:
+            question: The user's question.
+            history: Earlier user messages.
+
+        Returns:
+            Optional[str]: The compact schema, or None if no table matched.
+        """
+        names = self.select_tables(question, history)
+        if not names:
+            return None
+        return "\n\n".join(self.tables[name].to_compact(self.tables) for name in names)
+
+
+_indexes: Dict[str, SchemaIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_schema_index(role: str) -> SchemaIndex:
+    """
+    Return the schema index for a role's tables info, parsing it on first use.
+
+    Args:
+        role: The user's role.
+
+    Returns:
+        SchemaIndex: The shared index for the role's schema.
+    """
+    tables_info = load_tables_info(role=role)
+
+    # Keyed by the schema text, so roles sharing the same tables info share one index
+    if tables_info not in _indexes:
+        with _indexes_lock:
+            if tables_info not in _indexes:
+                _indexes[tables_info] = SchemaIndex(tables_info)
+    return _indexes[tables_info]
+
+
+def load_relevant_tables_info(role: str, question: str, history: str = "") -> str:
+    """
+    Return only the part of the role's schema relevant to a question.
+
+    Falls back to the full tables info when no table matches the question.
+
+    Args:
+        role: The user's role.
+        question: The user's question.
+        history: Earlier user messages.
+
+    Returns:
+        str: The compact schema or the full DDL.
+    """
+    schema = get_schema_index(role).compact_schema(question, history)
+    return schema if schema else load_tables_info(role=role)
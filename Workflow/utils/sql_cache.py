@@ -0,0 +1,317 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Placeholder stored in cached templates in place of the requesting user's id
+USER_ID_PLACEHOLDER = "__CURRENT_USER_ID__"
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]", re.UNICODE)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+STRING_LITERAL_PATTERN = re.compile(r"N?'((?:[^']|'')*)'")
+
+# Columns holding the requesting user's id; the Id of the Users table is matched through its aliases
+USER_ID_COLUMNS = {"appuserid", "patientid", "userid", "doctorid"}
+USERS_ALIAS_PATTERN = re.compile(r"\[?Users\]?\s+(?:AS\s+)?(?!(?:WHERE|JOIN|ON|INNER|LEFT|RIGHT|FULL|CROSS|GROUP|ORDER)\b)(\w+)", re.IGNORECASE)
+
+# Words and openings that make a question depend on earlier turns ("what about next week", "show me his reviews")
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(?:and|also|what about|how about|same|then)\b"
+    r"|\b(?:he|him|his|she|her|hers|they|them|their|it|its|that|those|these|this one|the same|previous|above|"
+    r"mentioned|earlier|more details|else|instead|which one|(?:first|second|last) one)\b"
+    r"|^\s*(?:و?ماذا عن|وماذا|و?كذلك|أيضا)"
+    r"|(?:^|\s)(?:هم|هذا|هذه|ذلك|تلك|عنه|عنها|عنهم|له|لها|لهم)(?=\s|$|[؟?.,])",
+    re.IGNORECASE
+)
+
+
+def is_follow_up(question: str) -> bool:
+    """
+    Tell whether a question refers back to earlier turns of the conversation.
+
+    SQL generated for such a question is resolved against its conversation, so
+    it must not be looked up in or stored to the cache.
+
+    Args:
+        question: The user's question.
+
+    Returns:
+        bool: True if the question contains a back-reference or a continuation opening.
+    """
+    return bool(FOLLOW_UP_PATTERN.search(question))
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for exact cache matching.
+
+    Args:
+        question: The user's question.
+
+    Returns:
+        str: The question lowercased, without punctuation and with collapsed whitespace.
+    """
+    text = PUNCTUATION_PATTERN.sub(" ", question.lower())
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+@dataclass
+class CachedQuery:
+    """A validated SQL template generated for a question."""
+
+    question: str
+    template: str
+    vector: np.ndarray
+    numbers: Set[str]
+    literals: List[str]
+    created_at: float
+
+
+class SemanticSQLCache:
+    """
+    Cache of generated SQL templates, keyed by role and question.
+
+    A question first matches by its normalized text; otherwise it matches the
+    cached question of the same role with the highest embedding similarity, if
+    that similarity clears the threshold. Similarity matches must also agree on
+    the numbers in the question and contain every string literal of the cached
+    SQL, so "appointments with Dr. Ahmed" never reuses the SQL generated for
+    "appointments with Dr. Mohamed". Exact matches are held to the same checks.
+
+    Entries carry no conversation context, so callers should not look up or
+    store follow-up questions (see `is_follow_up`); "what about next week" is
+    resolved against its own conversation.
+
+    The requesting user's id is stored as a placeholder and bound again on
+    lookup. Only the SQL is cached: a hit still runs through execute_query,
+    whose short-lived result cache applies as it does to freshly generated SQL.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        similarity_threshold: float = 0.95,
+        max_entries: int = 500,
+        ttl: int = 86400,
+    ):
+        """
+        Args:
+            embeddings: Embeddings model (ideally cached) used to embed questions.
+            similarity_threshold: Minimum cosine similarity for a semantic match.
+            max_entries: Maximum number of cached templates per role.
+            ttl: Seconds a template stays valid.
+        """
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries: Dict[str, "OrderedDict[str, CachedQuery]"] = {}
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def _normalize_vector(vector) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    @staticmethod
+    def to_template(sql: str, user_id: str) -> Optional[str]:
+        """
+        Replace the user's id in comparisons on user-id columns with a placeholder.
+
+        Only AppUserId, PatientId, UserId and DoctorId columns, and the Id of
+        the Users table, are templated.
+
+        Args:
+            sql: The generated SQL query.
+            user_id: The id of the user the query was generated for.
+
+        Returns:
+            Optional[str]: The template, or None if the id also appears anywhere
+            else (e.g. `Status = 2` for user 2) and the query cannot be safely
+            reused for another user.
+        """
+        user_id = str(user_id)
+        escaped = re.escape(user_id)
+        users_aliases = {"users"} | {alias.lower() for alias in USERS_ALIAS_PATTERN.findall(sql)}
+
+        def replace(match: re.Match) -> str:
+            qualifier, column = (match.group("qualifier") or "").lower(), match.group("column").lower()
+            if column in USER_ID_COLUMNS or (column == "id" and qualifier in users_aliases):
+                return f"{match.group('left')}{match.group('open') or ''}{USER_ID_PLACEHOLDER}{match.group('close') or ''}"
+            return match.group(0)
+
+        template = re.sub(
+            rf"(?P<left>(?:\[?(?P<qualifier>\w+)\]?\.)?\[?(?P<column>\w+)\]?\s*=\s*)"
+            rf"(?:(?P<open>N?'){escaped}(?P<close>')|{escaped}(?![\w'-]))",
+            replace,
+            sql
+        )
+
+        if re.search(rf"(?<![\w-]){escaped}(?![\w-])", template):
+            return None
+        return template
+
+    @staticmethod
+    def bind(template: str, user_id: str) -> Optional[str]:
+        """
+        Bind the current user's id into a template.
+
+        Args:
+            template: A template produced by `to_template`.
+            user_id: The id of the requesting user.
+
+        Returns:
+            Optional[str]: The SQL query, or None if the id cannot be bound safely.
+        """
+        user_id = str(user_id)
+        quoted = re.sub(rf"'{USER_ID_PLACEHOLDER}'", lambda _: "'" + user_id.replace("'", "''") + "'", template)
+
+        if USER_ID_PLACEHOLDER in quoted:
+            # Unquoted comparisons only accept numeric ids
+            if not user_id.isdigit():
+                return None
+            quoted = quoted.replace(USER_ID_PLACEHOLDER, user_id)
+        return quoted
+
+    def _role_entries(self, user_role: str) -> "OrderedDict[str, CachedQuery]":
+        return self._entries.setdefault(user_role, OrderedDict())
+
+    @staticmethod
+    def _matches(entry: CachedQuery, normalized: str, numbers: Set[str]) -> bool:
+        return entry.numbers == numbers and all(literal in normalized for literal in entry.literals)
+
+    def _find(self, user_role: str, normalized: str, vector: Optional[np.ndarray]) -> Optional[CachedQuery]:
+        now = time.time()
+        numbers = set(NUMBER_PATTERN.findall(normalized))
+        with self._lock:
+            entries = self._role_entries(user_role)
+            for key in [key for key, entry in entries.items() if now - entry.created_at >= self.ttl]:
+                del entries[key]
+
+            entry = entries.get(normalized)
+            if entry is not None and self._matches(entry, normalized, numbers):
+                entries.move_to_end(normalized)
+                self._stats["exact_hits"] += 1
+                return entry
+
+            if vector is None or not entries:
+                return None
+
+            keys = list(entries.keys())
+            matrix = np.vstack([entries[key].vector for key in keys])
+            similarities = matrix @ vector
+
+            for position in np.argsort(-similarities):
+                if similarities[position] < self.similarity_threshold:
+                    break
+                entry = entries[keys[position]]
+                if self._matches(entry, normalized, numbers):
+                    entries.move_to_end(keys[position])
+                    self._stats["semantic_hits"] += 1
+                    logger.info(f"SQL cache semantic hit ({similarities[position]:.3f}): '{entry.question}'")
+                    return entry
+        return None
+
+    async def alookup(self, question: str, user_role: str, user_id: str) -> Optional[str]:
+        """
+        Find cached SQL for a question and bind the current user's id into it.
+
+        Args:
+            question: The user's question.
+            user_role: Role of the requesting user.
+            user_id: Id of the requesting user.
+
+        Returns:
+            Optional[str]: The SQL query, or None on a miss.
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+
+        entry = self._find(user_role, normalized, None)
+        if entry is None:
+            try:
+                vector = self._normalize_vector(await self.embeddings.aembed_query(question.strip()))
+            except Exception as e:
+                logger.error(f"SQL cache embedding failed: {e}")
+                vector = None
+            entry = self._find(user_role, normalized, vector) if vector is not None else None
+
+        if entry is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        return self.bind(entry.template, user_id)
+
+    async def astore(self, question: str, user_role: str, user_id: str, sql: str) -> bool:
+        """
+        Cache the validated SQL generated for a question.
+
+        Args:
+            question: The user's question.
+            user_role: Role of the requesting user.
+            user_id: Id of the user the SQL was generated for.
+            sql: The generated and validated SQL query.
+
+        Returns:
+            bool: True if the SQL was cached.
+        """
+        normalized = normalize_question(question)
+        template = self.to_template(sql, user_id)
+        if not normalized or template is None:
+            return False
+
+        try:
+            vector = self._normalize_vector(await self.embeddings.aembed_query(question.strip()))
+        except Exception as e:
+            logger.error(f"SQL cache embedding failed: {e}")
+            return False
+
+        literals = [
+            literal.replace("''", "'").lower()
+            for literal in STRING_LITERAL_PATTERN.findall(template)
+            if literal != USER_ID_PLACEHOLDER
+        ]
+        entry = CachedQuery(
+            question=normalized,
+            template=template,
+            vector=vector,
+            numbers=set(NUMBER_PATTERN.findall(normalized)),
+            literals=[normalize_question(literal) for literal in literals if normalize_question(literal)],
+            created_at=time.time(),
+        )
+
+        # SQL filtering on values the question does not mention was resolved from elsewhere and never matches
+        if not self._matches(entry, normalized, entry.numbers):
+            return False
+
+        with self._lock:
+            entries = self._role_entries(user_role)
+            entries[normalized] = entry
+            entries.move_to_end(normalized)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._stats["stores"] += 1
+        return True
+
+    def stats(self) -> dict:
+        """Return entry counts per role and hit/miss counters."""
+        with self._lock:
+            return {"entries": {role: len(entries) for role, entries in self._entries.items()}, **self._stats}
+
+    def clear(self) -> None:
+        """Drop all cached templates, e.g. after a schema change."""
+        with self._lock:
+            self._entries.clear()
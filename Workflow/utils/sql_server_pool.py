@@ -0,0 +1,254 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Tuple
+
+import pyodbc
+
+from Workflow.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE classes that mean the connection itself is unusable
+CONNECTION_SQLSTATE_PREFIXES = ("08",)
+# SQLSTATEs worth retrying on a fresh connection (timeouts, deadlocks)
+TRANSIENT_SQLSTATES = {"HYT00", "HYT01", "40001"}
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+def _sqlstate(error: Exception) -> str:
+    return str(error.args[0]) if getattr(error, "args", None) else ""
+
+
+def is_connection_error(error: Exception) -> bool:
+    """
+    Check whether an error means the connection is broken and must be discarded.
+
+    Args:
+        error: The exception raised by pyodbc.
+
+    Returns:
+        bool: True if the connection should not be returned to the pool.
+    """
+    if isinstance(error, (pyodbc.OperationalError, pyodbc.InterfaceError)):
+        return True
+    return isinstance(error, pyodbc.Error) and _sqlstate(error).startswith(CONNECTION_SQLSTATE_PREFIXES)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Check whether an operation that failed with this error can be retried.
+
+    Args:
+        error: The exception raised by pyodbc.
+
+    Returns:
+        bool: True for broken connections, timeouts and deadlocks.
+    """
+    return is_connection_error(error) or (isinstance(error, pyodbc.Error) and _sqlstate(error) in TRANSIENT_SQLSTATES)
+
+
+class SqlServerConnectionPool:
+    """
+    Thread-safe pool of pyodbc connections to SQL Server.
+
+    Connections are checked out for the duration of a single operation, so
+    concurrent requests no longer share (and serialize on) one connection.
+    Idle connections are health-checked on checkout, broken connections are
+    discarded and replaced, and every connection carries a per-query timeout.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        query_timeout: int = 30,
+        checkout_timeout: float = 30.0,
+        health_check_interval: float = 30.0,
+        max_retries: int = 2,
+    ):
+        """
+        Args:
+            connect: Factory returning a new DB-API connection.
+            min_size: Connections opened up front and kept idle.
+            max_size: Maximum number of open connections.
+            query_timeout: Per-query timeout in seconds (0 disables it).
+            checkout_timeout: Seconds to wait for a free connection before raising PoolTimeout.
+            health_check_interval: Idle seconds after which a connection is pinged on checkout.
+            max_retries: Retries of an operation after a transient error.
+        """
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.query_timeout = query_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.max_retries = max_retries
+
+        self._idle: List[Tuple[Any, float]] = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._stats = {"connections_opened": 0, "connections_discarded": 0, "checkouts": 0, "retries": 0}
+
+        try:
+            for _ in range(self.min_size):
+                self._idle.append((self._open_connection(), time.time()))
+                self._size += 1
+        except Exception as e:
+            logger.error(f"Failed to pre-open SQL Server connections, they will be opened on demand: {e}")
+
+    def _open_connection(self):
+        conn = self._connect()
+        if self.query_timeout:
+            conn.timeout = self.query_timeout
+        self._stats["connections_opened"] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if time.time() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["connections_discarded"] += 1
+            self._cond.notify()
+
+    def getconn(self):
+        """
+        Check out a healthy connection, opening a new one if the pool is not full.
+
+        Returns:
+            A DB-API connection that must be given back with `putconn`.
+
+        Raises:
+            PoolTimeout: If no connection is available within the checkout timeout.
+        """
+        deadline = time.monotonic() + self.checkout_timeout
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("SQL Server connection pool is closed")
+
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No SQL Server connection available after {self.checkout_timeout}s")
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, 0.0
+                    self._size += 1
+                self._stats["checkouts"] += 1
+
+            if conn is None:
+                try:
+                    return self._open_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            if self._is_healthy(conn, last_used):
+                return conn
+
+            logger.warning("Discarding unhealthy SQL Server connection")
+            self._discard(conn)
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """
+        Return a connection to the pool.
+
+        Args:
+            conn: The connection obtained from `getconn`.
+            discard: Close the connection instead of keeping it (e.g. after a connection error).
+        """
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or self._closed:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and returns it afterwards.
+
+        Connections that raised a connection-level error are discarded.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except Exception as e:
+            self.putconn(conn, discard=is_connection_error(e))
+            raise
+        else:
+            self.putconn(conn)
+
+    def run(self, operation: Callable[[Any], Any]) -> Any:
+        """
+        Run an operation on a pooled connection, retrying transient failures on a fresh connection.
+
+        Args:
+            operation: Callable taking a connection and returning the result.
+
+        Returns:
+            The operation's return value.
+        """
+        attempt = 0
+        while True:
+            try:
+                with span("sql_server", "query"), self.connection() as conn:
+                    return operation(conn)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+                attempt += 1
+                self._stats["retries"] += 1
+                backoff_time = 0.5 * (2 ** (attempt - 1))
+                logger.warning(f"Transient SQL Server error, retrying in {backoff_time}s ({attempt}/{self.max_retries}): {e}")
+                time.sleep(backoff_time)
+
+    def stats(self) -> dict:
+        """Return pool size and usage counters."""
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size, **self._stats}
+
+    def close(self) -> None:
+        """Close all idle connections and reject further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
@@ -12,6 +12,7 @@ class State(TypedDict):
         SQLResult: The result retrieved from the query (if applicable).
         answer: The final answer to the question.
         messages: The list of messages for the workflow.
+        summary: Running summary of the earlier turns removed from messages.
         payload: The decoded JWT token data (e.g., user ID, roles, etc.).
     """
     question: Annotated[str, "User input question"]
@@ -20,4 +21,5 @@ class State(TypedDict):
     SQLResult: Annotated[str, "Query result if applicable"]
     answer: Annotated[str, "Final answer"]
     messages: Annotated[list, add_messages]
+    summary: Annotated[str, "Running summary of the earlier turns removed from messages"]
     payload: Annotated[dict, "Decoded JWT token data (e.g., user ID, roles, etc.)"]
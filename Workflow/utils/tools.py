@@ -15,7 +15,7 @@ def create_proper_noun_retriever_tool(db, embeddings):
     3. **Creates a retriever tool** that finds the closest match to a given input.
 
     Args:
-        db: Database connection object.
+        db: SQL Server connection pool.
         embeddings: Embeddings model for the vector store.
 
     Returns:
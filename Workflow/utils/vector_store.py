@@ -1,18 +1,87 @@
+import logging
 import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import pandas as pd
 
-from Workflow.utils.config import Config
-
+from Workflow.utils.config import get_config
+from Workflow.utils.metrics import span
 
+logger = logging.getLogger(__name__)
 
-config = Config()
+config = get_config()
 embeddings = config.embeddings
 
 
+class CachedEmbeddings:
+    """
+    LRU cache in front of an embeddings model for repeated query texts.
+
+    Routing and cache lookups embed the same short questions over and over;
+    this keeps their vectors in memory so repeats cost no remote call.
+    """
+
+    def __init__(self, embeddings, max_size: int = 4096):
+        """
+        Args:
+            embeddings: The underlying embeddings model.
+            max_size: Maximum number of cached query vectors.
+        """
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, text: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+            return vector
+
+    def _put(self, text: str, vector: List[float]) -> None:
+        with self._lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        if vector is None:
+            with span("embeddings", "embed_query"):
+                vector = self.embeddings.embed_query(text)
+            self._put(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        if vector is None:
+            with span("embeddings", "embed_query"):
+                vector = await self.embeddings.aembed_query(text)
+            self._put(text, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embeddings", "embed_documents"):
+            return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embeddings", "embed_documents"):
+            return await self.embeddings.aembed_documents(texts)
+
+
+cached_embeddings = CachedEmbeddings(embeddings)
+
+
 def create_and_save_faiss(file_path: str, save_path: str = "faiss_index/") -> None:
     """
     Create a FAISS database from a local CSV file and save it locally.
@@ -66,27 +135,146 @@ def create_and_save_faiss(file_path: str, save_path: str = "faiss_index/") -> No
 
 
 
+class FaissIndexRegistry:
+    """
+    Process-wide registry of named FAISS stores.
+
+    Each store is loaded from disk once and shared by all threads and requests.
+    The registry watches the modification time and size of the store files and,
+    when they change, loads the new version and swaps it in atomically; requests
+    that already hold the previous version keep using it until they finish.
+
+    `index.faiss` and `index.pkl` are written one after the other, so a new
+    version is only loaded once neither file has changed for `settle_seconds`,
+    and a load during which either file changed is discarded.
+    """
+
+    def __init__(self, embeddings, mmap: bool = False, check_interval: float = 5.0, settle_seconds: float = 2.0):
+        """
+        Args:
+            embeddings: Embeddings model used to query the stores.
+            mmap: Memory-map the FAISS index files instead of reading them into memory.
+            check_interval: Minimum seconds between checks of the files on disk.
+            settle_seconds: Seconds both files must be unchanged before a new version is loaded.
+        """
+        self.embeddings = embeddings
+        self.mmap = mmap
+        self.check_interval = check_interval
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+        self._stores: Dict[str, Tuple[FAISS, Tuple]] = {}
+        self._last_checked: Dict[str, float] = {}
+
+    @staticmethod
+    def _signature(directory: str) -> Optional[Tuple]:
+        try:
+            stats = [os.stat(os.path.join(directory, name)) for name in ("index.faiss", "index.pkl")]
+        except OSError:
+            return None
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+    def _read(self, directory: str) -> FAISS:
+        if self.mmap:
+            try:
+                import faiss
+
+                index = faiss.read_index(
+                    os.path.join(directory, "index.faiss"),
+                    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                )
+                with open(os.path.join(directory, "index.pkl"), "rb") as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+                return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+            except Exception as e:
+                logger.warning(f"Memory-mapped load of '{directory}' failed, reading it into memory instead: {e}")
+
+        return FAISS.load_local(directory, self.embeddings, allow_dangerous_deserialization=True)
+
+    def get(self, directory: str) -> Optional[FAISS]:
+        """
+        Return the FAISS store for a directory, loading or reloading it if needed.
+
+        Args:
+            directory (str): The directory where the FAISS index is stored.
+
+        Returns:
+            FAISS: The shared store, or None if it cannot be loaded.
+        """
+        now = time.time()
+        entry = self._stores.get(directory)
+        if entry is not None and now - self._last_checked.get(directory, 0.0) < self.check_interval:
+            return entry[0]
+
+        with self._lock:
+            entry = self._stores.get(directory)
+            signature = self._signature(directory)
+            self._last_checked[directory] = now
+
+            if entry is not None and (signature is None or signature == entry[1]):
+                return entry[0]
+
+            if signature is None:
+                logger.error(f"Failed to load FAISS index: no index files found in '{directory}'")
+                return None
+
+            # Files still being written are picked up on a later check; without a
+            # previous version there is nothing else to serve, so they are read now
+            modified_at = max(mtime_ns for mtime_ns, _ in signature) / 1e9
+            if entry is not None and now - modified_at < self.settle_seconds:
+                return entry[0]
+
+            try:
+                with span("faiss", "load"):
+                    faiss_index = self._read(directory)
+                # Files from two different saves disagree on the number of vectors
+                if faiss_index.index.ntotal != len(faiss_index.index_to_docstore_id):
+                    raise ValueError("index.faiss and index.pkl are from different versions")
+            except Exception as e:
+                logger.error(f"Failed to load FAISS index '{directory}': {e}")
+                # Keep serving the previous version if the new files are unreadable
+                return entry[0] if entry is not None else None
+
+            if self._signature(directory) != signature:
+                logger.warning(f"FAISS index '{directory}' changed while loading, keeping the previous version")
+                self._last_checked.pop(directory, None)
+                return entry[0] if entry is not None else None
+
+            self._stores[directory] = (faiss_index, signature)
+            logger.info(f"FAISS index '{directory}' {'reloaded' if entry else 'loaded'}")
+            return faiss_index
+
+    def preload(self, *directories: str) -> None:
+        """
+        Load the given stores ahead of the first request.
+
+        Args:
+            directories: Directories of the FAISS stores to load.
+        """
+        for directory in directories:
+            self.get(directory)
+
+
+faiss_registry = FaissIndexRegistry(
+    embeddings,
+    mmap=config.FAISS_MMAP,
+    check_interval=config.FAISS_RELOAD_CHECK_SECONDS
+)
+
+
 def load_faiss_index(directory: str):
     """
-    Load a FAISS index from the specified directory and filename.
+    Get a FAISS index from the process-wide registry.
+
+    The index is read from disk only on first use or when its files change.
 
     Parameters:
     - directory (str): The directory where the FAISS index is stored.
-    - filename (str): The FAISS index filename.
 
     Returns:
-    - faiss.Index: The loaded FAISS index.
-    - None: If the file does not exist.
+    - FAISS: The shared FAISS store.
+    - None: If the index cannot be loaded.
     """
-
-    # Load FAISS retriever using LangChain's method
-    try:
-        faiss_index = FAISS.load_local(directory, embeddings, allow_dangerous_deserialization=True)
-        print("✅ FAISS index loaded successfully.")
-        return faiss_index
-    except Exception as e:
-        print(f"❌ Failed to load FAISS index. Error: {e}")
-        return None
+    return faiss_registry.get(directory)
 
 
 # from langchain.chains import RetrievalQA
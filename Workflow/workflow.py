@@ -1,31 +1,45 @@
+import logging
+import time
+from typing import AsyncIterator
+
+from langchain_core.messages import AIMessage
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.postgres import PostgresSaver # type: ignore
-from psycopg_pool import ConnectionPool # type: ignore
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver # type: ignore
 
 from Workflow.utils.nodes import (
     classify_user_intent,
     generate_answer,
     question_answer,
     recommend_doctor,
+    should_summarize,
+    summarize_conversation,
     system_flow_qa,
     write_and_execute_query,
     handle_out_of_scope,
 )
+from Workflow.utils.metrics import SPAN_SECONDS, span, timed
 from Workflow.utils.state import State
 
+logger = logging.getLogger(__name__)
+
+# Nodes whose LLM output is the answer shown to the user
+ANSWER_NODES = {"generate_answer", "question_answer", "recommend_doctor", "system_flow_qa"}
 
 
 class Workflow:
     def __init__(self, config):
+        # Every node (and the intent router) is timed as a "node" span
+        node = timed("node")
+
         self.graph_builder = StateGraph(State)
-        self.graph_builder.add_node("question_answer", question_answer)
-        self.graph_builder.add_sequence([write_and_execute_query, generate_answer])
-        self.graph_builder.add_node("system_flow_qa", system_flow_qa)
-        self.graph_builder.add_node("recommend_doctor", recommend_doctor)
+        self.graph_builder.add_node("question_answer", node(question_answer))
+        self.graph_builder.add_sequence([node(write_and_execute_query), node(generate_answer)])
+        self.graph_builder.add_node("system_flow_qa", node(system_flow_qa))
+        self.graph_builder.add_node("recommend_doctor", node(recommend_doctor))
 
         self.graph_builder.add_conditional_edges(
             START,
-            classify_user_intent,
+            node(classify_user_intent),
             {
                 "query_related": "write_and_execute_query",
                 "medical_related": "question_answer",
@@ -35,57 +49,173 @@ class Workflow:
         )
 
         self.graph_builder.add_edge("write_and_execute_query", "generate_answer")
+
         self.graph_builder.add_edge("question_answer", END)
         self.graph_builder.add_edge("generate_answer", END)
         self.graph_builder.add_edge("system_flow_qa", END)
         self.graph_builder.add_edge("recommend_doctor", END)
 
-        self.checkpointer = PostgresSaver(config.postgres_pool)
+        # Not reached by a run: asummarize applies its updates to the thread after the response is sent
+        self.graph_builder.add_node("summarize_conversation", summarize_conversation)
+        self.graph_builder.add_edge("summarize_conversation", END)
+
+        self.config = config
+        self.checkpointer = None
+        self.graph = None
+
+        # Threads being summarized by this process, so overlapping turns do not summarize the same messages twice
+        self._summarizing = set()
+
+    async def setup(self):
+        """
+        Compile the graph with an async Postgres checkpointer.
+
+        The checkpointer binds to the running event loop, so this must be awaited
+        from the application's startup hook after the Postgres pool is opened.
+        """
+        self.checkpointer = AsyncPostgresSaver(self.config.postgres_pool)
         self.graph = self.graph_builder.compile(checkpointer=self.checkpointer)
 
-    def get_response(self, question: str, payload: dict, config: dict) -> str:
+    @timed("workflow", "summarize")
+    async def asummarize(self, config: dict) -> bool:
+        """
+        Fold the older turns of a long thread into its running summary.
+
+        Meant to run after the response has been sent, so the summary LLM call
+        never delays an answer. The update is applied to the thread's latest
+        checkpoint, which may already include a newer turn.
+
+        Args:
+            config: Graph run configuration (thread_id).
+
+        Returns:
+            bool: True if the thread was summarized.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        if not self.config.CONVERSATION_SUMMARY_ENABLED or thread_id in self._summarizing:
+            return False
+
+        self._summarizing.add(thread_id)
+        try:
+            snapshot = await self.graph.aget_state(config)
+            if not snapshot.values.get("messages") or should_summarize(snapshot.values) == END:
+                return False
+
+            update = await summarize_conversation(snapshot.values)
+            if not update:
+                return False
+            await self.graph.aupdate_state(config, update, as_node="summarize_conversation")
+            return True
+        except Exception as e:
+            logger.error(f"Summarizing thread {thread_id} failed: {e}")
+            return False
+        finally:
+            self._summarizing.discard(thread_id)
+
+    @staticmethod
+    def _build_input(question: str, payload: dict) -> dict:
         # Extract user_id from 'nameid' field instead of 'user_id'
         user_id = payload.get("nameid")
         
         # Extract user_role from 'roles' array
         user_role = payload.get("roles")[0] if payload.get("roles") else None
         
+        # Include both user_id and user_role in the input state
+        return {
+            "messages": [{"role": "user", "content": question}], 
+            "payload": payload,
+            "user_id": user_id,
+            "user_role": user_role
+        }
+
+    @staticmethod
+    def _fallback_response(question: str) -> str:
+        # Check if it's an out-of-scope question
+        from Workflow.utils.helper_functions import contains_arabic
+        
+        # Determine language
+        is_arabic = contains_arabic(question)
+        
+        if is_arabic:
+            return """
+            أنا مساعد طبي مصمم لمساعدتك في المسائل المتعلقة بالصحة. للأسف، لا يمكنني تقديم معلومات حول الأسئلة خارج النطاق الطبي. 
+            يمكنني مساعدتك في أمور مثل النصائح الصحية العامة، ومعلومات عن الأعراض، والتوصية بالأطباء المناسبين. 
+            هل يمكنني مساعدتك في أي استفسار طبي؟
+            """
+        else:
+            return """
+            I'm a medical assistant designed to help you with health-related matters. Unfortunately, I can't provide information about topics outside the medical domain. 
+            I can assist you with things like general health advice, information about symptoms, and recommending appropriate doctors. 
+            Can I help you with any medical questions?
+            """
+
+    async def aget_response(self, question: str, payload: dict, config: dict) -> str:
         try:
-            # Include both user_id and user_role in the input state
-            events = self.graph.stream(
-                {
-                    "messages": [{"role": "user", "content": question}], 
-                    "payload": payload,
-                    "user_id": user_id,
-                    "user_role": user_role
-                },
-                config,
-                stream_mode="values",
-            )
-  
-            last_message = None
-            for event in events:
-                last_message = event["messages"][-1].content
+            with span("workflow", "get_response"):
+                events = self.graph.astream(
+                    self._build_input(question, payload),
+                    config,
+                    stream_mode="values",
+                )
+      
+                last_message = None
+                async for event in events:
+                    last_message = event["messages"][-1].content
             
             return last_message if last_message else "No results found."
         except Exception as e:
-            print(f"An error occurred during workflow execution: {e}")
-            
-            # Check if it's an out-of-scope question
-            from Workflow.utils.helper_functions import contains_arabic
-            
-            # Determine language
-            is_arabic = contains_arabic(question)
-            
-            if is_arabic:
-                return """
-                أنا مساعد طبي مصمم لمساعدتك في المسائل المتعلقة بالصحة. للأسف، لا يمكنني تقديم معلومات حول الأسئلة خارج النطاق الطبي. 
-                يمكنني مساعدتك في أمور مثل النصائح الصحية العامة، ومعلومات عن الأعراض، والتوصية بالأطباء المناسبين. 
-                هل يمكنني مساعدتك في أي استفسار طبي؟
-                """
-            else:
-                return """
-                I'm a medical assistant designed to help you with health-related matters. Unfortunately, I can't provide information about topics outside the medical domain. 
-                I can assist you with things like general health advice, information about symptoms, and recommending appropriate doctors. 
-                Can I help you with any medical questions?
-                """
+            logger.error(f"An error occurred during workflow execution: {e}")
+            return self._fallback_response(question)
+
+    async def astream_response(self, question: str, payload: dict, config: dict) -> AsyncIterator[dict]:
+        """
+        Run the workflow and stream the answer while it is being generated.
+
+        Tokens of the final answer are forwarded as the LLM produces them, with
+        node progress events in between. Internal LLM calls (translation,
+        retrieval, SQL generation) are not forwarded.
+
+        Args:
+            question: The user's question.
+            payload: Decoded JWT token data.
+            config: Graph run configuration (thread_id).
+
+        Yields:
+            dict: {"type": "status", "status": ...} progress events,
+                  {"type": "token", "content": ...} answer tokens, and finally
+                  {"type": "final", "content": ...} with the complete answer.
+        """
+        yield {"type": "status", "status": "classifying"}
+
+        # Timed by hand: a span's context must not stay open across the generator's yields
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            last_message = None
+            async for mode, chunk in self.graph.astream(
+                self._build_input(question, payload),
+                config,
+                stream_mode=["messages", "custom", "values"],
+            ):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if (
+                        metadata.get("langgraph_node") in ANSWER_NODES
+                        and isinstance(message, AIMessage)
+                        and isinstance(message.content, str)
+                        and message.content
+                    ):
+                        yield {"type": "token", "content": message.content}
+                elif mode == "custom":
+                    if isinstance(chunk, dict) and "status" in chunk:
+                        yield {"type": "status", "status": chunk["status"]}
+                elif mode == "values":
+                    last_message = chunk["messages"][-1].content
+
+            yield {"type": "final", "content": last_message if last_message else "No results found."}
+        except Exception as e:
+            status = "error"
+            logger.error(f"An error occurred during workflow execution: {e}")
+            yield {"type": "final", "content": self._fallback_response(question)}
+        finally:
+            SPAN_SECONDS.observe(time.perf_counter() - started, kind="workflow", name="stream_response", status=status)
@@ -347,8 +347,37 @@ def format_message(role, content):
     </div>
     """
 
+def fetch_suggested_questions():
+    """Fetch the suggested questions generated in the background for the last answer"""
+    pending = st.session_state.get("pending_suggestions")
+    if not pending or pending["thread_id"] != st.session_state.current_thread_id:
+        return
+    
+    try:
+        response = requests.post(
+            f"{API_URL}/chat/suggestions",
+            json=pending,
+            headers={"Authorization": f"Bearer {st.session_state.token}"}
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data["status"] == "ready":
+                st.session_state.suggested_questions = data["suggested_questions"]
+                st.session_state.pending_suggestions = None
+        else:
+            st.session_state.pending_suggestions = None
+    except Exception:
+        st.session_state.pending_suggestions = None
+
 def display_suggested_questions():
     """Display suggested follow-up questions"""
+    fetch_suggested_questions()
+    
+    if st.session_state.get("pending_suggestions"):
+        if st.button("Show suggested questions"):
+            st.rerun()
+    
     if st.session_state.suggested_questions:
         st.markdown("<div style='margin-top: 1rem;'>", unsafe_allow_html=True)
         for i, question in enumerate(st.session_state.suggested_questions):
@@ -598,11 +627,13 @@ def ask_question(question):
                     "created_at": datetime.now().isoformat()
                 })
                 
-                # Update suggested questions
-                if "suggested_questions" in data:
-                    st.session_state.suggested_questions = data["suggested_questions"]
-                else:
-                    st.session_state.suggested_questions = []
+                # Suggested questions are generated after the answer is returned and fetched separately
+                st.session_state.suggested_questions = data.get("suggested_questions") or []
+                if data.get("message_id") is not None:
+                    st.session_state.pending_suggestions = {
+                        "thread_id": st.session_state.current_thread_id,
+                        "message_id": data["message_id"]
+                    }
                 
                 # Refresh chat list to update last_updated_at
                 fetch_chats()
@@ -814,9 +845,9 @@ def main():
         # Pagination for chat list
         if st.session_state.pagination.get("has_more_before", False):
             if st.button("Load More Chats"):
-                # Get the last chat's timestamp as cursor
+                # Use the cursor returned by the API, falling back to the last chat's timestamp
                 last_chat = st.session_state.chats[-1]
-                cursor = last_chat.get("last_updated_at")
+                cursor = st.session_state.pagination.get("next_cursor") or last_chat.get("last_updated_at")
                 
                 # Fetch more chats
                 try:
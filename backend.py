@@ -4,27 +4,42 @@ import base64
 import json
 from fastapi import FastAPI, HTTPException, Depends, Header, Query, WebSocket, WebSocketDisconnect, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any, Union
 from jose import JWTError, jwt  # type: ignore
-from Workflow.utils.config import Config
+from Workflow.utils.cache_backends import bind_event_loop, get_cache_backend
+from Workflow.utils.checkpoints import (
+    CheckpointCompactor,
+    delete_thread_checkpoints,
+    delete_user_checkpoints,
+    prune_orphaned_checkpoints,
+)
+from Workflow.utils.followup_bank import FollowUpBank
+from Workflow.utils.helper_functions import maintain_cache
+from Workflow.utils.maintenance import MaintenanceScheduler
+from Workflow.utils.metrics import HTTP_REQUEST_SECONDS, registry as metrics_registry, span
+from Workflow.utils.config import get_config
+from Workflow.utils.vector_store import cached_embeddings, faiss_registry
 from Workflow.workflow import Workflow
 import logging
 import uuid
 import time
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 import markdown
 import re
+import hashlib
 
 # Proper logger initialization with double underscores
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Cache for storing frequently accessed data
-cache = {}
-CACHE_TTL = 300  # 5 minutes
+# Cache for storing frequently accessed data (in-process or shared by all workers, see CACHE_BACKEND)
+CACHE_NAMESPACE = "api"
+SUGGESTIONS_NAMESPACE = "suggestions"
+cache = get_cache_backend()
 
 # Environment variables for configuration
 ALLOWED_ORIGINS = json.loads(os.getenv("ALLOWED_ORIGINS", '["*"]'))
@@ -37,10 +52,15 @@ class UserQuestion(BaseModel):
     question: str
     thread_id: str
     stream: Optional[bool] = False
+    suggestions: Optional[bool] = Field(True, description="Generate suggested follow-up questions for the answer")
 
 class ThreadIDRequest(BaseModel):
     thread_id: str
 
+class SuggestionsRequest(BaseModel):
+    thread_id: str
+    message_id: int = Field(..., description="ID of the assistant message returned by /ask")
+
 class ChatHistoryRequest(BaseModel):
     thread_id: str
     limit: Optional[int] = Field(20, description="Number of messages to return per page")
@@ -49,7 +69,7 @@ class ChatHistoryRequest(BaseModel):
 
 class ChatsListRequest(BaseModel):
     limit: Optional[int] = Field(20, description="Number of chat threads to return per page")
-    cursor: Optional[str] = Field(None, description="Timestamp to use as reference point for pagination")
+    cursor: Optional[str] = Field(None, description="Cursor returned as next_cursor by the previous page (a plain timestamp is also accepted)")
 
 class NewChatRequest(BaseModel):
     chat_name: str
@@ -90,8 +110,13 @@ class SuggestedQuestion(BaseModel):
 class AskResponse(BaseModel):
     response: str
     thread_id: str
+    message_id: Optional[int] = None
     suggested_questions: Optional[List[SuggestedQuestion]] = None
 
+class SuggestionsResponse(BaseModel):
+    status: str = Field(..., description="'ready' once the suggestions are stored, 'pending' while they are generated, 'skipped' if none were requested and 'failed' if generating them failed")
+    suggested_questions: List[SuggestedQuestion] = []
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Medical Assistant API",
@@ -108,11 +133,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    """Record the latency of every request by route template, so paths with ids do not create new series"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
+
 # Initialize configuration and workflow
-config = Config()
+config = get_config()
 workflow = Workflow(config)
 postgres_pool = config.postgres_pool
 
+# Precomputed follow-up questions, so most answers get suggestions without an LLM call
+followup_bank = FollowUpBank(
+    faiss_registry,
+    cached_embeddings,
+    directory=config.FOLLOWUP_BANK_PATH,
+    min_similarity=config.FOLLOWUP_BANK_MIN_SIMILARITY
+) if config.FOLLOWUP_BANK_ENABLED else None
+
+@asynccontextmanager
+async def postgres_connection(name):
+    """Check out a Postgres connection, timing the work done with it as a "postgres" span"""
+    with span("postgres", name):
+        async with postgres_pool.connection() as conn:
+            yield conn
+
 # Connected WebSocket clients
 connected_clients = {}
 
@@ -220,60 +278,162 @@ def validate_token(authorization: str = Header(...)):
         logger.error(f"Error decoding JWT token: {str(e)}")
         raise HTTPException(status_code=401, detail=f"Token error: {str(e)}", headers={"WWW-Authenticate": "Bearer"})
 
-def get_cache_key(user_id, endpoint, params=None):
-    """Generate a cache key based on user_id, endpoint, and optional parameters"""
-    if params:
-        return f"{user_id}:{endpoint}:{json.dumps(params, sort_keys=True)}"
-    return f"{user_id}:{endpoint}"
+async def get_cached_data(user_id, endpoint, params=None):
+    """Get data from cache if it exists and is not expired, with the cache version to store a fresh value under"""
+    return await cache.get(CACHE_NAMESPACE, user_id, endpoint, params)
 
-def get_cached_data(key):
-    """Get data from cache if it exists and is not expired"""
-    if key in cache:
-        entry = cache[key]
-        if time.time() < entry["expires"]:
-            return entry["data"]
-        # Remove expired entry
-        del cache[key]
-    return None
+async def set_cached_data(user_id, endpoint, params, data, version=None):
+    """Store data in cache with expiration time, under the version returned by the lookup that missed"""
+    await cache.set(CACHE_NAMESPACE, user_id, endpoint, params, data, version)
 
-def set_cached_data(key, data, ttl=CACHE_TTL):
-    """Store data in cache with expiration time"""
-    cache[key] = {
-        "data": data,
-        "expires": time.time() + ttl
-    }
+async def invalidate_cache(user_id, endpoint=""):
+    """Invalidate the cached data of one endpoint for a user, or all of the user's cached data"""
+    await cache.invalidate(CACHE_NAMESPACE, user_id, endpoint)
+
+def encode_chats_cursor(last_updated_at, thread_id):
+    """Encode the position of a chat thread in the chats list as an opaque cursor"""
+    raw = json.dumps([last_updated_at.isoformat(), thread_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_chats_cursor(cursor):
+    """Decode a chats list cursor into (last_updated_at, thread_id); plain timestamps from older clients have no thread_id"""
+    try:
+        return datetime.fromisoformat(cursor), None
+    except ValueError:
+        pass
+    
+    try:
+        last_updated_at, thread_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(last_updated_at), str(thread_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
-def clean_expired_cache(background_tasks):
-    """Clean expired cache entries"""
-    current_time = time.time()
-    keys_to_delete = [k for k, v in cache.items() if current_time > v["expires"]]
-    for key in keys_to_delete:
-        del cache[key]
-    # Schedule next cleanup
-    background_tasks.add_task(schedule_cache_cleanup)
+# Trims every thread's checkpoints to the latest few, a batch of threads per run
+checkpoint_compactor = CheckpointCompactor(
+    postgres_pool,
+    keep=config.CHECKPOINT_RETENTION_PER_THREAD,
+    batch_size=config.CHECKPOINT_COMPACTION_BATCH
+)
+
+def build_maintenance_scheduler():
+    """Register the periodic cache sweeps, checkpoint pruning and checkpoint compaction"""
+    scheduler = MaintenanceScheduler()
+    batch_size = config.MAINTENANCE_SWEEP_BATCH
+    
+    # Expired entries are swept a bounded batch at a time, so no tick blocks the event loop
+    scheduler.add_job("response_cache_sweep", lambda: cache.sweep(batch_size), config.MAINTENANCE_SWEEP_INTERVAL_SECONDS)
+    scheduler.add_job("query_cache_sweep", lambda: maintain_cache(batch_size), config.MAINTENANCE_SWEEP_INTERVAL_SECONDS)
+    scheduler.add_job(
+        "checkpoint_prune",
+        lambda: prune_orphaned_checkpoints(postgres_pool, config.CHECKPOINT_PRUNE_BATCH),
+        config.CHECKPOINT_PRUNE_INTERVAL_SECONDS
+    )
+    scheduler.add_job("checkpoint_compaction", checkpoint_compactor.run, config.CHECKPOINT_COMPACTION_INTERVAL_SECONDS)
+    return scheduler
+
+maintenance_scheduler = build_maintenance_scheduler()
+
+# Earlier messages loaded with each turn; with the turn's question and answer they give the
+# last 5 messages used as context for suggested questions
+TURN_CONTEXT_MESSAGES = 3
+
+async def begin_turn(thread_id, user_id):
+    """
+    Verify that the user owns the thread and load its most recent messages, in one round trip.
+    
+    Args:
+        thread_id: The chat thread
+        user_id: The requesting user
+        
+    Returns:
+        List of (role, content) tuples, newest first, or None if the thread does not exist for this user
+    """
+    async with postgres_connection("begin_turn") as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT m.role, m.content
+                FROM chat_threads t
+                LEFT JOIN LATERAL (
+                    SELECT message_id, role, content FROM chat_messages
+                    WHERE thread_id = t.thread_id
+                    ORDER BY message_id DESC
+                    LIMIT %s
+                ) m ON TRUE
+                WHERE t.thread_id = %s AND t.user_id = %s
+                ORDER BY m.message_id DESC
+                """,
+                (TURN_CONTEXT_MESSAGES, thread_id, str(user_id))
+            )
+            rows = await cur.fetchall()
+    
+    if not rows:
+        return None
+    return [(role, content) for role, content in rows if role is not None]
+
+async def commit_turn(thread_id, question, response, suggestions=True):
+    """
+    Store the user's question and the assistant's answer and bump the thread, in one statement.
+    
+    Args:
+        thread_id: The chat thread
+        question: The user's question
+        response: The assistant's answer
+        suggestions: Whether suggestions will be generated for the answer; if not, the answer
+            is marked as skipped so /chat/suggestions does not report it as pending
+        
+    Returns:
+        Dict mapping role ("user", "assistant") to the new message_id
+    """
+    metadata = None if suggestions else json.dumps({"suggestions_status": "skipped", "suggested_questions": []})
+    async with postgres_connection("commit_turn") as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                WITH inserted AS (
+                    INSERT INTO chat_messages (thread_id, role, content, metadata)
+                    VALUES (%(thread_id)s, 'user', %(question)s, NULL),
+                           (%(thread_id)s, 'assistant', %(response)s, %(metadata)s::jsonb)
+                    RETURNING message_id, role
+                ), touched AS (
+                    UPDATE chat_threads SET last_updated_at = CURRENT_TIMESTAMP WHERE thread_id = %(thread_id)s
+                )
+                SELECT role, message_id FROM inserted
+                """,
+                {"thread_id": thread_id, "question": question, "response": response, "metadata": metadata}
+            )
+            message_ids = dict(await cur.fetchall())
+            await conn.commit()
+    return message_ids
 
-def schedule_cache_cleanup():
-    """Schedule cache cleanup after a delay"""
-    time.sleep(300)  # 5 minutes
-    background_tasks = BackgroundTasks()
-    clean_expired_cache(background_tasks)
+async def generate_suggested_questions(question, response, recent_messages=None):
+    """Suggest follow-up questions from the follow-up bank, generating them with the LLM only if no bank entry matches"""
+    suggested_questions = None
+    if followup_bank is not None:
+        asked = [content for role, content in (recent_messages or []) if role == "user"]
+        
+        # Bank suggestions only depend on the turn and the questions already asked, never on who asked,
+        # so identical turns (e.g. system-flow instructions) share them
+        raw_key = json.dumps([question, response, sorted(set(asked))], ensure_ascii=False)
+        bank_key = {"turn": hashlib.md5(raw_key.encode("utf-8")).hexdigest()}
+        suggested_questions, cache_version = await cache.get(SUGGESTIONS_NAMESPACE, "*", "suggestions", bank_key)
+        if suggested_questions is not None:
+            return suggested_questions
+        
+        suggested_questions = await followup_bank.asuggest(question, response, asked=asked)
+        if suggested_questions:
+            await cache.set(SUGGESTIONS_NAMESPACE, "*", "suggestions", bank_key, suggested_questions, cache_version)
+    
+    # LLM suggestions are built from this user's conversation, so they are never shared
+    if suggested_questions is None:
+        suggested_questions = await generate_llm_suggested_questions(question, response, recent_messages)
+    return suggested_questions
 
-def generate_suggested_questions(thread_id, question, response):
+async def generate_llm_suggested_questions(question, response, recent_messages=None):
     """Generate suggested follow-up questions based on the conversation"""
     try:
-        # Get the last few messages for context
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT role, content FROM chat_messages 
-                    WHERE thread_id = %s 
-                    ORDER BY created_at DESC 
-                    LIMIT 5
-                    """,
-                    (thread_id,)
-                )
-                messages = cur.fetchall()
+        # The last few messages for context, newest first, including this turn
+        messages = [("assistant", response), ("user", question)] + list(recent_messages or [])
         
         # Format the conversation context
         conversation = "\n".join([f"{msg[0]}: {msg[1]}" for msg in messages])
@@ -294,7 +454,7 @@ def generate_suggested_questions(thread_id, question, response):
         """
         
         # Use the workflow's LLM to generate suggestions
-        llm_response = config.llm.invoke(prompt)
+        llm_response = await config.llm.ainvoke(prompt)
         
         # Extract JSON array from response
         match = re.search(r'\[.*\]', llm_response.content, re.DOTALL)
@@ -308,6 +468,37 @@ def generate_suggested_questions(thread_id, question, response):
         logger.error(f"Error generating suggested questions: {e}")
         return []
 
+async def write_suggestions_metadata(message_id, status, suggested_questions):
+    """Store the suggestions status and questions in the assistant message's metadata"""
+    async with postgres_connection("store_suggestions") as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE chat_messages
+                SET metadata = COALESCE(metadata, '{}'::jsonb)
+                    || jsonb_build_object('suggestions_status', %s::text, 'suggested_questions', %s::jsonb)
+                WHERE message_id = %s
+                """,
+                (status, json.dumps(suggested_questions), message_id)
+            )
+            await conn.commit()
+
+async def store_suggested_questions(message_id, question, response, recent_messages=None):
+    """Generate suggested follow-up questions and store them in the assistant message's metadata"""
+    try:
+        suggested_questions = await generate_suggested_questions(question, response, recent_messages)
+        await write_suggestions_metadata(message_id, "ready", suggested_questions)
+        return suggested_questions
+    except Exception as e:
+        logger.error(f"Error storing suggested questions: {e}")
+    
+    # Record the failure so clients polling /chat/suggestions stop waiting
+    try:
+        await write_suggestions_metadata(message_id, "failed", [])
+    except Exception as e:
+        logger.error(f"Error marking suggested questions as failed: {e}")
+    return []
+
 def format_markdown_response(text):
     """Format response text with markdown"""
     try:
@@ -336,7 +527,18 @@ async def notify_thread_update(thread_id, message_type="message"):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "maintenance": maintenance_scheduler.stats(),
+        "checkpoints": checkpoint_compactor.stats(),
+        "followup_bank": followup_bank.stats() if followup_bank else None
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latency histograms and LLM token counters in the Prometheus text format"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/chat/new", response_model=ChatThread)
 async def create_new_chat(
@@ -358,40 +560,37 @@ async def create_new_chat(
     thread_id = f"{user_id}/{request.chat_name}/{uuid.uuid4().hex[:8]}"
     
     try:
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
+        async with postgres_connection("create_chat") as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
                     "INSERT INTO chat_threads (thread_id, user_id, chat_name) VALUES (%s, %s, %s) RETURNING thread_id",
                     (thread_id, user_id, request.chat_name)
                 )
-                result = cur.fetchone()
-                conn.commit()
+                result = await cur.fetchone()
+                await conn.commit()
         
         # Generate welcome message
         welcome_message = "Welcome to your new medical assistant chat. How can I help you today?"
         
         # Store welcome message
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
+        async with postgres_connection("create_chat") as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
                     "INSERT INTO chat_messages (thread_id, role, content, message_type) VALUES (%s, %s, %s, %s)",
                     (thread_id, "assistant", welcome_message, "greeting")
                 )
-                conn.commit()
+                await conn.commit()
         
         # Initialize workflow for this thread
         config_params = {"configurable": {"thread_id": thread_id}}
         background_tasks.add_task(
-            workflow.graph.stream,
+            workflow.graph.ainvoke,
             {"messages": [], "payload": payload},
-            config_params,
-            stream_mode="values"
+            config_params
         )
         
         # Invalidate cache for user's chat list
-        cache_key = get_cache_key(user_id, "chats")
-        if cache_key in cache:
-            del cache[cache_key]
+        await invalidate_cache(user_id, "chats")
         
         return {
             "thread_id": thread_id, 
@@ -431,76 +630,83 @@ async def get_user_chats(
         limit = 20  # Default to 20 if out of range
     
     # Check cache first
-    cache_key = get_cache_key(user_id, "chats", {"limit": limit, "cursor": cursor})
-    cached_data = get_cached_data(cache_key)
+    cache_params = {"limit": limit, "cursor": cursor}
+    cached_data, cache_version = await get_cached_data(user_id, "chats", cache_params)
     if cached_data:
         return cached_data
     
+    # The chat count only changes when the user's chat list changes, so it is cached with its pages
+    count_params = {"total_count": True}
+    total_count, count_version = await get_cached_data(user_id, "chats", count_params)
+    
     try:
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                # Get total count of chat threads for this user
-                cur.execute(
-                    "SELECT COUNT(*) FROM chat_threads WHERE user_id = %s",
-                    (user_id,)
+        cursor_position = decode_chats_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    try:
+        async with postgres_connection("list_chats") as conn:
+            async with conn.cursor() as cur:
+                # Count the user's chats in the same round trip only when the count is not cached
+                count_column = (
+                    "(SELECT COUNT(*) FROM chat_threads WHERE user_id = %(user_id)s)"
+                    if total_count is None else "NULL"
                 )
-                total_count = cur.fetchone()[0]
                 
-                # Build the query based on pagination parameters
-                if cursor is None:
+                # Build the query based on pagination parameters; every variant is a range scan
+                # on the (user_id, last_updated_at DESC, thread_id DESC) covering index
+                if cursor_position is None:
                     # Initial load - get most recent chat threads
-                    query = """
-                        SELECT thread_id, chat_name, last_updated_at 
-                        FROM chat_threads 
-                        WHERE user_id = %s 
-                        ORDER BY last_updated_at DESC 
-                        LIMIT %s
-                    """
-                    cur.execute(query, (user_id, limit))
+                    condition = ""
+                elif cursor_position[1] is None:
+                    # Legacy timestamp cursor - load older chat threads (before the cursor)
+                    condition = "AND last_updated_at < %(cursor_time)s"
                 else:
-                    # Load older chat threads (before the cursor)
-                    query = """
-                        SELECT thread_id, chat_name, last_updated_at 
-                        FROM chat_threads 
-                        WHERE user_id = %s AND last_updated_at < %s 
-                        ORDER BY last_updated_at DESC 
-                        LIMIT %s
-                    """
-                    # Parse the cursor timestamp
-                    cursor_timestamp = datetime.fromisoformat(cursor)
-                    cur.execute(query, (user_id, cursor_timestamp, limit))
+                    # Load older chat threads, breaking ties on last_updated_at by thread_id
+                    condition = "AND (last_updated_at, thread_id) < (%(cursor_time)s, %(cursor_thread)s)"
                 
-                chats = cur.fetchall()
+                query = f"""
+                    SELECT thread_id, chat_name, last_updated_at, {count_column}
+                    FROM chat_threads 
+                    WHERE user_id = %(user_id)s {condition}
+                    ORDER BY last_updated_at DESC, thread_id DESC 
+                    LIMIT %(fetch_limit)s
+                """
+                await cur.execute(query, {
+                    "user_id": user_id,
+                    "cursor_time": cursor_position[0] if cursor_position else None,
+                    "cursor_thread": cursor_position[1] if cursor_position else None,
+                    "fetch_limit": limit + 1
+                })
+                chats = await cur.fetchall()
                 
-                # Prepare the response
-                chat_list = []
-                next_cursor = None
+                # The extra row tells whether there are more chat threads
+                has_more = len(chats) > limit
+                chats = chats[:limit]
                 
-                if chats:
-                    # Format chat threads for response
-                    chat_list = [
-                        {
-                            "thread_id": chat[0],
-                            "chat_name": chat[1],
-                            "last_updated_at": chat[2].isoformat() if chat[2] else None
-                        } 
-                        for chat in chats
-                    ]
-                    
-                    # Set cursor for pagination
-                    if len(chat_list) == limit:
-                        next_cursor = chat_list[-1]["last_updated_at"]
+                if total_count is None:
+                    if chats:
+                        total_count = chats[0][3]
+                    elif cursor_position is None:
+                        total_count = 0
+                    else:
+                        # An empty page past the cursor carries no count
+                        await cur.execute("SELECT COUNT(*) FROM chat_threads WHERE user_id = %s", (user_id,))
+                        total_count = (await cur.fetchone())[0]
+                    await set_cached_data(user_id, "chats", count_params, total_count, count_version)
                 
-                # Check if there are more chat threads
-                has_more = False
+                # Format chat threads for response
+                chat_list = [
+                    {
+                        "thread_id": chat[0],
+                        "chat_name": chat[1],
+                        "last_updated_at": chat[2].isoformat() if chat[2] else None
+                    } 
+                    for chat in chats
+                ]
                 
-                if next_cursor:
-                    cursor_timestamp = datetime.fromisoformat(next_cursor)
-                    cur.execute(
-                        "SELECT 1 FROM chat_threads WHERE user_id = %s AND last_updated_at < %s LIMIT 1",
-                        (user_id, cursor_timestamp)
-                    )
-                    has_more = bool(cur.fetchone())
+                # Set cursor for pagination
+                next_cursor = encode_chats_cursor(chats[-1][2], chats[-1][0]) if has_more else None
                 
                 # Build pagination metadata
                 pagination = {
@@ -517,7 +723,7 @@ async def get_user_chats(
                 }
                 
                 # Cache the result
-                set_cached_data(cache_key, result)
+                await set_cached_data(user_id, "chats", cache_params, result, cache_version)
                 
                 return result
     except Exception as e:
@@ -556,101 +762,103 @@ async def get_chat_history(
         raise HTTPException(status_code=403, detail="Unauthorized access to chat")
     
     # Check cache first
-    cache_key = get_cache_key(user_id, f"chat:{thread_id}", {"limit": limit, "cursor": cursor, "direction": direction})
-    cached_data = get_cached_data(cache_key)
+    cache_params = {"limit": limit, "cursor": cursor, "direction": direction}
+    cached_data, cache_version = await get_cached_data(user_id, f"chat:{thread_id}", cache_params)
     if cached_data:
         return cached_data
     
+    # The message count only changes when the thread changes, so it is cached with its pages
+    count_params = {"total_count": True}
+    total_count, count_version = await get_cached_data(user_id, f"chat:{thread_id}", count_params)
+    
     try:
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                # Get total count of messages for this thread
-                cur.execute(
-                    "SELECT COUNT(*) FROM chat_messages WHERE thread_id = %s",
-                    (thread_id,)
+        async with postgres_connection("chat_history") as conn:
+            async with conn.cursor() as cur:
+                # Count the thread's messages in the same round trip only when the count is not cached
+                count_column = (
+                    "(SELECT COUNT(*) FROM chat_messages WHERE thread_id = %(thread_id)s)"
+                    if total_count is None else "NULL"
                 )
-                total_count = cur.fetchone()[0]
                 
-                # Build the query based on pagination parameters
+                # Keyset pagination on the (thread_id, message_id) index: fetch one extra row
+                # to learn whether more messages exist beyond this page
                 if cursor is None:
                     # Initial load - get most recent messages
-                    query = """
-                        SELECT message_id, role, content, created_at, message_type 
-                        FROM chat_messages 
-                        WHERE thread_id = %s 
-                        ORDER BY created_at DESC 
-                        LIMIT %s
-                    """
-                    cur.execute(query, (thread_id, limit))
+                    condition, order, opposite = "", "DESC", None
                 elif direction == "before":
                     # Load older messages (before the cursor)
-                    query = """
-                        SELECT message_id, role, content, created_at, message_type 
-                        FROM chat_messages 
-                        WHERE thread_id = %s AND message_id < %s 
-                        ORDER BY created_at DESC 
-                        LIMIT %s
-                    """
-                    cur.execute(query, (thread_id, cursor, limit))
+                    condition, order, opposite = "AND message_id < %(cursor)s", "DESC", "message_id >= %(cursor)s"
                 else:  # direction == "after"
                     # Load newer messages (after the cursor)
-                    query = """
-                        SELECT message_id, role, content, created_at, message_type 
-                        FROM chat_messages 
-                        WHERE thread_id = %s AND message_id > %s 
-                        ORDER BY created_at ASC 
-                        LIMIT %s
-                    """
-                    cur.execute(query, (thread_id, cursor, limit))
+                    condition, order, opposite = "AND message_id > %(cursor)s", "ASC", "message_id <= %(cursor)s"
                 
-                messages = cur.fetchall()
+                # Whether messages exist on the other side of the cursor, probed in the same round trip
+                opposite_exists = (
+                    f"EXISTS (SELECT 1 FROM chat_messages WHERE thread_id = %(thread_id)s AND {opposite})"
+                    if opposite else "FALSE"
+                )
                 
-                # For "after" direction, we need to reverse the results to maintain chronological order
-                if direction == "after" and messages:
-                    messages.reverse()
+                query = f"""
+                    SELECT message_id, role, content, created_at, message_type, {count_column}, {opposite_exists}
+                    FROM chat_messages 
+                    WHERE thread_id = %(thread_id)s {condition}
+                    ORDER BY message_id {order}
+                    LIMIT %(fetch_limit)s
+                """
+                await cur.execute(query, {"thread_id": thread_id, "cursor": cursor, "fetch_limit": limit + 1})
+                messages = await cur.fetchall()
                 
-                # Prepare the response
-                message_list = []
-                next_cursor = None
-                prev_cursor = None
+                has_more = len(messages) > limit
+                messages = messages[:limit]
                 
                 if messages:
-                    # Format messages for response
-                    message_list = [
-                        {
-                            "message_id": msg[0],
-                            "role": msg[1],
-                            "content": msg[2],
-                            "created_at": msg[3].isoformat() if msg[3] else None,
-                            "message_type": msg[4]
-                        } 
-                        for msg in messages
-                    ]
-                    
-                    # Set cursors for pagination
-                    if len(message_list) == limit:
-                        if direction == "before" or cursor is None:
-                            next_cursor = message_list[-1]["message_id"]
-                        if direction == "after" or cursor is None:
-                            prev_cursor = message_list[0]["message_id"]
+                    has_more_opposite = messages[0][6]
+                elif opposite:
+                    # An empty page carries no probe result
+                    await cur.execute(
+                        f"SELECT {opposite_exists}", {"thread_id": thread_id, "cursor": cursor}
+                    )
+                    has_more_opposite = (await cur.fetchone())[0]
+                else:
+                    has_more_opposite = False
                 
-                # Check if there are more messages in each direction
-                has_more_before = False
-                has_more_after = False
+                if total_count is None:
+                    if messages:
+                        total_count = messages[0][5]
+                    elif cursor is None:
+                        total_count = 0
+                    else:
+                        # An empty page past the cursor carries no count
+                        await cur.execute("SELECT COUNT(*) FROM chat_messages WHERE thread_id = %s", (thread_id,))
+                        total_count = (await cur.fetchone())[0]
+                    await set_cached_data(user_id, f"chat:{thread_id}", count_params, total_count, count_version)
                 
-                if next_cursor:
-                    cur.execute(
-                        "SELECT 1 FROM chat_messages WHERE thread_id = %s AND message_id < %s LIMIT 1",
-                        (thread_id, next_cursor)
-                    )
-                    has_more_before = bool(cur.fetchone())
+                # For "after" direction, we need to reverse the results to maintain newest-first order
+                if direction == "after" and cursor is not None:
+                    messages.reverse()
                 
-                if prev_cursor:
-                    cur.execute(
-                        "SELECT 1 FROM chat_messages WHERE thread_id = %s AND message_id > %s LIMIT 1",
-                        (thread_id, prev_cursor)
-                    )
-                    has_more_after = bool(cur.fetchone())
+                # Messages exist past the page in the paging direction if the extra row was found,
+                # and on the other side of the cursor if the probe found one
+                if cursor is None or direction == "before":
+                    has_more_before, has_more_after = has_more, has_more_opposite
+                else:
+                    has_more_before, has_more_after = has_more_opposite, has_more
+                
+                # Prepare the response
+                message_list = [
+                    {
+                        "message_id": msg[0],
+                        "role": msg[1],
+                        "content": msg[2],
+                        "created_at": msg[3].isoformat() if msg[3] else None,
+                        "message_type": msg[4]
+                    } 
+                    for msg in messages
+                ]
+                
+                # Set cursors for pagination
+                next_cursor = message_list[-1]["message_id"] if message_list and has_more_before else None
+                prev_cursor = message_list[0]["message_id"] if message_list and has_more_after else None
                 
                 # Build pagination metadata
                 pagination = {
@@ -667,7 +875,7 @@ async def get_chat_history(
                 }
                 
                 # Cache the result
-                set_cached_data(cache_key, result)
+                await set_cached_data(user_id, f"chat:{thread_id}", cache_params, result, cache_version)
                 
                 return result
     except Exception as e:
@@ -695,6 +903,9 @@ async def ask_question(
     
     # Check if streaming is requested
     if user_question.stream:
+        # Background tasks run once the stream has ended, so summarizing the thread never holds it open
+        if thread_id.startswith(f"{user_id}/"):
+            background_tasks.add_task(workflow.asummarize, {"configurable": {"thread_id": thread_id}})
         return StreamingResponse(
             stream_response(user_question, payload),
             media_type="text/event-stream"
@@ -704,47 +915,34 @@ async def ask_question(
         raise HTTPException(status_code=403, detail="Unauthorized access to chat")
     
     try:
-        # Store user question in database
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT chat_name FROM chat_threads WHERE thread_id = %s", (thread_id,))
-                if not cur.fetchone():
-                    raise HTTPException(status_code=404, detail=f"Chat with thread_id '{thread_id}' not found")
-                
-                cur.execute(
-                    "INSERT INTO chat_messages (thread_id, role, content) VALUES (%s, %s, %s)",
-                    (thread_id, "user", user_question.question)
-                )
-                conn.commit()
+        # Verify the thread and load the recent messages for suggestions
+        recent_messages = await begin_turn(thread_id, user_id)
+        if recent_messages is None:
+            raise HTTPException(status_code=404, detail=f"Chat with thread_id '{thread_id}' not found")
         
         # Get response from workflow
         config_params = {"configurable": {"thread_id": thread_id}}
-        response = workflow.get_response(user_question.question, payload, config_params)
+        response = await workflow.aget_response(user_question.question, payload, config_params)
         
         # Format response with markdown
         formatted_response = format_markdown_response(response)
         
-        # Store assistant response in database
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO chat_messages (thread_id, role, content) VALUES (%s, %s, %s)",
-                    (thread_id, "assistant", response)
-                )
-                cur.execute(
-                    "UPDATE chat_threads SET last_updated_at = CURRENT_TIMESTAMP WHERE thread_id = %s",
-                    (thread_id,)
-                )
-                conn.commit()
+        # Store the question and the answer in one round trip
+        message_ids = await commit_turn(thread_id, user_question.question, response, user_question.suggestions)
+        message_id = message_ids.get("assistant")
+        
+        # Generate suggested follow-up questions after the response is sent; clients fetch them from /chat/suggestions
+        if user_question.suggestions and message_id is not None:
+            background_tasks.add_task(
+                store_suggested_questions, message_id, user_question.question, response, recent_messages
+            )
         
-        # Generate suggested follow-up questions
-        suggested_questions = generate_suggested_questions(thread_id, user_question.question, response)
+        # Fold older turns of long threads into their summary without delaying the response
+        background_tasks.add_task(workflow.asummarize, config_params)
         
-        # Invalidate cache for this thread's history
-        cache_key_prefix = get_cache_key(user_id, f"chat:{thread_id}")
-        keys_to_delete = [k for k in cache.keys() if k.startswith(cache_key_prefix)]
-        for key in keys_to_delete:
-            del cache[key]
+        # The turn changed this thread's history and moved the thread to the top of the chat list
+        await invalidate_cache(user_id, f"chat:{thread_id}")
+        await invalidate_cache(user_id, "chats")
         
         # Notify connected clients about the update
         background_tasks.add_task(notify_thread_update, thread_id)
@@ -752,8 +950,11 @@ async def ask_question(
         return {
             "response": formatted_response, 
             "thread_id": thread_id,
-            "suggested_questions": suggested_questions
+            "message_id": message_id,
+            "suggested_questions": None
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing question: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -777,70 +978,47 @@ async def stream_response(user_question: UserQuestion, payload: dict):
         return
     
     try:
-        # Store user question in database
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT chat_name FROM chat_threads WHERE thread_id = %s", (thread_id,))
-                if not cur.fetchone():
-                    yield f"data: {json.dumps({'type': 'error', 'error': 'Chat not found'})}\n\n"
-                    return
-                
-                cur.execute(
-                    "INSERT INTO chat_messages (thread_id, role, content) VALUES (%s, %s, %s)",
-                    (thread_id, "user", user_question.question)
-                )
-                conn.commit()
+        # Verify the thread and load the recent messages for suggestions
+        recent_messages = await begin_turn(thread_id, user_id)
+        if recent_messages is None:
+            yield f"data: {json.dumps({'type': 'error', 'error': 'Chat not found'})}\n\n"
+            return
         
-        # Get response from workflow
+        # Stream the answer from the workflow as it is generated
         config_params = {"configurable": {"thread_id": thread_id}}
+        full_response = ""
+        streamed_tokens = False
         
-        # Simulate streaming by breaking the response into chunks
-        # In a real implementation, you would modify workflow.get_response to yield chunks
-        response = workflow.get_response(user_question.question, payload, config_params)
-        
-        # Store the complete response for later use
-        full_response = response
-        
-        # Break response into words for streaming simulation
-        words = response.split()
-        chunks = []
-        current_chunk = ""
-        
-        for word in words:
-            current_chunk += word + " "
-            if len(current_chunk) >= 10 or word == words[-1]:
-                chunks.append(current_chunk)
-                current_chunk = ""
-        
-        # Stream each chunk with a small delay
-        for chunk in chunks:
-            yield f"data: {json.dumps({'type': 'content', 'content': chunk})}\n\n"
-            await asyncio.sleep(0.1)  # Small delay to simulate typing
-        
-        # Store assistant response in database
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO chat_messages (thread_id, role, content) VALUES (%s, %s, %s)",
-                    (thread_id, "assistant", full_response)
-                )
-                cur.execute(
-                    "UPDATE chat_threads SET last_updated_at = CURRENT_TIMESTAMP WHERE thread_id = %s",
-                    (thread_id,)
-                )
-                conn.commit()
+        async for event in workflow.astream_response(user_question.question, payload, config_params):
+            if event["type"] == "status":
+                yield f"data: {json.dumps({'type': 'status', 'status': event['status']})}\n\n"
+            elif event["type"] == "token":
+                streamed_tokens = True
+                yield f"data: {json.dumps({'type': 'content', 'content': event['content']})}\n\n"
+            elif event["type"] == "final":
+                full_response = event["content"]
+        
+        # Answers that were not produced by a streaming LLM call (e.g. fallbacks) are sent whole
+        if not streamed_tokens:
+            yield f"data: {json.dumps({'type': 'content', 'content': full_response})}\n\n"
+        
+        # Store the question and the answer in one round trip
+        message_ids = await commit_turn(thread_id, user_question.question, full_response, user_question.suggestions)
+        message_id = message_ids.get("assistant")
         
-        # Generate suggested follow-up questions
-        suggested_questions = generate_suggested_questions(thread_id, user_question.question, full_response)
+        # The whole answer has been streamed already, so suggestions no longer delay it
+        suggested_questions = []
+        if user_question.suggestions and message_id is not None:
+            suggested_questions = await store_suggested_questions(
+                message_id, user_question.question, full_response, recent_messages
+            )
         
         # Send the final event with suggested questions
-        yield f"data: {json.dumps({'type': 'done', 'suggested_questions': suggested_questions})}\n\n"
+        yield f"data: {json.dumps({'type': 'done', 'message_id': message_id, 'suggested_questions': suggested_questions})}\n\n"
         
-        # Invalidate cache for this thread's history
-        cache_key_prefix = get_cache_key(user_id, f"chat:{thread_id}")
-        keys_to_delete = [k for k in cache.keys() if k.startswith(cache_key_prefix)]
-        for key in keys_to_delete:
-            del cache[key]
+        # The turn changed this thread's history and moved the thread to the top of the chat list
+        await invalidate_cache(user_id, f"chat:{thread_id}")
+        await invalidate_cache(user_id, "chats")
         
         # Notify connected clients about the update
         await notify_thread_update(thread_id)
@@ -849,6 +1027,56 @@ async def stream_response(user_question: UserQuestion, payload: dict):
         logger.error(f"Error streaming response: {str(e)}")
         yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
 
+@app.post("/chat/suggestions", response_model=SuggestionsResponse)
+async def get_suggested_questions(
+    request: SuggestionsRequest,
+    payload: dict = Depends(validate_token)
+):
+    """
+    Get the suggested follow-up questions generated for an answer.
+    
+    Args:
+        request: SuggestionsRequest containing thread_id and the assistant message_id
+        payload: User payload from JWT token
+        
+    Returns:
+        The suggestions with status 'ready', or status 'pending' while they are still being
+        generated, 'skipped' if none were requested and 'failed' if generating them failed
+    """
+    user_id = payload.get("user_id")
+    thread_id = request.thread_id
+    
+    if not thread_id.startswith(f"{user_id}/"):
+        raise HTTPException(status_code=403, detail="Unauthorized access to chat")
+    
+    try:
+        async with postgres_connection("get_suggestions") as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    SELECT m.metadata -> 'suggested_questions', m.metadata ->> 'suggestions_status'
+                    FROM chat_messages m
+                    JOIN chat_threads t ON t.thread_id = m.thread_id
+                    WHERE m.message_id = %s AND m.thread_id = %s AND t.user_id = %s AND m.role = 'assistant'
+                    """,
+                    (request.message_id, thread_id, str(user_id))
+                )
+                row = await cur.fetchone()
+        
+        if not row:
+            raise HTTPException(status_code=404, detail="Message not found")
+        
+        suggested_questions, status = row
+        if status is None:
+            # Answers stored before the status was recorded only carry their questions
+            status = "pending" if suggested_questions is None else "ready"
+        return {"status": status, "suggested_questions": suggested_questions or []}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching suggested questions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching suggested questions: {str(e)}")
+
 @app.delete("/chat")
 async def delete_chat(
     request: ThreadIDRequest, 
@@ -872,34 +1100,31 @@ async def delete_chat(
         raise HTTPException(status_code=403, detail="Unauthorized access to chat")
     
     try:
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
+        async with postgres_connection("delete_chat") as conn:
+            async with conn.cursor() as cur:
+                # Drop the thread's graph state along with the chat
+                await delete_thread_checkpoints(cur, [thread_id])
+                
                 # Delete messages first (foreign key constraint)
-                cur.execute(
+                await cur.execute(
                     "DELETE FROM chat_messages WHERE thread_id = %s",
                     (thread_id,)
                 )
                 
                 # Delete the thread
-                cur.execute(
+                await cur.execute(
                     "DELETE FROM chat_threads WHERE thread_id = %s AND user_id = %s",
                     (thread_id, user_id)
                 )
                 deleted_count = cur.rowcount
-                conn.commit()
+                await conn.commit()
         
         if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Chat not found or already deleted")
         
         # Invalidate cache for user's chat list and this thread's history
-        cache_key_prefix = get_cache_key(user_id, "chats")
-        keys_to_delete = [k for k in cache.keys() if k.startswith(cache_key_prefix)]
-        
-        cache_key_prefix = get_cache_key(user_id, f"chat:{thread_id}")
-        keys_to_delete.extend([k for k in cache.keys() if k.startswith(cache_key_prefix)])
-        
-        for key in keys_to_delete:
-            del cache[key]
+        await invalidate_cache(user_id, "chats")
+        await invalidate_cache(user_id, f"chat:{thread_id}")
         
         # Notify connected clients about the deletion
         background_tasks.add_task(notify_thread_update, thread_id, "deleted")
@@ -930,19 +1155,22 @@ async def delete_all_chats(
     try:
         # Get all thread IDs for notification
         thread_ids = []
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
+        async with postgres_connection("delete_all_chats") as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
                     "SELECT thread_id FROM chat_threads WHERE user_id = %s",
                     (user_id,)
                 )
-                thread_ids = [row[0] for row in cur.fetchall()]
+                thread_ids = [row[0] for row in await cur.fetchall()]
         
         # Delete all chats for the user
-        with postgres_pool.connection() as conn:
-            with conn.cursor() as cur:
+        async with postgres_connection("delete_all_chats") as conn:
+            async with conn.cursor() as cur:
+                # Drop the graph state of every chat while the threads can still be looked up
+                await delete_user_checkpoints(cur, user_id)
+                
                 # Delete messages first (foreign key constraint)
-                cur.execute(
+                await cur.execute(
                     """
                     DELETE FROM chat_messages 
                     WHERE thread_id IN (
@@ -953,18 +1181,15 @@ async def delete_all_chats(
                 )
                 
                 # Delete the threads
-                cur.execute(
+                await cur.execute(
                     "DELETE FROM chat_threads WHERE user_id = %s",
                     (user_id,)
                 )
                 deleted_count = cur.rowcount
-                conn.commit()
+                await conn.commit()
         
         # Invalidate all cache entries for this user
-        cache_key_prefix = get_cache_key(user_id, "")
-        keys_to_delete = [k for k in cache.keys() if k.startswith(cache_key_prefix)]
-        for key in keys_to_delete:
-            del cache[key]
+        await invalidate_cache(user_id)
         
         # Notify connected clients about the deletion
         for thread_id in thread_ids:
@@ -1039,10 +1264,26 @@ async def delete_all_chats(
 #         except:
 #             pass
 
-# Initialize cache cleanup task
+# Initialize maintenance tasks
 @app.on_event("startup")
 async def startup_event():
     """Initialize background tasks on startup"""
-    background_tasks = BackgroundTasks()
-    background_tasks.add_task(schedule_cache_cleanup)
+    # Open the async Postgres pool and compile the workflow on the running event loop
+    await postgres_pool.open()
+    await workflow.setup()
+    
+    # Let worker threads reach the cache backend, and create its table if it is shared
+    bind_event_loop(asyncio.get_running_loop())
+    await cache.setup()
+    
+    # Load the shared FAISS stores once so no request pays for reading them from disk
+    faiss_registry.preload("faiss_index", "system_flow", *([config.FOLLOWUP_BANK_PATH] if followup_bank else []))
+    
+    # Sweep caches, prune and compact checkpoints periodically on the event loop
+    maintenance_scheduler.start()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop maintenance and release the Postgres pool on shutdown"""
+    await maintenance_scheduler.stop()
+    await postgres_pool.close()
@@ -0,0 +1,97 @@
+"""
+Baseline comparison for the micro-benchmarks.
+
+Each benchmark's median time is compared with the value stored for it in
+baselines.json; a run fails when a benchmark is slower than its baseline by
+more than the regression threshold. Baselines are only meaningful on the
+machine that recorded them, so record new ones with --update-baselines
+after moving to different hardware or after an intended speed change.
+
+Usage:
+    python -m pytest benchmarks                       # compare with the stored baselines
+    python -m pytest benchmarks --update-baselines    # record new baselines
+    python -m pytest benchmarks --regression-threshold 2.0
+"""
+import json
+import os
+import platform
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+
+# Allowed slowdown over the baseline median before a benchmark fails
+DEFAULT_REGRESSION_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", 1.5))
+
+_observed: Dict[str, float] = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("baselines")
+    group.addoption(
+        "--update-baselines", action="store_true", default=False,
+        help="Store the measured medians as the new baselines instead of comparing with them"
+    )
+    group.addoption(
+        "--regression-threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+        help="Fail when a benchmark's median exceeds its baseline by this factor"
+    )
+
+
+def _load_baselines() -> Dict[str, float]:
+    if not BASELINES_PATH.exists():
+        return {}
+    with open(BASELINES_PATH, encoding="utf-8") as f:
+        return json.load(f).get("benchmarks", {})
+
+
+@pytest.fixture
+def bench(request, benchmark):
+    """
+    Run a function under pytest-benchmark and check its median against the baseline.
+
+    Returns:
+        Callable: bench(func, *args, **kwargs) -> func's return value.
+    """
+    name = request.node.name
+    baselines = _load_baselines()
+
+    def run(func, *args, **kwargs):
+        result = benchmark(func, *args, **kwargs)
+
+        # pytest-benchmark was disabled (--benchmark-disable): nothing was measured
+        if benchmark.stats is None:
+            return result
+
+        median = benchmark.stats.stats.median
+        _observed[name] = median
+        if request.config.getoption("--update-baselines"):
+            return result
+
+        baseline = baselines.get(name)
+        threshold = request.config.getoption("--regression-threshold")
+        if baseline and median > baseline * threshold:
+            pytest.fail(
+                f"{name}: median {median * 1e6:.1f}us is {median / baseline:.2f}x the baseline "
+                f"{baseline * 1e6:.1f}us (threshold {threshold:.2f}x)"
+            )
+        return result
+
+    return run
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not session.config.getoption("--update-baselines", default=False) or not _observed:
+        return
+
+    baselines = _load_baselines()
+    baselines.update(_observed)
+    with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "machine": f"{platform.system()} {platform.machine()}, {platform.python_implementation()} {platform.python_version()}",
+            "unit": "seconds (median per call)",
+            "benchmarks": dict(sorted(baselines.items())),
+        }, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Keywords deciding the category of a question, checked in order
+CATEGORY_KEYWORDS = [
+    ("doctor_recommendation_related", ["which doctor", "recommend", "specialist", "should i see"]),
+    ("query_related", ["my appointment", "my review", "my notification", "my payment", "how many", "show me"]),
+    ("system_flow_related", ["the app", "how do i", "how can i", "where can i", "profile settings", "log out"]),
+    ("out_of_scope", ["weather", "cook", "programming", "homework"]),
+]
+
+# SQL returned for database questions, by keyword; {user_id} is the caller's id
+SQL_TEMPLATES = [
+    ("review", "SELECT r.Rate, r.Comment, r.CreatedAt FROM [db18302].[dbo].[Reviews] r WHERE r.AppUserId = {user_id} ORDER BY r.CreatedAt DESC"),
+    ("notification", "SELECT COUNT(*) AS UnreadNotifications FROM [db18302].[dbo].[Notifications] n WHERE n.UserId = {user_id} AND n.IsRead = 0"),
+    ("payment", "SELECT p.Amount, p.Status, p.CreatedAt FROM [db18302].[dbo].[Payments] p JOIN [db18302].[dbo].[Appointments] a ON p.AppointmentId = a.Id WHERE a.PatientId = {user_id}"),
+    ("", "SELECT TOP 20 a.Id, a.StartDate, a.AppointmentStatus, a.PaymentStatus FROM [db18302].[dbo].[Appointments] a WHERE a.PatientId = {user_id} ORDER BY a.StartDate DESC"),
+]
+
+FILLER_WORDS = (
+    "rest hydration symptoms doctor treatment daily routine sleep balanced diet exercise "
+    "medication dosage monitor follow-up prevention care appointment clinic advice"
+).split()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Gemini chat model.
+
+    The reply is chosen from markers in the prompt (intent classification,
+    SQL generation, translation, retrieval QA, suggestions), so every node of
+    the workflow gets a well-formed answer. Latency is simulated as a fixed
+    time to the first token plus a per-token rate, and replies carry token
+    usage like the real model.
+    """
+
+    latency: float = 0.2
+    tokens_per_second: float = 200.0
+    answer_tokens: int = 120
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @staticmethod
+    def _prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    @staticmethod
+    def _question(messages: List[BaseMessage]) -> str:
+        for message in reversed(messages):
+            if message.type == "human":
+                return str(message.content)
+        return str(messages[-1].content) if messages else ""
+
+    def _answer(self, seed: str) -> str:
+        digest = hashlib.md5(seed.encode("utf-8")).digest()
+        words = [FILLER_WORDS[(digest[i % len(digest)] + i) % len(FILLER_WORDS)] for i in range(self.answer_tokens)]
+        return " ".join(words).capitalize() + "."
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        prompt = self._prompt(messages)
+        question = self._question(messages)
+        lowered = question.lower()
+
+        if "Determine the category of the latest user question" in prompt:
+            for category, keywords in CATEGORY_KEYWORDS:
+                if any(keyword in lowered for keyword in keywords):
+                    return category
+            return "medical_related"
+
+        if "You are an SQL expert" in prompt:
+            match = re.search(r"Use this user id if needed:\**\s*(\S+)", prompt)
+            user_id = match.group(1) if match else "0"
+            sql = next(template for keyword, template in SQL_TEMPLATES if keyword in lowered)
+            return f"```sql\n{sql.format(user_id=user_id)}\n```"
+
+        if "Translate this question to English" in prompt:
+            match = re.search(r"Translate this question to English:\s*(.*?)\n\s*\n", prompt, re.DOTALL)
+            return match.group(1).strip() if match else question
+
+        if "Classify the intent of this database query question" in prompt:
+            return "SIMPLE"
+
+        if "pieces of context" in prompt:
+            context = prompt.split("----------------", 1)[-1].strip()
+            return context[:300] or "I don't know."
+
+        if "follow-up questions" in prompt:
+            return json.dumps([{"text": f"Can you tell me more about {word}?"} for word in self._answer(prompt).split()[:3]])
+
+        if "Return only a JSON array of strings" in prompt:
+            return json.dumps(["How do I book an appointment?"])
+
+        return self._answer(prompt)
+
+    def _usage(self, messages: List[BaseMessage], text: str) -> dict:
+        input_tokens = len(WORD_PATTERN.findall(self._prompt(messages)))
+        output_tokens = len(WORD_PATTERN.findall(text))
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _duration(self, text: str) -> float:
+        return self.latency + len(text.split()) / self.tokens_per_second
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text = self._respond(messages)
+        time.sleep(self._duration(text))
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text = self._respond(messages)
+        await asyncio.sleep(self._duration(text))
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        text = self._respond(messages)
+        await asyncio.sleep(self.latency)
+
+        for i, word in enumerate(text.split(" ")):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}"))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings.
+
+    Every word is hashed into one of `size` signed buckets and the vector is
+    L2-normalized, so texts sharing words are close to each other. This keeps
+    FAISS retrieval, the intent router and the semantic caches meaningful
+    without calling the embeddings API.
+    """
+
+    def __init__(self, size: int = 256, latency: float = 0.0):
+        """
+        Args:
+            size: Number of dimensions.
+            latency: Seconds each call takes, to simulate the remote API.
+        """
+        self.size = size
+        self.latency = latency
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for word in WORD_PATTERN.findall(text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = sum(value * value for value in vector) ** 0.5
+        return [value / norm for value in vector] if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._embed(text)
@@ -0,0 +1,147 @@
+"""
+Realistic inputs for the helper_functions micro-benchmarks.
+
+Every builder is deterministic, so runs on the same machine compare like with
+like against the stored baselines.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+ARABIC_QUESTION = "ما هي أعراض مرض السكري من النوع الثاني وكيف يمكن علاجه؟"
+ENGLISH_QUESTION = "What are the symptoms of type 2 diabetes and how can it be treated?"
+
+LINKED_SERVER_QUERY = """
+SELECT TOP 20 d.FirstName + ' ' + d.LastName AS DoctorName, s.Name AS Specialization,
+       a.StartDate, a.EndDate, a.AppointmentStatus, p.Amount, p.Status
+FROM [mosefak-app].[dbo].[Appointments] a
+JOIN [mosefak-app].[dbo].[Doctors] doc ON a.DoctorId = doc.Id
+JOIN [mosefak-app].[dbo].[AspNetUsers] d ON doc.AppUserId = d.Id
+JOIN [mosefak-app].[dbo].[DoctorSpecialization] ds ON ds.DoctorsId = doc.Id
+JOIN [mosefak-app].[dbo].[Specializations] s ON ds.SpecializationsId = s.Id
+LEFT JOIN Payments p ON p.AppointmentId = a.Id
+WHERE a.StartDate >= '2024-01-01' AND a.AppointmentStatus IN ('Confirmed', 'Completed')
+ORDER BY a.StartDate DESC
+"""
+
+UNFILTERED_QUERY = (
+    "SELECT a.Id, a.StartDate, a.AppointmentStatus FROM [mosefak-app].[dbo].[Appointments] a "
+    "JOIN [mosefak-app].[dbo].[Payments] p ON p.AppointmentId = a.Id "
+    "WHERE a.AppointmentStatus = 'Confirmed' ORDER BY a.StartDate DESC"
+)
+
+ADMIN_QUERY = (
+    "SELECT s.Name, COUNT(*) AS Appointments, AVG(p.Amount) AS AverageAmount "
+    "FROM [mosefak-app].[dbo].[Appointments] a "
+    "JOIN [mosefak-app].[dbo].[Payments] p ON p.AppointmentId = a.Id "
+    "JOIN [mosefak-app].[dbo].[DoctorSpecialization] ds ON ds.DoctorsId = a.DoctorId "
+    "JOIN [mosefak-app].[dbo].[Specializations] s ON ds.SpecializationsId = s.Id "
+    "GROUP BY s.Name ORDER BY Appointments DESC"
+)
+
+SENTENCES = [
+    "I have had a headache for three days and it gets worse in the evening.",
+    "Headaches that get worse over several days should be checked by a doctor, especially with fever.",
+    "Can I take ibuprofen with my blood pressure medication?",
+    "Ibuprofen can raise blood pressure; ask your doctor before combining it with your medication.",
+    "Which specialist should I see for recurring chest pain?",
+    "Recurring chest pain should be evaluated by a cardiologist as soon as possible.",
+]
+
+
+def long_history(turns: int = 50, seed: int = 42) -> str:
+    """
+    The str() of a conversation's message list, as the nodes pass it to extract_messages.
+
+    Args:
+        turns: Number of question/answer pairs.
+        seed: Random seed.
+
+    Returns:
+        str: Repr-style HumanMessage/AIMessage list.
+    """
+    rng = random.Random(seed)
+    messages = []
+    for turn in range(turns):
+        question = rng.choice(SENTENCES[0::2])
+        answer = " ".join(rng.choice(SENTENCES[1::2]) for _ in range(rng.randint(3, 8)))
+        messages.append(
+            f"HumanMessage(content='{question}', additional_kwargs={{}}, response_metadata={{}}, id='h-{turn:04d}')"
+        )
+        messages.append(
+            f"AIMessage(content='{answer}', additional_kwargs={{}}, response_metadata={{'finish_reason': 'STOP'}}, "
+            f"id='a-{turn:04d}', usage_metadata={{'input_tokens': 812, 'output_tokens': 164, 'total_tokens': 976}})"
+        )
+    return "[" + ", ".join(messages) + "]"
+
+
+def wide_results(rows: int = 5000, columns: int = 12, seed: int = 42) -> List[Tuple]:
+    """
+    A wide SQL result set, as pyodbc rows.
+
+    Args:
+        rows: Number of rows.
+        columns: Number of columns (ints, floats, strings and datetimes, in turn).
+        seed: Random seed.
+
+    Returns:
+        List[Tuple]: The rows.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    kinds = [
+        lambda: rng.randint(1, 100000),
+        lambda: round(rng.uniform(50, 5000), 2),
+        lambda: rng.choice(["Pending", "Confirmed", "Completed", "Cancelled"]),
+        lambda: start + timedelta(minutes=rng.randint(0, 60 * 24 * 700)),
+    ]
+    return [tuple(kinds[i % len(kinds)]() for i in range(columns)) for _ in range(rows)]
+
+
+def doctor_rows(count: int = 2000, seed: int = 42) -> List[Tuple]:
+    """
+    Doctor rows as fetch_doctor_rows returns them.
+
+    Args:
+        count: Number of doctors.
+        seed: Random seed.
+
+    Returns:
+        List[Tuple]: (name, working days, street, city, country, specializations) rows.
+    """
+    rng = random.Random(seed)
+    first_names = ["Ahmed", "Mona", "Omar", "Sara", "Youssef", "Nour", "Karim", "Laila"]
+    last_names = ["Hassan", "Ali", "Mahmoud", "Ibrahim", "Saeed", "Fahmy"]
+    days = ["Saturday", "Sunday", "Monday", "Tuesday", "Wednesday", "Thursday"]
+    cities = ["Cairo", "Giza", "Alexandria", "Mansoura", "Tanta"]
+    specializations = ["Cardiology", "Dermatology", "Neurology", "Pediatrics", "Orthopedics"]
+    return [
+        (
+            f"Dr. {rng.choice(first_names)} {rng.choice(last_names)}",
+            ", ".join(sorted(rng.sample(days, rng.randint(1, 4)), key=days.index)),
+            f"{rng.randint(1, 200)} Street {rng.randint(1, 50)}",
+            rng.choice(cities),
+            "Egypt",
+            ", ".join(rng.sample(specializations, rng.randint(1, 2))),
+        )
+        for _ in range(count)
+    ]
+
+
+def long_text(arabic: bool, words: int = 2000, seed: int = 42) -> str:
+    """
+    A long message, with an Arabic sentence at the very end or none at all.
+
+    Both are worst cases for contains_arabic, which has to scan the whole text.
+
+    Args:
+        arabic: Whether the text ends with Arabic.
+        words: Approximate number of English words.
+        seed: Random seed.
+
+    Returns:
+        str: The text.
+    """
+    rng = random.Random(seed)
+    text = " ".join(rng.choice(SENTENCES) for _ in range(words // 12))
+    return f"{text} {ARABIC_QUESTION}" if arabic else text
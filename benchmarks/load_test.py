@@ -0,0 +1,367 @@
+"""
+Offline end-to-end load test of the chatbot API.
+
+Runs the real FastAPI app and LangGraph workflow from backend.py with local
+stand-ins for the external services:
+
+- Gemini chat model -> FakeChatModel (deterministic, configurable latency)
+- Gemini embeddings -> HashingEmbeddings
+- SQL Server (linked server) -> SQLite database generated from tables_info.py
+- Postgres -> BENCH_POSTGRES_URI, or an embedded server from the `pgserver` package
+
+Concurrent virtual users create a chat and then alternate /ask, /chat and
+/chats calls; the report lists throughput and p50/p95/p99 latency per
+endpoint, plus the time spent in each workflow span.
+
+Usage:
+    python -m benchmarks.load_test --users 20 --turns 5 --llm-latency 0.3
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+MEDICAL_ADVICES_CSV = os.path.join(REPO_ROOT, "Data Prepration", "medical_advices.csv")
+CHAT_SCHEMA_SQL = os.path.join(REPO_ROOT, "Data Prepration", "create_chat_messages_schemas.sql")
+
+# Questions sent by the virtual users, by the workflow branch they exercise
+QUESTIONS = {
+    "medical": [
+        "What are the symptoms of type 2 diabetes?",
+        "How is high blood pressure treated?",
+        "What could be a negative effect of blowing your nose when you have a cold?",
+        "What is Semaglutide approved for?",
+        "How can I prevent migraines?",
+    ],
+    "system_flow": [
+        "How do I book an appointment in the app?",
+        "How can I change my password?",
+        "Where can I find my notifications in the app?",
+    ],
+    "query": [
+        "Show me my appointments",
+        "How many unread notifications do I have?",
+        "Show me my reviews",
+        "Show me my payments",
+    ],
+    "doctor": [
+        "Which doctor should I see for chest pain?",
+        "Can you recommend a dermatology specialist?",
+    ],
+}
+
+# Paragraphs of the synthetic system-flow documentation store
+SYSTEM_FLOW_SECTIONS = [
+    "Booking an appointment: open the Doctors tab, choose a doctor, pick a free time slot and press Book.",
+    "Cancelling an appointment: open My Appointments, select the appointment and press Cancel.",
+    "Payments: appointments are paid by card from the appointment details page after booking.",
+    "Notifications: the bell icon on the home screen lists reminders and appointment updates.",
+    "Profile settings: open the Profile tab to edit your name, phone number and password.",
+    "Reviews: after a completed appointment you can rate the doctor from 1 to 5 and leave a comment.",
+    "Support: the Help page lists frequently asked questions and a form to contact support.",
+]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test of the chatbot API.")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--turns", type=int, default=5, help="Questions asked by each user")
+    parser.add_argument("--mix", default="medical=4,system_flow=2,query=3,doctor=1", help="Relative weights of the question kinds")
+    parser.add_argument("--stream", action="store_true", help="Ask with stream=true and read the whole SSE response")
+    parser.add_argument("--no-suggestions", action="store_true", help="Ask without suggested follow-up questions")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds until the fake model's first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0, help="Output rate of the fake model")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds per fake embeddings call")
+    parser.add_argument("--sql-latency", type=float, default=0.005, help="Seconds per SQL Server stand-in query")
+    parser.add_argument("--db-scale", type=float, default=1.0, help="Multiplier for the rows of the SQL Server stand-in")
+    parser.add_argument("--faiss-rows", type=int, default=2000, help="Medical advices indexed in the FAISS stand-in")
+    parser.add_argument("--cache-backend", default="memory", choices=["memory", "postgres"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None, help="Directory for the generated stores (a temporary one by default)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def start_postgres(workdir: str):
+    """
+    Return the Postgres used by the run.
+
+    Args:
+        workdir: Directory where an embedded server keeps its data.
+
+    Returns:
+        tuple: (URI, embedded server or None); BENCH_POSTGRES_URI is used if set.
+    """
+    uri = os.getenv("BENCH_POSTGRES_URI")
+    if uri:
+        return uri, None
+
+    try:
+        import pgserver  # type: ignore
+    except ImportError:
+        sys.exit("Set BENCH_POSTGRES_URI or install pgserver (pip install -r benchmarks/requirements.txt).")
+
+    server = pgserver.get_server(os.path.join(workdir, "pgdata"), cleanup_mode="stop")
+    return server.get_uri(), server
+
+
+def configure_environment(args: argparse.Namespace, postgres_uri: str) -> None:
+    """Point the application settings at the stand-ins; must run before the Workflow modules are imported."""
+    os.environ.update({
+        "POSTGRES_DB_URI": postgres_uri,
+        "MODEL_NAME": "fake-chat",
+        "EMBEDDING_MODEL_NAME": "hashing",
+        "GOOGLE_API_KEY": "offline",
+        "CACHE_BACKEND": args.cache_backend,
+        "DOCTOR_INDEX_PATH": "doctor_index",
+        "FOLLOWUP_BANK_PATH": "followup_bank",
+        # Keep the periodic maintenance out of the measured window
+        "MAINTENANCE_SWEEP_INTERVAL_SECONDS": "3600",
+        "CHECKPOINT_PRUNE_INTERVAL_SECONDS": "86400",
+    })
+
+
+def install_stand_ins(args: argparse.Namespace, sqlite_path: str):
+    """
+    Replace the Gemini clients and the SQL Server pool of the shared Config.
+
+    Returns:
+        Config: The shared configuration.
+    """
+    from benchmarks.fakes import FakeChatModel, HashingEmbeddings
+    from benchmarks.sqlserver_standin import SqliteConnection
+    from Workflow.utils.config import get_config
+    from Workflow.utils.metrics import LLMMetricsCallback
+    from Workflow.utils.sql_server_pool import SqlServerConnectionPool
+
+    config = get_config()
+    config.llm = FakeChatModel(
+        latency=args.llm_latency,
+        tokens_per_second=args.llm_tokens_per_second,
+        callbacks=[LLMMetricsCallback("fake-chat")]
+    )
+    config.embeddings = HashingEmbeddings(latency=args.embedding_latency)
+    config.mosefak_app_pool = SqlServerConnectionPool(
+        connect=lambda: SqliteConnection(sqlite_path, latency=args.sql_latency),
+        min_size=config.MOSEFAK_APP_POOL_MIN_SIZE,
+        max_size=config.MOSEFAK_APP_POOL_MAX_SIZE,
+        query_timeout=config.MOSEFAK_APP_QUERY_TIMEOUT,
+        checkout_timeout=config.MOSEFAK_APP_POOL_TIMEOUT,
+        health_check_interval=config.MOSEFAK_APP_HEALTH_CHECK_SECONDS
+    )
+    return config
+
+
+def build_stores(args: argparse.Namespace, embeddings) -> None:
+    """Build the FAISS stores the app loads (in the current directory) with the fake embeddings."""
+    import pandas as pd
+    from langchain_community.vectorstores import FAISS
+    from Workflow.utils.followup_bank import build_followup_bank
+    from Workflow.utils.vector_store import create_and_save_faiss
+
+    df = pd.read_csv(MEDICAL_ADVICES_CSV)
+    sample_path = "medical_advices_sample.csv"
+    df.sample(n=min(args.faiss_rows, len(df)), random_state=args.seed).to_csv(sample_path, index=False)
+
+    create_and_save_faiss(sample_path, save_path="faiss_index")
+    FAISS.from_texts(SYSTEM_FLOW_SECTIONS, embeddings).save_local("system_flow")
+    build_followup_bank(sample_path, embeddings, save_path="followup_bank", system_flow_dir=None)
+
+
+def apply_chat_schema(postgres_uri: str) -> None:
+    """Create the chat tables and indexes, as a fresh deployment would."""
+    import psycopg
+
+    with open(CHAT_SCHEMA_SQL, encoding="utf-8") as f:
+        schema = f.read()
+    with psycopg.connect(postgres_uri, autocommit=True) as conn:
+        conn.execute(schema)
+
+
+def make_token(user_id: int, role: str = "Patient") -> str:
+    """Unsigned JWT with the claims the API reads (it does not verify signatures)."""
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode("utf-8")).rstrip(b"=").decode("ascii")
+
+    claims = {"nameid": str(user_id), "roles": [role], "exp": int(time.time()) + 24 * 3600}
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(claims)}.offline"
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for item in mix.split(","):
+        kind, _, weight = item.partition("=")
+        if kind.strip() not in QUESTIONS:
+            raise ValueError(f"Unknown question kind in --mix: {kind}")
+        weights[kind.strip()] = int(weight or 1)
+    return weights
+
+
+class Recorder:
+    """Latencies and errors of the requests, by endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, endpoint: str, request) -> Optional[dict]:
+        started = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+            body = response.json() if ok and "json" in response.headers.get("content-type", "") else None
+            if ok and "event-stream" in response.headers.get("content-type", ""):
+                ok = '"type": "error"' not in response.text
+        except Exception:
+            ok, body = False, None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[endpoint] += 1
+        return body
+
+
+async def virtual_user(client, recorder: Recorder, user_id: int, args: argparse.Namespace, rng: random.Random) -> None:
+    headers = {"Authorization": f"Bearer {make_token(user_id)}"}
+    weights = parse_mix(args.mix)
+    kinds = list(weights)
+
+    chat = await recorder.call("/chat/new", client.post("/chat/new", json={"chat_name": "bench"}, headers=headers))
+    if not chat:
+        return
+    thread_id = chat["thread_id"]
+
+    for _ in range(args.turns):
+        kind = rng.choices(kinds, weights=[weights[k] for k in kinds])[0]
+        body = {
+            "question": rng.choice(QUESTIONS[kind]),
+            "thread_id": thread_id,
+            "stream": args.stream,
+            "suggestions": not args.no_suggestions,
+        }
+        await recorder.call(f"/ask [{kind}]", client.post("/ask", json=body, headers=headers))
+        await recorder.call("/chat", client.post("/chat", json={"thread_id": thread_id, "limit": 20}, headers=headers))
+        await recorder.call("/chats", client.post("/chats", json={"limit": 20}, headers=headers))
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, dict]:
+    from Workflow.utils.metrics import SPAN_SECONDS
+
+    endpoints = {}
+    for endpoint, values in sorted(recorder.latencies.items()):
+        endpoints[endpoint] = {
+            "count": len(values),
+            "errors": recorder.errors[endpoint],
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "mean_ms": sum(values) / len(values) * 1000,
+        }
+
+    spans = {}
+    for (kind, name, status), (count, total) in sorted(SPAN_SECONDS.totals().items()):
+        spans[f"{kind}:{name}:{status}"] = {"count": count, "total_s": total, "mean_ms": total / count * 1000}
+
+    total_requests = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "elapsed_s": elapsed,
+        "requests": total_requests,
+        "throughput_rps": total_requests / elapsed,
+        "endpoints": endpoints,
+        "spans": spans,
+    }
+
+
+def print_report(results: Dict[str, dict]) -> None:
+    print(f"\n{results['requests']} requests in {results['elapsed_s']:.1f}s ({results['throughput_rps']:.1f} req/s)\n")
+    print(f"{'endpoint':<24}{'count':>7}{'errors':>8}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for endpoint, row in results["endpoints"].items():
+        print(
+            f"{endpoint:<24}{row['count']:>7}{row['errors']:>8}{row['throughput_rps']:>8.1f}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['mean_ms']:>10.1f}"
+        )
+
+    print(f"\n{'span':<48}{'count':>7}{'mean ms':>10}{'total s':>10}")
+    for name, row in sorted(results["spans"].items(), key=lambda item: -item[1]["total_s"]):
+        print(f"{name:<48}{row['count']:>7}{row['mean_ms']:>10.1f}{row['total_s']:>10.2f}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, dict]:
+    import httpx
+    import backend
+
+    await backend.startup_event()
+    await backend.workflow.checkpointer.setup()
+    try:
+        rng = random.Random(args.seed)
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            recorder = Recorder()
+            user_ids = rng.sample(range(1, 300), args.users) if args.users < 300 else list(range(1, args.users + 1))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                virtual_user(client, recorder, user_id, args, random.Random(args.seed + user_id))
+                for user_id in user_ids
+            ))
+            elapsed = time.perf_counter() - started
+        return summarize(recorder, elapsed)
+    finally:
+        await backend.shutdown_event()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="mosefak-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+
+    server = None
+    try:
+        postgres_uri, server = start_postgres(workdir)
+        configure_environment(args, postgres_uri)
+
+        from benchmarks.sqlserver_standin import build_database
+
+        # Relative store paths used by the app (faiss_index, system_flow, ...) resolve in the workdir
+        os.chdir(workdir)
+        build_database("mosefak_app.db", seed=args.seed, scale=args.db_scale)
+        config = install_stand_ins(args, os.path.abspath("mosefak_app.db"))
+        build_stores(args, config.embeddings)
+        apply_chat_schema(postgres_uri)
+
+        results = asyncio.run(run(args))
+        print_report(results)
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        os.chdir(REPO_ROOT)
+        if server is not None:
+            server.cleanup()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
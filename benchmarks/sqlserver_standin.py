@@ -0,0 +1,203 @@
+import random
+import re
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from Workflow.utils.schema_index import SchemaIndex
+from Workflow.utils.tables_info import load_tables_info
+
+# Database, schema and linked-server prefixes of a table name: [server].[db].[schema].[Table] -> [Table]
+QUALIFIED_PREFIX_PATTERN = re.compile(r"(?:\[[^\]]+\]\.){2,}(?=\[|\w)")
+TOP_PATTERN = re.compile(r"\bSELECT\s+TOP\s*\(?\s*(\d+)\s*\)?", re.IGNORECASE)
+CONCAT_LEFT_PATTERN = re.compile(r"('(?:[^']|'')*')\s*\+\s*")
+CONCAT_RIGHT_PATTERN = re.compile(r"\s*\+\s*('(?:[^']|'')*')")
+FUNCTION_RENAMES = [
+    (re.compile(r"\bSTRING_AGG\s*\(", re.IGNORECASE), "GROUP_CONCAT("),
+    (re.compile(r"\bISNULL\s*\(", re.IGNORECASE), "IFNULL("),
+    (re.compile(r"\bLEN\s*\(", re.IGNORECASE), "LENGTH("),
+    (re.compile(r"\bN?VARCHAR\s*\(\s*MAX\s*\)", re.IGNORECASE), "TEXT"),
+]
+
+# Rows generated per table; tables not listed get DEFAULT_ROWS
+TABLE_ROWS = {"Users": 400, "Doctors": 60, "Clinics": 60, "Appointments": 3000, "Reviews": 800, "Notifications": 1500, "Payments": 2000}
+DEFAULT_ROWS = 120
+
+FIRST_NAMES = ["Ahmed", "Mona", "Omar", "Sara", "Youssef", "Nour", "Karim", "Laila", "Hassan", "Fatma"]
+LAST_NAMES = ["Hassan", "Ali", "Mahmoud", "Ibrahim", "Saeed", "Fahmy", "Mostafa", "Adel"]
+CITIES = ["Cairo", "Giza", "Alexandria", "Mansoura", "Tanta", "Assiut"]
+DAYS = ["Saturday", "Sunday", "Monday", "Tuesday", "Wednesday", "Thursday"]
+SPECIALIZATIONS = ["Cardiology", "Dermatology", "Neurology", "Pediatrics", "Orthopedics", "Ophthalmology"]
+STATUSES = ["Pending", "Confirmed", "Completed", "Cancelled"]
+
+
+def translate_tsql(query: str) -> str:
+    """
+    Rewrite the T-SQL subset the application generates into SQLite.
+
+    Handles qualified and linked-server table names, TOP, string
+    concatenation with +, STRING_AGG, ISNULL, LEN and NVARCHAR(MAX) casts.
+
+    Args:
+        query: The T-SQL query.
+
+    Returns:
+        str: The equivalent SQLite query.
+    """
+    query = QUALIFIED_PREFIX_PATTERN.sub("", query)
+    for pattern, replacement in FUNCTION_RENAMES:
+        query = pattern.sub(replacement, query)
+    query = CONCAT_LEFT_PATTERN.sub(r"\1 || ", query)
+    query = CONCAT_RIGHT_PATTERN.sub(r" || \1", query)
+
+    top = TOP_PATTERN.search(query)
+    if top:
+        query = TOP_PATTERN.sub("SELECT ", query, count=1).rstrip().rstrip(";") + f" LIMIT {top.group(1)}"
+    return query
+
+
+class SqliteCursor:
+    """pyodbc-style cursor over SQLite that translates T-SQL and simulates the round trip."""
+
+    def __init__(self, cursor: sqlite3.Cursor, latency: float):
+        self._cursor = cursor
+        self._latency = latency
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def execute(self, query: str, params: Optional[Sequence[Any]] = None):
+        if self._latency:
+            time.sleep(self._latency)
+        self._cursor.execute(translate_tsql(query), params or ())
+        return self
+
+    def fetchall(self) -> List[tuple]:
+        return self._cursor.fetchall()
+
+    def fetchone(self) -> Optional[tuple]:
+        return self._cursor.fetchone()
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """pyodbc-style connection to the SQLite stand-in of the Mosefak databases."""
+
+    def __init__(self, path: str, latency: float = 0.0):
+        """
+        Args:
+            path: Path of the SQLite database file.
+            latency: Seconds added to every query, to simulate the linked-server round trip.
+        """
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.create_function("GETDATE", 0, lambda: datetime.now().isoformat(sep=" "))
+        self._conn.create_function("SYSDATETIMEOFFSET", 0, lambda: datetime.now().isoformat(sep=" "))
+        self.latency = latency
+        self.timeout = 0
+
+    def cursor(self) -> SqliteCursor:
+        return SqliteCursor(self._conn.cursor(), self.latency)
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def rollback(self) -> None:
+        self._conn.rollback()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _sqlite_type(data_type: str) -> str:
+    data_type = data_type.lower()
+    if data_type.startswith(("int", "bigint", "smallint", "tinyint", "bit")):
+        return "INTEGER"
+    if data_type.startswith(("decimal", "float", "real", "numeric", "money")):
+        return "REAL"
+    return "TEXT"
+
+
+def _value(rng: random.Random, table: str, column: str, data_type: str, row_id: int, targets: Dict[str, int]) -> Any:
+    data_type = data_type.lower()
+    if column in targets:
+        return rng.randint(1, targets[column])
+    if column == "FirstName":
+        return rng.choice(FIRST_NAMES)
+    if column == "LastName":
+        return rng.choice(LAST_NAMES)
+    if column in ("City", "Address_City", "Location"):
+        return rng.choice(CITIES)
+    if column == "Day":
+        return rng.choice(DAYS)
+    if column == "Name" and table == "Specializations":
+        return rng.choice(SPECIALIZATIONS)
+    if column in ("AppointmentStatus", "PaymentStatus", "Status"):
+        return rng.choice(STATUSES)
+    if column == "Rate":
+        return rng.randint(1, 5)
+    if data_type.startswith("bit"):
+        return rng.randint(0, 1)
+    if data_type.startswith(("int", "bigint", "smallint", "tinyint")):
+        return rng.randint(1, 1000)
+    if data_type.startswith(("decimal", "float", "money")):
+        return round(rng.uniform(100, 2000), 2)
+    if data_type.startswith("uniqueidentifier"):
+        return str(uuid.UUID(int=rng.getrandbits(128)))
+    if data_type.startswith("time"):
+        return f"{rng.randint(8, 20):02d}:{rng.choice(['00', '30'])}:00"
+    if data_type.startswith("date"):
+        return (datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 700), hours=rng.randint(8, 20))).isoformat(sep=" ")
+    return f"{column} {row_id}"
+
+
+def build_database(path: str, seed: int = 42, scale: float = 1.0) -> Dict[str, int]:
+    """
+    Create the SQLite stand-in of the Mosefak schema and fill it with synthetic rows.
+
+    Tables and columns come from the CREATE TABLE blocks in tables_info.py;
+    foreign keys (declared, and implicit user ids such as PatientId) point at
+    existing rows.
+
+    Args:
+        path: Path of the SQLite database file to create.
+        seed: Random seed, so every run benchmarks the same data.
+        scale: Multiplier for the number of rows per table.
+
+    Returns:
+        Dict[str, int]: Number of rows per table.
+    """
+    schema = SchemaIndex(load_tables_info(role="Admin"))
+    rng = random.Random(seed)
+    counts = {name: max(1, int(TABLE_ROWS.get(name, DEFAULT_ROWS) * scale)) for name in schema.tables}
+
+    conn = sqlite3.connect(path)
+    try:
+        for name, table in schema.tables.items():
+            columns = ", ".join(f"[{column}] {_sqlite_type(data_type)}" for column, data_type in table.columns)
+            conn.execute(f"DROP TABLE IF EXISTS [{name}]")
+            conn.execute(f"CREATE TABLE [{name}] ({columns})")
+
+            targets = {column: counts[target] for column, target, _, _ in table.references() if target in counts}
+
+            rows = []
+            for row_id in range(1, counts[name] + 1):
+                rows.append([
+                    row_id if column == "Id" else _value(rng, name, column, data_type, row_id, targets)
+                    for column, data_type in table.columns
+                ])
+            placeholders = ", ".join("?" for _ in table.columns)
+            conn.executemany(f"INSERT INTO [{name}] VALUES ({placeholders})", rows)
+
+            for column in targets:
+                conn.execute(f"CREATE INDEX [idx_{name}_{column}] ON [{name}] ([{column}])")
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
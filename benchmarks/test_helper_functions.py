@@ -0,0 +1,102 @@
+"""
+Micro-benchmarks of the helper_functions that run on every request.
+
+Requires pytest-benchmark (see benchmarks/requirements.txt); the baselines and
+regression threshold are handled in conftest.py.
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks import inputs
+from Workflow.utils.helper_functions import (
+    adapt_query_for_linked_server,
+    contains_arabic,
+    extract_messages,
+    format_doctors,
+    inject_user_context,
+    process_query_results,
+    validate_query_security,
+)
+
+
+@pytest.fixture(scope="module")
+def history():
+    return inputs.long_history(turns=50)
+
+
+@pytest.fixture(scope="module")
+def results():
+    return inputs.wide_results(rows=5000, columns=12)
+
+
+@pytest.fixture(scope="module")
+def doctors():
+    return inputs.doctor_rows(count=2000)
+
+
+def test_extract_messages_long_history(bench, history):
+    conversation = bench(extract_messages, history)
+    assert conversation.count("--------------------") == 50
+
+
+def test_extract_messages_recent_messages(bench):
+    # The nodes only pass the last few messages
+    conversation = bench(extract_messages, inputs.long_history(turns=3))
+    assert conversation.startswith("Human: ")
+
+
+def test_adapt_query_for_linked_server(bench):
+    adapted = bench(adapt_query_for_linked_server, inputs.LINKED_SERVER_QUERY)
+    assert "[mosefak-linked-server].[mosefak-app].[dbo].[Appointments]" in adapted
+
+
+def test_inject_user_context_patient(bench):
+    query = bench(inject_user_context, inputs.UNFILTERED_QUERY, "1234", "Patient")
+    assert "AppUserId = '1234'" in query
+
+
+def test_inject_user_context_doctor(bench):
+    query = bench(inject_user_context, inputs.UNFILTERED_QUERY, "1234", "Doctor")
+    assert "DoctorId = '1234'" in query
+
+
+def test_validate_query_security_patient(bench):
+    is_safe, _ = bench(validate_query_security, inputs.LINKED_SERVER_QUERY, "Patient")
+    assert is_safe
+
+
+def test_validate_query_security_admin(bench):
+    is_safe, _ = bench(validate_query_security, inputs.ADMIN_QUERY, "Admin")
+    assert is_safe
+
+
+def test_validate_query_security_rejected(bench):
+    is_safe, _ = bench(validate_query_security, inputs.UNFILTERED_QUERY + "; DROP TABLE Payments", "Patient")
+    assert not is_safe
+
+
+@pytest.mark.parametrize("format_type", ["default", "table", "json"])
+def test_process_query_results_wide(bench, results, format_type):
+    processed = bench(process_query_results, results, page=1, format_type=format_type, original_question="Show my payments")
+    assert processed["metadata"]["total_rows"] == len(results)
+
+
+def test_process_query_results_all_rows(bench, results):
+    processed = bench(process_query_results, results, max_rows_per_page=len(results))
+    assert processed["metadata"]["total_pages"] == 1
+
+
+def test_format_doctors_large_list(bench, doctors):
+    formatted = bench(format_doctors, doctors)
+    assert formatted.count("\n") == len(doctors) - 1
+
+
+@pytest.mark.parametrize("text, expected", [
+    (inputs.ARABIC_QUESTION, True),
+    (inputs.ENGLISH_QUESTION, False),
+    (inputs.long_text(arabic=True), True),
+    (inputs.long_text(arabic=False), False),
+], ids=["arabic", "english", "long_arabic_last", "long_english"])
+def test_contains_arabic(bench, text, expected):
+    assert bench(contains_arabic, text) is expected
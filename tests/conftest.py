@@ -0,0 +1,49 @@
+"""
+Fixtures shared by the tests.
+
+Tests that need Postgres use TEST_POSTGRES_URI, or an embedded server from the
+`pgserver` package (pip install -r benchmarks/requirements.txt); without
+either they are skipped.
+"""
+import os
+
+import pytest
+
+# Settings the modules need at import; the clients they create are replaced by offline_config
+OFFLINE_ENVIRONMENT = {
+    "MODEL_NAME": "fake-chat",
+    "EMBEDDING_MODEL_NAME": "hashing",
+    "GOOGLE_API_KEY": "offline",
+    "POSTGRES_DB_URI": "postgresql://offline@localhost/offline",
+}
+
+
+@pytest.fixture(scope="session")
+def offline_config():
+    """The shared Config, with the chat model and embeddings replaced by the benchmark stand-ins."""
+    pytest.importorskip("langgraph")
+    from benchmarks.fakes import FakeChatModel, HashingEmbeddings
+
+    for name, value in OFFLINE_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+
+    from Workflow.utils.config import get_config
+
+    # Clients created while the modules are imported use the stand-ins too
+    config = get_config()
+    config.llm = FakeChatModel(latency=0.0)
+    config.embeddings = HashingEmbeddings()
+    return config
+
+
+@pytest.fixture(scope="session")
+def postgres_uri(tmp_path_factory):
+    uri = os.getenv("TEST_POSTGRES_URI")
+    if uri:
+        yield uri
+        return
+
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")), cleanup_mode="stop")
+    yield server.get_uri()
+    server.cleanup()
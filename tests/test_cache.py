@@ -0,0 +1,193 @@
+"""
+Tests of the in-process caches.
+
+Usage:
+    python -m pytest tests
+"""
+import pytest
+
+from Workflow.utils import cache as cache_module
+from Workflow.utils.cache import MISSING, ScopedCache, TTLCache, estimate_size
+
+
+class Clock:
+    """Replaces time.time in the cache module so expiry can be stepped through."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def test_ttl_cache_expires_entries_on_read(clock):
+    cache = TTLCache(default_ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+
+    clock.now += 11
+
+    assert cache.get("a", MISSING) is MISSING
+    assert cache.get("b") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_ttl_cache_caches_none_values():
+    cache = TTLCache()
+    cache.set("a", None)
+
+    assert cache.get("a", MISSING) is None
+    assert "a" in cache
+
+
+def test_ttl_cache_evicts_least_recently_used_entries():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_stays_within_its_byte_budget():
+    value = "x" * 1000
+    cache = TTLCache(max_bytes=estimate_size(value) * 2)
+    for key in range(5):
+        cache.set(key, value)
+
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_ttl_cache_rejects_values_larger_than_the_budget():
+    cache = TTLCache(max_bytes=100)
+    cache.set("a", "small")
+
+    assert cache.set("a", "x" * 1000) is False
+    # The previous value is not served for a key whose new value was rejected
+    assert "a" not in cache
+    assert cache.stats()["rejected"] == 1
+
+
+def test_ttl_cache_replacing_a_value_updates_the_byte_count():
+    cache = TTLCache()
+    cache.set("a", "x" * 1000)
+    cache.set("a", "x")
+
+    assert cache.stats()["bytes"] == estimate_size("x")
+
+
+def test_ttl_cache_sweep_does_bounded_work(clock):
+    cache = TTLCache(default_ttl=10)
+    for key in range(10):
+        cache.set(key, key)
+
+    clock.now += 11
+
+    assert cache.sweep(max_items=4) == 4
+    assert len(cache) == 6
+    assert cache.sweep() == 6
+    assert len(cache) == 0
+
+
+def test_ttl_cache_sweep_keeps_live_entries(clock):
+    cache = TTLCache(default_ttl=10)
+    cache.set("old", 1)
+    clock.now += 5
+    cache.set("new", 2)
+    clock.now += 6
+
+    assert cache.sweep() == 1
+    assert cache.get("new") == 2
+
+
+def test_ttl_cache_delete_and_clear():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.delete("a") is True
+    assert cache.delete("a") is False
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_ttl_cache_hit_rate():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a", count=False)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_scoped_cache_invalidating_a_scope_leaves_other_scopes():
+    cache = ScopedCache(TTLCache())
+    cache.set(cache.key("7", "chats", {"limit": 20}), "chats")
+    cache.set(cache.key("7", "chat:7/a"), "history")
+    cache.set(cache.key("8", "chats", {"limit": 20}), "other user")
+
+    cache.invalidate("7", "chats")
+
+    assert cache.get(cache.key("7", "chats", {"limit": 20})) is None
+    assert cache.get(cache.key("7", "chat:7/a")) == "history"
+    assert cache.get(cache.key("8", "chats", {"limit": 20})) == "other user"
+
+
+def test_scoped_cache_invalidating_a_user_clears_all_their_scopes():
+    cache = ScopedCache(TTLCache())
+    cache.set(cache.key("7", "chats"), "chats")
+    cache.set(cache.key("7", "chat:7/a"), "history")
+
+    cache.invalidate("7")
+
+    assert cache.get(cache.key("7", "chats")) is None
+    assert cache.get(cache.key("7", "chat:7/a")) is None
+
+
+def test_scoped_cache_key_built_before_an_invalidation_is_never_served():
+    cache = ScopedCache(TTLCache())
+    stale_key = cache.key("7", "chats")
+
+    # The value was computed before the invalidation but is stored after it
+    cache.invalidate("7", "chats")
+    cache.set(stale_key, "stale")
+
+    assert cache.get(cache.key("7", "chats")) is None
+
+
+def test_scoped_cache_params_distinguish_entries():
+    cache = ScopedCache(TTLCache())
+    cache.set(cache.key("7", "chats", {"limit": 20, "cursor": None}), "first page")
+
+    assert cache.get(cache.key("7", "chats", {"cursor": None, "limit": 20})) == "first page"
+    assert cache.get(cache.key("7", "chats", {"limit": 20, "cursor": "c"})) is None
+
+
+def test_scoped_cache_sweep_forgets_generations_older_than_the_ttl(clock):
+    cache = ScopedCache(TTLCache(default_ttl=10))
+    cache.invalidate("7", "chats")
+    clock.now += 5
+    cache.invalidate("8", "chats")
+    clock.now += 6
+
+    assert cache.sweep() == 1
+    assert cache.stats()["generations"] == 1
+
+    # Entries written after the forgotten bump are still reachable
+    cache.set(cache.key("7", "chats"), "fresh")
+    assert cache.get(cache.key("7", "chats")) == "fresh"
@@ -0,0 +1,148 @@
+"""
+Tests of the application cache backends.
+
+Every test runs against the in-memory backend and, when Postgres is available
+(see conftest.py), the Postgres backend. The backends live on an event loop in
+a worker thread, like the application's, so `run_sync` can reach them.
+
+Usage:
+    python -m pytest tests
+"""
+import asyncio
+import threading
+
+import pytest
+
+from Workflow.utils import cache_backends
+from Workflow.utils.cache_backends import (
+    CACHE_TABLE, GENERATIONS_TABLE, InMemoryCacheBackend, PostgresCacheBackend, run_sync
+)
+
+
+def call(loop, coro):
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(10)
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(cache_backends, "_loop", loop)
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture(params=["memory", "postgres"])
+def backend(request, loop):
+    if request.param == "memory":
+        yield InMemoryCacheBackend(ttl=60)
+        return
+
+    psycopg_pool = pytest.importorskip("psycopg_pool")
+    uri = request.getfixturevalue("postgres_uri")
+    pool = psycopg_pool.AsyncConnectionPool(uri, open=False, kwargs={"autocommit": True})
+
+    async def open_backend():
+        await pool.open()
+        backend = PostgresCacheBackend(pool, ttl=60)
+        await backend.setup()
+        async with pool.connection() as conn:
+            await conn.execute(f"TRUNCATE {CACHE_TABLE}, {GENERATIONS_TABLE}")
+        return backend
+
+    yield call(loop, open_backend())
+    call(loop, pool.close())
+
+
+def test_miss_then_set_is_served(backend, loop):
+    value, version = call(loop, backend.get("api", "7", "chats", {"limit": 20}))
+    assert value is None
+
+    call(loop, backend.set("api", "7", "chats", {"limit": 20}, {"chats": []}, version))
+
+    assert call(loop, backend.get("api", "7", "chats", {"limit": 20}))[0] == {"chats": []}
+    assert call(loop, backend.get("api", "7", "chats", {"limit": 50}))[0] is None
+    assert call(loop, backend.get("api", "8", "chats", {"limit": 20}))[0] is None
+
+
+def test_set_without_a_version_stores_at_the_current_state(backend, loop):
+    call(loop, backend.invalidate("api", "7", "chats"))
+    call(loop, backend.set("api", "7", "chats", None, [1]))
+
+    assert call(loop, backend.get("api", "7", "chats"))[0] == [1]
+
+
+def test_invalidation_hides_a_scope_or_all_of_a_users_scopes(backend, loop):
+    for scope in ("chats", "chat:7/a"):
+        call(loop, backend.set("api", "7", scope, None, scope))
+    call(loop, backend.set("api", "8", "chats", None, "other user"))
+
+    call(loop, backend.invalidate("api", "7", "chats"))
+    assert call(loop, backend.get("api", "7", "chats"))[0] is None
+    assert call(loop, backend.get("api", "7", "chat:7/a"))[0] == "chat:7/a"
+
+    call(loop, backend.invalidate("api", "7"))
+    assert call(loop, backend.get("api", "7", "chat:7/a"))[0] is None
+    assert call(loop, backend.get("api", "8", "chats"))[0] == "other user"
+
+
+@pytest.mark.parametrize("scope_to_invalidate", ["chats", ""])
+def test_write_racing_an_invalidation_is_never_served(backend, loop, scope_to_invalidate):
+    _, version = call(loop, backend.get("api", "7", "chats"))
+
+    # The value was computed before the invalidation and stored after it
+    call(loop, backend.invalidate("api", "7", scope_to_invalidate))
+    call(loop, backend.set("api", "7", "chats", None, "stale", version))
+
+    assert call(loop, backend.get("api", "7", "chats"))[0] is None
+
+
+def test_version_is_carried_across_separate_run_sync_calls(backend, loop):
+    # The SQL result cache reads and writes from a worker thread in two separate calls
+    value, version = run_sync(backend.get("sql", "7", "query", {"key": "k"}))
+    assert value is None
+
+    run_sync(backend.invalidate("sql", "7", "query"))
+    run_sync(backend.set("sql", "7", "query", {"key": "k"}, [[1]], version))
+    assert run_sync(backend.get("sql", "7", "query", {"key": "k"}))[0] is None
+
+    _, version = run_sync(backend.get("sql", "7", "query", {"key": "k"}))
+    run_sync(backend.set("sql", "7", "query", {"key": "k"}, [[2]], version))
+    assert run_sync(backend.get("sql", "7", "query", {"key": "k"}))[0] == [[2]]
+
+
+def test_run_sync_returns_the_default_without_a_loop(monkeypatch):
+    monkeypatch.setattr(cache_backends, "_loop", None)
+
+    assert run_sync(InMemoryCacheBackend().get("api", "7", "chats"), default=(None, None)) == (None, None)
+
+
+@pytest.fixture
+def postgres_backend(backend):
+    if not isinstance(backend, PostgresCacheBackend):
+        pytest.skip("Postgres backend only")
+    return backend
+
+
+def test_postgres_stale_write_never_replaces_a_newer_entry(postgres_backend, loop):
+    _, stale_version = call(loop, postgres_backend.get("api", "7", "chats"))
+    call(loop, postgres_backend.invalidate("api", "7", "chats"))
+    _, version = call(loop, postgres_backend.get("api", "7", "chats"))
+    call(loop, postgres_backend.set("api", "7", "chats", None, "fresh", version))
+
+    call(loop, postgres_backend.set("api", "7", "chats", None, "stale", stale_version))
+
+    assert call(loop, postgres_backend.get("api", "7", "chats"))[0] == "fresh"
+    assert call(loop, postgres_backend.stats())["stale_sets"] == 1
+
+
+def test_postgres_sweep_removes_expired_entries_and_generations(postgres_backend, loop):
+    postgres_backend.ttl = 0
+    call(loop, postgres_backend.set("api", "7", "chats", None, "expired"))
+    call(loop, postgres_backend.invalidate("api", "7", "chat:7/a"))
+
+    assert call(loop, postgres_backend.sweep()) == 2
+    assert call(loop, postgres_backend.get("api", "7", "chats"))[0] is None
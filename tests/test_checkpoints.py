@@ -0,0 +1,201 @@
+"""
+Tests of checkpoint compaction and pruning, run against Postgres.
+
+Checkpoints are written by a small LangGraph graph through the real
+AsyncPostgresSaver, so the tests exercise the checkpointer's own layout of
+checkpoints, channel blobs and pending writes.
+
+Usage:
+    python -m pytest tests
+"""
+import asyncio
+import operator
+import os
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.postgres")
+psycopg_pool = pytest.importorskip("psycopg_pool")
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from Workflow.utils.checkpoints import (
+    CheckpointCompactor, delete_user_checkpoints, prune_orphaned_checkpoints
+)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "Data Prepration", "create_chat_messages_schemas.sql")
+
+
+class State(TypedDict):
+    messages: Annotated[List[AnyMessage], add_messages]
+    turns: Annotated[int, operator.add]
+
+
+async def respond(state: State) -> dict:
+    return {"messages": [AIMessage(content=f"answer to {state['messages'][-1].content}")], "turns": 1}
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(State)
+    graph.add_node("respond", respond)
+    graph.add_edge(START, "respond")
+    graph.add_edge("respond", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def config_for(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+async def ask(graph, thread_id, turns):
+    for i in range(turns):
+        await graph.ainvoke({"messages": [HumanMessage(content=f"question {i}")], "turns": 0}, config_for(thread_id))
+
+
+async def fetch(pool, query, *params):
+    async with pool.connection() as conn:
+        cur = await conn.execute(query, params)
+        return await cur.fetchall()
+
+
+async def count_checkpoints(pool, thread_id):
+    return (await fetch(pool, "SELECT COUNT(*) FROM checkpoints WHERE thread_id = %s", thread_id))[0][0]
+
+
+async def blob_consistency(pool, thread_id):
+    """Blobs the remaining checkpoints refer to but are missing, and blobs no remaining checkpoint refers to."""
+    # Primitive channel values are stored inline in the checkpoint, the others as blobs
+    referenced = {
+        (channel, version)
+        for versions, inline in await fetch(
+            pool,
+            "SELECT checkpoint -> 'channel_versions', checkpoint -> 'channel_values' FROM checkpoints WHERE thread_id = %s",
+            thread_id
+        )
+        for channel, version in versions.items()
+        if channel not in (inline or {})
+    }
+    stored = set(await fetch(pool, "SELECT channel, version FROM checkpoint_blobs WHERE thread_id = %s", thread_id))
+    return referenced - stored, stored - referenced
+
+
+@pytest.fixture
+def run(postgres_uri):
+    """Run a scenario with a pool, a graph checkpointed to empty tables and the chat schema."""
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        schema = f.read()
+
+    def run(scenario):
+        async def main():
+            async with psycopg_pool.AsyncConnectionPool(postgres_uri, kwargs={"autocommit": True}) as pool:
+                checkpointer = AsyncPostgresSaver(pool)
+                await checkpointer.setup()
+                async with pool.connection() as conn:
+                    await conn.execute("TRUNCATE checkpoints, checkpoint_blobs, checkpoint_writes")
+                    await conn.execute(schema)
+                return await scenario(pool, build_graph(checkpointer))
+
+        return asyncio.run(main())
+
+    return run
+
+
+def test_compaction_keeps_the_latest_checkpoints_and_the_thread_state(run):
+    async def scenario(pool, graph):
+        await ask(graph, "7/a", turns=6)
+        await ask(graph, "7/b", turns=1)
+        before = await count_checkpoints(pool, "7/a"), await count_checkpoints(pool, "7/b")
+
+        result = await CheckpointCompactor(pool, keep=3, batch_size=10).run()
+
+        after = await count_checkpoints(pool, "7/a"), await count_checkpoints(pool, "7/b")
+        state = (await graph.aget_state(config_for("7/a"))).values
+        return before, result, after, state, await blob_consistency(pool, "7/a")
+
+    before, result, after, state, (missing_blobs, unreferenced_blobs) = run(scenario)
+
+    # A thread already within the retention is left alone
+    assert before[1] <= 3 < before[0]
+    assert after == (3, before[1])
+    assert result["threads_compacted"] == 1 and result["finished_pass"]
+    assert result["deleted"]["checkpoints"] == before[0] - 3
+    assert result["deleted"]["checkpoint_blobs"] > 0
+    # The latest state is intact and no blob outlives every checkpoint referring to it
+    assert len(state["messages"]) == 12 and state["turns"] == 6
+    assert missing_blobs == set()
+    assert unreferenced_blobs == set()
+
+
+def test_compacted_thread_continues_from_its_latest_checkpoint(run):
+    async def scenario(pool, graph):
+        await ask(graph, "7/a", turns=4)
+        await CheckpointCompactor(pool, keep=1).run()
+        await ask(graph, "7/a", turns=1)
+        return (await graph.aget_state(config_for("7/a"))).values
+
+    state = run(scenario)
+
+    assert len(state["messages"]) == 10 and state["turns"] == 5
+
+
+def test_compaction_walks_the_threads_in_batches(run):
+    async def scenario(pool, graph):
+        for thread_id in ("7/a", "7/b", "7/c"):
+            await ask(graph, thread_id, turns=2)
+
+        compactor = CheckpointCompactor(pool, keep=1, batch_size=2)
+        results = [await compactor.run() for _ in range(3)]
+        return results, compactor.stats(), [await count_checkpoints(pool, t) for t in ("7/a", "7/b", "7/c")]
+
+    results, stats, remaining = run(scenario)
+
+    assert [result["threads_scanned"] for result in results] == [2, 1, 2]
+    assert [result["finished_pass"] for result in results] == [False, True, False]
+    assert remaining == [1, 1, 1]
+    assert stats["passes"] == 1 and stats["threads_compacted"] == 3 and stats["cursor"] == "7/b"
+
+
+def test_prune_removes_only_the_checkpoints_of_deleted_chats(run):
+    async def scenario(pool, graph):
+        async with pool.connection() as conn:
+            await conn.execute("INSERT INTO chat_threads (thread_id, user_id, chat_name) VALUES ('7/a', '7', 'kept')")
+        await ask(graph, "7/a", turns=1)
+        await ask(graph, "7/deleted", turns=1)
+
+        result = await prune_orphaned_checkpoints(pool)
+
+        remaining = {
+            table: [row[0] for row in await fetch(pool, f"SELECT DISTINCT thread_id FROM {table}")]
+            for table in ("checkpoints", "checkpoint_blobs")
+        }
+        return result, remaining
+
+    result, remaining = run(scenario)
+
+    assert result["threads"] == 1 and result["deleted"]["checkpoints"] > 0
+    assert remaining == {"checkpoints": ["7/a"], "checkpoint_blobs": ["7/a"]}
+
+
+def test_delete_user_checkpoints_removes_every_chat_of_the_user(run):
+    async def scenario(pool, graph):
+        async with pool.connection() as conn:
+            await conn.execute(
+                "INSERT INTO chat_threads (thread_id, user_id, chat_name) VALUES ('7/a', '7', 'a'), ('8/a', '8', 'a')"
+            )
+        await ask(graph, "7/a", turns=1)
+        await ask(graph, "8/a", turns=1)
+
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                deleted = await delete_user_checkpoints(cur, "7")
+
+        return deleted, [row[0] for row in await fetch(pool, "SELECT DISTINCT thread_id FROM checkpoints")]
+
+    deleted, remaining = run(scenario)
+
+    assert deleted["checkpoints"] > 0 and deleted["checkpoint_blobs"] > 0
+    assert remaining == ["8/a"]
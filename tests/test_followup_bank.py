@@ -0,0 +1,155 @@
+"""
+Tests of the follow-up question bank and the suggestions built from it.
+
+Usage:
+    python -m pytest tests
+"""
+import asyncio
+import importlib
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from benchmarks.fakes import HashingEmbeddings
+from Workflow.utils.cache_backends import InMemoryCacheBackend
+from Workflow.utils.followup_bank import SYSTEM_FLOW_QUESTIONS, SYSTEM_FLOW_TYPE, FollowUpBank, build_followup_bank
+
+MEDICAL_QUESTIONS = """q_type,question,answer
+symptoms,What are the symptoms of diabetes?,a
+treatment,What is the treatment for diabetes?,a
+prevention,How can diabetes be prevented?,a
+treatment,What is the treatment for diabetes ?,duplicate
+symptoms,What are the symptoms of migraine headaches?,a
+treatment,What is the treatment for migraine headaches?,a
+,Who is at risk for migraine headaches?,missing q_type
+"""
+
+DIABETES_ANSWER = "Diabetes symptoms include thirst. The treatment for diabetes and how diabetes can be prevented vary."
+
+
+@pytest.fixture(scope="module")
+def registry(offline_config):
+    # vector_store reads the Config at import
+    from Workflow.utils.vector_store import FaissIndexRegistry
+
+    return FaissIndexRegistry(HashingEmbeddings())
+
+
+@pytest.fixture(scope="module")
+def bank_path(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("followup_bank")
+    csv_path = workdir / "medical_advices.csv"
+    csv_path.write_text(MEDICAL_QUESTIONS, encoding="utf-8")
+    path = str(workdir / "bank")
+    build_followup_bank(str(csv_path), HashingEmbeddings(), save_path=path, system_flow_dir=None)
+    return path
+
+
+@pytest.fixture
+def bank(registry, bank_path):
+    return FollowUpBank(registry, HashingEmbeddings(), directory=bank_path, min_similarity=0.3)
+
+
+def suggest(bank, question, response, **kwargs):
+    return asyncio.run(bank.asuggest(question, response, **kwargs))
+
+
+def test_build_followup_bank_deduplicates_and_adds_navigation_questions(registry, bank_path):
+    store = registry.get(bank_path)
+    entries = {doc.page_content: doc.metadata["q_type"] for doc in store.docstore._dict.values()}
+
+    assert len(entries) == 6 + len(SYSTEM_FLOW_QUESTIONS)
+    assert entries["What is the treatment for diabetes?"] == "treatment"
+    assert entries["Who is at risk for migraine headaches?"] == "general_info"
+    assert all(entries[question] == SYSTEM_FLOW_TYPE for question in SYSTEM_FLOW_QUESTIONS)
+
+
+def test_followup_bank_suggests_one_question_per_q_type_first(bank):
+    suggestions = suggest(bank, "What are the symptoms of diabetes?", DIABETES_ANSWER)
+
+    # The question just asked is never suggested back
+    assert suggestions == [
+        {"text": "What is the treatment for diabetes?", "type": "treatment"},
+        {"text": "How can diabetes be prevented?", "type": "prevention"},
+        {"text": "What are the symptoms of migraine headaches?", "type": "symptoms"},
+    ]
+
+
+def test_followup_bank_skips_questions_already_asked(bank):
+    suggestions = suggest(
+        bank, "What are the symptoms of diabetes?", DIABETES_ANSWER, asked=["what is the treatment for DIABETES"]
+    )
+
+    texts = [suggestion["text"] for suggestion in suggestions]
+    assert "What is the treatment for diabetes?" not in texts
+    assert texts[0] == "How can diabetes be prevented?"
+
+
+def test_followup_bank_defers_to_the_llm_without_a_close_entry(registry, bank_path):
+    bank = FollowUpBank(registry, HashingEmbeddings(), directory=bank_path, min_similarity=0.75)
+
+    assert suggest(bank, "Tell me a joke", "Why did the chicken cross the road?") is None
+    assert bank.stats()["misses"] == 1
+
+
+def test_followup_bank_defers_to_the_llm_without_a_bank(registry, tmp_path):
+    bank = FollowUpBank(registry, HashingEmbeddings(), directory=str(tmp_path / "missing"))
+
+    assert suggest(bank, "What are the symptoms of diabetes?", DIABETES_ANSWER) is None
+
+
+class CountingBank:
+    def __init__(self, suggestions):
+        self.suggestions = suggestions
+        self.calls = []
+
+    async def asuggest(self, question, response, asked=()):
+        self.calls.append(list(asked))
+        return self.suggestions
+
+
+@pytest.fixture
+def backend_module(offline_config, monkeypatch):
+    pytest.importorskip("fastapi")
+    module = importlib.import_module("backend")
+    monkeypatch.setattr(module, "cache", InMemoryCacheBackend())
+    return module
+
+
+def test_bank_suggestions_are_shared_per_turn_and_asked_questions(backend_module, monkeypatch):
+    bank = CountingBank([{"text": "How can diabetes be prevented?", "type": "prevention"}])
+    monkeypatch.setattr(backend_module, "followup_bank", bank)
+
+    async def scenario():
+        first_user = await backend_module.generate_suggested_questions("q", "a", [("user", "earlier")])
+        second_user = await backend_module.generate_suggested_questions("q", "a", [("user", "earlier")])
+        other_history = await backend_module.generate_suggested_questions("q", "a", [("user", "different")])
+        return first_user, second_user, other_history
+
+    first_user, second_user, other_history = asyncio.run(scenario())
+
+    assert first_user == second_user == other_history == bank.suggestions
+    # Turns with other questions already asked are looked up again, with their own exclusions
+    assert bank.calls == [["earlier"], ["different"]]
+
+
+def test_llm_suggestions_are_never_shared(backend_module, monkeypatch):
+    bank = CountingBank(None)
+    generated = []
+
+    async def generate_llm_suggested_questions(question, response, recent_messages=None):
+        generated.append(recent_messages)
+        return [{"text": f"about {recent_messages[0][1]}"}]
+
+    monkeypatch.setattr(backend_module, "followup_bank", bank)
+    monkeypatch.setattr(backend_module, "generate_llm_suggested_questions", generate_llm_suggested_questions)
+
+    async def scenario():
+        return [
+            await backend_module.generate_suggested_questions("q", "a", [("user", "my private history")]),
+            await backend_module.generate_suggested_questions("q", "a", [("user", "my private history")]),
+        ]
+
+    assert asyncio.run(scenario()) == [[{"text": "about my private history"}]] * 2
+    assert len(generated) == 2
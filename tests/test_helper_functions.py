@@ -0,0 +1,37 @@
+"""
+Tests of the local query helpers that run without the LLM or the databases.
+
+Usage:
+    python -m pytest tests
+"""
+import pytest
+
+pytest.importorskip("langchain")
+
+from Workflow.utils.helper_functions import detect_query_intent
+
+
+@pytest.mark.parametrize("question, intent", [
+    # Plain lookups of the user's own data; prepositions alone are not filters
+    ("Show me my payments", "SIMPLE"),
+    ("What is my name?", "SIMPLE"),
+    ("Show payments for my account", "SIMPLE"),
+    ("What are my notifications on the app?", "SIMPLE"),
+    ("اعرض مدفوعاتي", "SIMPLE"),
+    # Conditions on column values
+    ("Show payments over 500", "FILTERING"),
+    ("Payments between 100 and 200", "FILTERING"),
+    ("Which appointments are pending?", "FILTERING"),
+    ("Show appointments after 2024-01-01", "FILTERING"),
+    ("Show my appointments this week", "FILTERING"),
+    ("Show my unread notifications", "FILTERING"),
+    ("Doctors with a rating above 4", "FILTERING"),
+    ("المدفوعات أكثر من 500", "FILTERING"),
+    # The other categories take precedence
+    ("How many appointments do I have?", "AGGREGATION"),
+    ("Show my latest payments", "SORTING"),
+    ("Show appointments per doctor", "GROUPING"),
+    ("Show my payments and appointments", "JOINING"),
+])
+def test_detect_query_intent(question, intent):
+    assert detect_query_intent(question) == intent
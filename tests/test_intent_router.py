@@ -0,0 +1,109 @@
+"""
+Tests of the embedding-based intent router.
+
+Usage:
+    python -m pytest tests
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from benchmarks.fakes import HashingEmbeddings
+from Workflow.utils.intent_router import INTENT_EXEMPLARS, IntentRouter
+
+VOCABULARY = ["appointment", "doctor", "symptom", "weather", "book"]
+
+
+class KeywordEmbeddings:
+    """Embeds a text as its counts of the vocabulary words, so similarities are easy to reason about."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.document_calls = 0
+
+    def _embed(self, text):
+        if self.fail:
+            raise RuntimeError("embedding service unavailable")
+        words = text.lower().replace("?", "").split()
+        return [float(words.count(word)) for word in VOCABULARY]
+
+    async def aembed_documents(self, texts):
+        self.document_calls += 1
+        await asyncio.sleep(0)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return self._embed(text)
+
+
+EXEMPLARS = {
+    "query_related": ["show my appointment", "appointment doctor"],
+    "medical_related": ["symptom"],
+    "out_of_scope": ["weather"],
+}
+
+
+def route(router, question):
+    return asyncio.run(router.aroute(question))
+
+
+def test_intent_router_routes_confident_matches():
+    router = IntentRouter(KeywordEmbeddings(), EXEMPLARS)
+
+    assert route(router, "When is my appointment?") == "query_related"
+    assert route(router, "symptom symptom") == "medical_related"
+
+
+def test_intent_router_scores_a_category_by_its_nearest_exemplar():
+    router = IntentRouter(KeywordEmbeddings(), EXEMPLARS, min_similarity=0.9)
+
+    # Exactly matches the second exemplar, though far from the first
+    assert route(router, "appointment doctor") == "query_related"
+
+
+def test_intent_router_defers_below_the_minimum_similarity():
+    router = IntentRouter(KeywordEmbeddings(), EXEMPLARS, min_similarity=0.99)
+
+    # Cosine similarity of 0.98 to "appointment doctor"
+    assert route(router, "appointment appointment appointment doctor doctor") is None
+
+
+def test_intent_router_defers_when_categories_are_too_close():
+    router = IntentRouter(KeywordEmbeddings(), EXEMPLARS, margin=0.05, min_similarity=0.1)
+
+    # Equally similar to "symptom" and "weather"
+    assert route(router, "symptom weather") is None
+
+
+def test_intent_router_defers_on_unknown_questions():
+    router = IntentRouter(KeywordEmbeddings(), EXEMPLARS)
+
+    assert route(router, "tell me a joke") is None
+
+
+def test_intent_router_defers_when_embedding_fails():
+    router = IntentRouter(KeywordEmbeddings(fail=True), EXEMPLARS)
+
+    assert route(router, "When is my appointment?") is None
+
+
+def test_intent_router_embeds_the_exemplars_once():
+    embeddings = KeywordEmbeddings()
+    router = IntentRouter(embeddings, EXEMPLARS)
+
+    async def route_concurrently():
+        return await asyncio.gather(*(router.aroute("my appointment") for _ in range(5)))
+
+    assert asyncio.run(route_concurrently()) == ["query_related"] * 5
+    route(router, "symptom")
+    assert embeddings.document_calls == 1
+
+
+@pytest.mark.parametrize("category", sorted(INTENT_EXEMPLARS))
+def test_intent_router_routes_the_default_exemplars_to_their_category(category):
+    router = IntentRouter(HashingEmbeddings(), INTENT_EXEMPLARS)
+
+    for question in INTENT_EXEMPLARS[category]:
+        assert route(router, question) == category
@@ -0,0 +1,125 @@
+"""
+Tests of the workflow nodes, run offline with the stand-ins from benchmarks/.
+
+The chat model and embeddings are the deterministic fakes used by the load
+test and SQL Server is its SQLite stand-in, so write_and_execute_query runs
+end to end, from prompt building to query execution, without network access.
+
+Usage:
+    python -m pytest tests
+"""
+import asyncio
+import importlib
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.fakes import FakeChatModel, HashingEmbeddings
+from benchmarks.sqlserver_standin import SqliteConnection, build_database
+
+
+@pytest.fixture(scope="module")
+def workdir(tmp_path_factory):
+    return tmp_path_factory.mktemp("nodes")
+
+
+@pytest.fixture(scope="module")
+def sqlite_path(workdir):
+    path = str(workdir / "mosefak_app.db")
+    build_database(path, scale=0.1)
+    return path
+
+
+@pytest.fixture(scope="module")
+def nodes_module(offline_config):
+    return importlib.import_module("Workflow.utils.nodes")
+
+
+@pytest.fixture
+def nodes(nodes_module, sqlite_path, workdir, monkeypatch):
+    from Workflow.utils.doctor_directory import DoctorDirectory
+    from Workflow.utils.sql_cache import SemanticSQLCache
+    from Workflow.utils.sql_server_pool import SqlServerConnectionPool
+
+    pool = SqlServerConnectionPool(connect=lambda: SqliteConnection(sqlite_path), min_size=0, max_size=2)
+    embeddings = HashingEmbeddings()
+
+    monkeypatch.setattr(nodes_module, "llm", FakeChatModel(latency=0.0))
+    monkeypatch.setattr(nodes_module, "mosefak_app_pool", pool)
+    monkeypatch.setattr(nodes_module, "doctor_directory", DoctorDirectory(pool, embeddings, directory=str(workdir / "doctor_index")))
+    monkeypatch.setattr(nodes_module, "sql_cache", SemanticSQLCache(embeddings))
+    return nodes_module
+
+
+def make_state(*messages, role="Patient", user_id="7"):
+    return {"messages": list(messages), "payload": {"role": role, "user_id": user_id}}
+
+
+def test_write_and_execute_query_runs_generated_sql(nodes):
+    state = make_state(HumanMessage(content="Show me my payments", id="1"))
+
+    result = asyncio.run(nodes.write_and_execute_query(state))
+
+    assert "error" not in result, result
+    assert "Payments" in result["SQLQuery"]
+    assert nodes.sql_cache.stats()["stores"] == 1
+
+
+def test_write_and_execute_query_reuses_cached_sql(nodes):
+    first = asyncio.run(nodes.write_and_execute_query(make_state(HumanMessage(content="Show me my payments", id="1"))))
+
+    result = asyncio.run(nodes.write_and_execute_query(
+        make_state(HumanMessage(content="show me my payments?", id="2"), user_id="8")
+    ))
+
+    assert "error" not in result, result
+    assert first["SQLQuery"].endswith("WHERE a.PatientId = 7")
+    assert result["SQLQuery"] == first["SQLQuery"][:-len("7")] + "8"
+    assert nodes.sql_cache.stats()["exact_hits"] == 1
+
+
+def test_write_and_execute_query_standalone_question_in_thread_uses_sql_cache(nodes):
+    asyncio.run(nodes.write_and_execute_query(make_state(HumanMessage(content="Show me my payments", id="1"))))
+    state = make_state(
+        HumanMessage(content="Show me my appointments", id="1"),
+        AIMessage(content="You have 3 upcoming appointments.", id="2"),
+        HumanMessage(content="Show me my payments", id="3"),
+    )
+
+    result = asyncio.run(nodes.write_and_execute_query(state))
+
+    assert "error" not in result, result
+    assert nodes.sql_cache.stats()["exact_hits"] == 1
+
+
+def test_write_and_execute_query_follow_up_skips_sql_cache(nodes):
+    state = make_state(
+        HumanMessage(content="Show me my appointments", id="1"),
+        AIMessage(content="You have 3 upcoming appointments.", id="2"),
+        HumanMessage(content="Show me my payments for them", id="3"),
+    )
+
+    result = asyncio.run(nodes.write_and_execute_query(state))
+
+    assert "error" not in result, result
+    assert nodes.sql_cache.stats()["stores"] == 0
+
+
+def test_summary_split_keeps_recent_turns_below_the_target(nodes):
+    from Workflow.utils.conversation import estimate_tokens, message_text
+
+    messages = []
+    for i in range(12):
+        messages += [HumanMessage(content=f"question {i} " * 20, id=f"h{i}"), AIMessage(content=f"answer {i} " * 200, id=f"a{i}")]
+    state = make_state(*messages)
+
+    split = nodes.summary_split(messages)
+    kept = messages[split:]
+
+    assert nodes.should_summarize(state) == "summarize_conversation"
+    assert kept[0].type == "human"
+    assert sum(estimate_tokens(message_text(message)) for message in kept) <= nodes.CONVERSATION_SUMMARY_TARGET_TOKENS
+    assert nodes.should_summarize(make_state(*kept)) != "summarize_conversation"
@@ -0,0 +1,206 @@
+"""
+Tests of the keyset pagination of /chat and /chats, run against Postgres.
+
+The endpoint functions are called directly with a decoded token payload; the
+tables come from the schema script in "Data Prepration".
+
+Usage:
+    python -m pytest tests
+"""
+import asyncio
+import importlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("fastapi")
+psycopg_pool = pytest.importorskip("psycopg_pool")
+
+from Workflow.utils.cache_backends import InMemoryCacheBackend
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "Data Prepration", "create_chat_messages_schemas.sql")
+PAYLOAD = {"user_id": "7", "role": "Patient"}
+START = datetime(2026, 1, 1, 12, 0)
+
+
+@pytest.fixture(scope="module")
+def backend_module(offline_config):
+    return importlib.import_module("backend")
+
+
+@pytest.fixture
+def run(backend_module, postgres_uri, monkeypatch):
+    """Run a scenario on a fresh schema, with the app's pool and cache pointed at the test database."""
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        schema = f.read()
+    monkeypatch.setattr(backend_module, "cache", InMemoryCacheBackend())
+
+    def run(scenario, *args):
+        async def main():
+            async with psycopg_pool.AsyncConnectionPool(postgres_uri, kwargs={"autocommit": True}) as pool:
+                monkeypatch.setattr(backend_module, "postgres_pool", pool)
+                async with pool.connection() as conn:
+                    await conn.execute(schema)
+                return await scenario(pool, *args)
+
+        return asyncio.run(main())
+
+    return run
+
+
+async def add_thread(pool, thread_id, user_id="7", updated_at=START, messages=0):
+    async with pool.connection() as conn:
+        await conn.execute(
+            "INSERT INTO chat_threads (thread_id, user_id, chat_name, last_updated_at) VALUES (%s, %s, %s, %s)",
+            (thread_id, user_id, thread_id, updated_at)
+        )
+        for i in range(messages):
+            await conn.execute(
+                "INSERT INTO chat_messages (thread_id, role, content) VALUES (%s, %s, %s)",
+                (thread_id, "user" if i % 2 == 0 else "assistant", f"message {i + 1}")
+            )
+
+
+def test_chats_cursor_round_trip(backend_module):
+    cursor = backend_module.encode_chats_cursor(START, "7/a")
+
+    assert backend_module.decode_chats_cursor(cursor) == (START, "7/a")
+    # Plain timestamps from older clients carry no thread_id
+    assert backend_module.decode_chats_cursor(START.isoformat()) == (START, None)
+    with pytest.raises(ValueError):
+        backend_module.decode_chats_cursor("not a cursor")
+
+
+def test_chat_history_pages_both_ways(backend_module, run):
+    async def scenario(pool):
+        await add_thread(pool, "7/a", messages=25)
+
+        async def page(cursor=None, direction="before"):
+            request = backend_module.ChatHistoryRequest(thread_id="7/a", limit=10, cursor=cursor, direction=direction)
+            result = await backend_module.get_chat_history(request, PAYLOAD)
+            return [message["message_id"] for message in result["history"]], result["pagination"]
+
+        return [
+            await page(),
+            await page(16),
+            await page(6),
+            await page(5, "after"),
+            await page(20, "after"),
+        ]
+
+    (first, first_meta), (second, second_meta), (last, last_meta), (newer, newer_meta), (newest, newest_meta) = run(scenario)
+
+    assert first == list(range(25, 15, -1))
+    assert (first_meta["has_more_before"], first_meta["has_more_after"], first_meta["next_cursor"]) == (True, False, 16)
+    assert first_meta["total_count"] == 25
+
+    assert second == list(range(15, 5, -1))
+    assert (second_meta["has_more_before"], second_meta["has_more_after"]) == (True, True)
+    assert (second_meta["next_cursor"], second_meta["prev_cursor"]) == (6, 15)
+
+    assert last == [5, 4, 3, 2, 1]
+    assert (last_meta["has_more_before"], last_meta["has_more_after"], last_meta["next_cursor"]) == (False, True, None)
+
+    # "after" pages are returned newest first too
+    assert newer == list(range(15, 5, -1))
+    assert (newer_meta["has_more_before"], newer_meta["has_more_after"]) == (True, True)
+
+    assert newest == [25, 24, 23, 22, 21]
+    assert (newest_meta["has_more_before"], newest_meta["has_more_after"]) == (True, False)
+
+
+def test_chat_history_has_more_after_reflects_the_thread(backend_module, run):
+    async def scenario(pool):
+        await add_thread(pool, "7/a", messages=5)
+
+        async def pagination(cursor, direction):
+            request = backend_module.ChatHistoryRequest(thread_id="7/a", limit=10, cursor=cursor, direction=direction)
+            return (await backend_module.get_chat_history(request, PAYLOAD))["pagination"]
+
+        return await pagination(100, "before"), await pagination(1, "before"), await pagination(0, "after")
+
+    past_the_end, empty_page, from_the_start = run(scenario)
+
+    # Nothing exists at or after a cursor past the newest message
+    assert (past_the_end["has_more_before"], past_the_end["has_more_after"]) == (False, False)
+    # An empty page still probes the other side of the cursor
+    assert (empty_page["has_more_before"], empty_page["has_more_after"]) == (False, True)
+    assert empty_page["total_count"] == 5
+    assert (from_the_start["has_more_before"], from_the_start["has_more_after"]) == (False, False)
+
+
+def test_chat_history_rejects_other_users_threads(backend_module, run):
+    async def scenario(pool):
+        await add_thread(pool, "8/a", user_id="8", messages=2)
+        await backend_module.get_chat_history(backend_module.ChatHistoryRequest(thread_id="8/a"), PAYLOAD)
+
+    with pytest.raises(backend_module.HTTPException) as error:
+        run(scenario)
+    assert error.value.status_code == 403
+
+
+def test_chats_pages_through_every_thread_once_with_ties(backend_module, run):
+    async def scenario(pool):
+        # Two pairs of threads share their last_updated_at
+        for i, offset in enumerate([0, 1, 1, 2, 3, 3, 4]):
+            await add_thread(pool, f"7/{i}", updated_at=START + timedelta(minutes=offset))
+        await add_thread(pool, "8/x", user_id="8", updated_at=START + timedelta(minutes=10))
+
+        pages, cursor = [], None
+        while True:
+            request = backend_module.ChatsListRequest(limit=2, cursor=cursor)
+            result = await backend_module.get_user_chats(request, PAYLOAD)
+            pages.append(result)
+            cursor = result["pagination"]["next_cursor"]
+            if cursor is None:
+                return pages
+
+    pages = run(scenario)
+
+    thread_ids = [chat["thread_id"] for page in pages for chat in page["chats"]]
+    assert thread_ids == ["7/6", "7/5", "7/4", "7/3", "7/2", "7/1", "7/0"]
+    assert [page["pagination"]["has_more_before"] for page in pages] == [True, True, True, False]
+    assert {page["pagination"]["total_count"] for page in pages} == {7}
+
+
+def test_chats_accepts_legacy_timestamp_cursors(backend_module, run):
+    async def scenario(pool):
+        for i in range(3):
+            await add_thread(pool, f"7/{i}", updated_at=START + timedelta(minutes=i))
+        cursor = (START + timedelta(minutes=2)).isoformat()
+        return await backend_module.get_user_chats(backend_module.ChatsListRequest(cursor=cursor), PAYLOAD)
+
+    result = run(scenario)
+
+    assert [chat["thread_id"] for chat in result["chats"]] == ["7/1", "7/0"]
+
+
+def test_chats_rejects_invalid_cursors(backend_module, run):
+    async def scenario(pool):
+        await backend_module.get_user_chats(backend_module.ChatsListRequest(cursor="not a cursor"), PAYLOAD)
+
+    with pytest.raises(backend_module.HTTPException) as error:
+        run(scenario)
+    assert error.value.status_code == 400
+
+
+def test_chats_list_reflects_a_new_turn_once_invalidated(backend_module, run):
+    async def scenario(pool):
+        for i in range(3):
+            await add_thread(pool, f"7/{i}", updated_at=START + timedelta(minutes=i))
+
+        async def first_chat():
+            result = await backend_module.get_user_chats(backend_module.ChatsListRequest(), PAYLOAD)
+            return result["chats"][0]["thread_id"]
+
+        before = await first_chat()
+        await backend_module.commit_turn("7/0", "question", "answer")
+        cached = await first_chat()
+        # What /ask and the streaming path do after commit_turn
+        await backend_module.invalidate_cache("7", "chats")
+        return before, cached, await first_chat()
+
+    before, cached, after = run(scenario)
+
+    assert (before, cached, after) == ("7/2", "7/2", "7/0")
@@ -0,0 +1,113 @@
+"""
+Tests of the schema index that prunes the SQL prompt to the relevant tables.
+
+Usage:
+    python -m pytest tests
+"""
+from Workflow.utils.schema_index import SchemaIndex, get_schema_index, load_relevant_tables_info
+from Workflow.utils.tables_info import load_tables_info
+
+TABLES_INFO = """
+CREATE TABLE [db1].[dbo].[Doctors] (
+    [Id] int NOT NULL,
+    [AppUserId] int NOT NULL,
+    [LicenseNumber] nvarchar(50) NOT NULL,
+    [LastUpdatedTime] datetimeoffset NULL,
+    CONSTRAINT [PK_Doctors] PRIMARY KEY ([Id])
+);
+
+CREATE TABLE [db1].[dbo].[Appointments] (
+    [Id] int NOT NULL,
+    [DoctorId] int NOT NULL,
+    [PatientId] int NOT NULL,
+    [StartDate] datetimeoffset NOT NULL,
+    CONSTRAINT [PK_Appointments] PRIMARY KEY ([Id]),
+    CONSTRAINT [FK_Appointments_Doctors] FOREIGN KEY ([DoctorId]) REFERENCES [db1].[dbo].[Doctors] ([Id])
+);
+
+CREATE TABLE [db1].[dbo].[Payments] (
+    [Id] int NOT NULL,
+    [AppointmentId] int NOT NULL,
+    [Amount] decimal(10,2) NOT NULL,
+    CONSTRAINT [PK_Payments] PRIMARY KEY ([Id]),
+    CONSTRAINT [FK_Payments_Appointments] FOREIGN KEY ([AppointmentId]) REFERENCES [db1].[dbo].[Appointments] ([Id])
+);
+
+## Private
+CREATE TABLE [db2].[Security].[Users] (
+    [Id] int NOT NULL,
+    [FirstName] nvarchar(100) NOT NULL,
+    [PasswordHash] nvarchar(max) NULL,
+    CONSTRAINT [PK_Users] PRIMARY KEY ([Id])
+);
+"""
+
+
+def test_schema_index_parses_tables_keys_and_references():
+    index = SchemaIndex(TABLES_INFO)
+
+    assert list(index.tables) == ["Doctors", "Appointments", "Payments", "Users"]
+    payments = index.tables["Payments"]
+    assert payments.qualified_name == "[db1].[dbo].[Payments]"
+    assert payments.primary_key == ["Id"]
+    assert payments.foreign_keys == [("AppointmentId", "Appointments", "Id")]
+    assert index.tables["Users"].private and not payments.private
+    # User id columns link to Users without a declared foreign key
+    assert ("PatientId", "Users", "Id", True) in list(index.tables["Appointments"].references())
+
+
+def test_schema_index_selects_matching_tables_and_their_references():
+    index = SchemaIndex(TABLES_INFO)
+
+    assert index.select_tables("Show me my payments") == ["Appointments", "Payments"]
+
+
+def test_schema_index_adds_the_tables_joining_the_selected_ones():
+    index = SchemaIndex(TABLES_INFO)
+
+    # Payments reach Doctors only through Appointments
+    assert index.select_tables("payment amount and doctor license number") == [
+        "Doctors", "Appointments", "Payments", "Users"
+    ]
+
+
+def test_schema_index_matches_synonyms_in_english_and_arabic():
+    index = SchemaIndex(TABLES_INFO)
+
+    assert "Appointments" in index.select_tables("When is my next booking?")
+    assert "Appointments" in index.select_tables("ما هي مواعيدي")
+
+
+def test_schema_index_keeps_the_tables_of_earlier_questions_for_follow_ups():
+    index = SchemaIndex(TABLES_INFO)
+
+    assert index.select_tables("which one is the largest?") == []
+    assert "Payments" in index.select_tables("which one is the largest?", history="Show me my payments")
+
+
+def test_schema_index_compact_schema_drops_audit_columns_and_keeps_join_hints():
+    schema = SchemaIndex(TABLES_INFO).compact_schema("doctor license number")
+
+    assert schema.startswith("[db1].[dbo].[Doctors] (Id int PK, AppUserId int, LicenseNumber nvarchar(50))")
+    assert "LastUpdatedTime" not in schema
+    assert "  -- AppUserId -> [db2].[Security].[Users].[Id]" in schema
+    # Private tables keep their marker, so the prompt's privacy rules still apply
+    assert "## Private\n[db2].[Security].[Users]" in schema
+
+
+def test_schema_index_returns_none_when_nothing_matches():
+    assert SchemaIndex(TABLES_INFO).compact_schema("hello there") is None
+
+
+def test_relevant_tables_info_prunes_the_role_schema_and_falls_back_to_it():
+    full = load_tables_info(role="Patient")
+
+    pruned = load_relevant_tables_info("Patient", "Show me my payments")
+    assert "[Payments]" in pruned and "[Reviews]" not in pruned
+    assert len(pruned) < len(full)
+
+    assert load_relevant_tables_info("Patient", "hello there") == full
+
+
+def test_schema_index_is_shared_per_schema():
+    assert get_schema_index("Patient") is get_schema_index("Patient")
@@ -0,0 +1,211 @@
+"""
+Tests of the SQL Server connection pool, with in-memory stand-in connections.
+
+Usage:
+    python -m pytest tests
+"""
+import threading
+import time
+
+import pytest
+
+pyodbc = pytest.importorskip("pyodbc")
+
+from Workflow.utils import sql_server_pool
+from Workflow.utils.sql_server_pool import PoolTimeout, SqlServerConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query):
+        if self.conn.broken:
+            raise pyodbc.OperationalError("08S01", "Communication link failure")
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+        self.rollbacks = 0
+        self.timeout = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def make_pool(opened, monkeypatch):
+    # Retries back off without sleeping
+    monkeypatch.setattr(sql_server_pool.time, "sleep", lambda seconds: None)
+
+    def connect():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    def make_pool(**kwargs):
+        kwargs.setdefault("min_size", 0)
+        return SqlServerConnectionPool(connect=connect, **kwargs)
+
+    return make_pool
+
+
+def test_pool_reuses_idle_connections(make_pool, opened):
+    pool = make_pool(max_size=2)
+
+    first = pool.run(lambda conn: conn)
+    second = pool.run(lambda conn: conn)
+
+    assert first is second
+    assert len(opened) == 1
+    assert first.rollbacks == 2
+    assert pool.stats()["checkouts"] == 2
+
+
+def test_pool_opens_min_size_connections_up_front(make_pool, opened):
+    pool = make_pool(min_size=2, max_size=4, query_timeout=15)
+
+    assert pool.stats()["idle"] == 2
+    assert [conn.timeout for conn in opened] == [15, 15]
+
+
+def test_pool_checkout_times_out_when_full(make_pool):
+    pool = make_pool(max_size=1, checkout_timeout=0.05)
+    pool.getconn()
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+
+def test_pool_hands_a_returned_connection_to_a_waiter(make_pool):
+    pool = make_pool(max_size=1, checkout_timeout=5)
+    conn = pool.getconn()
+    received = []
+
+    waiter = threading.Thread(target=lambda: received.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.putconn(conn)
+    waiter.join(5)
+
+    assert received == [conn]
+
+
+def test_pool_replaces_unhealthy_idle_connections(make_pool, opened):
+    pool = make_pool(health_check_interval=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+
+    replacement = pool.getconn()
+
+    assert replacement is not conn and conn.closed
+    assert pool.stats()["connections_discarded"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_pool_discards_connections_that_raised_connection_errors(make_pool):
+    pool = make_pool()
+
+    with pytest.raises(pyodbc.OperationalError):
+        with pool.connection() as conn:
+            raise pyodbc.OperationalError("08S01", "Communication link failure")
+
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+
+
+def test_pool_keeps_connections_after_query_errors(make_pool):
+    pool = make_pool()
+
+    with pytest.raises(pyodbc.Error):
+        with pool.connection() as conn:
+            raise pyodbc.Error("42S02", "Invalid object name")
+
+    assert not conn.closed
+    assert pool.stats()["idle"] == 1
+
+
+def test_pool_run_retries_transient_errors_on_a_fresh_connection(make_pool, opened):
+    pool = make_pool(max_retries=2)
+    attempts = []
+
+    def operation(conn):
+        attempts.append(conn)
+        if len(attempts) == 1:
+            raise pyodbc.OperationalError("08S01", "Communication link failure")
+        return "rows"
+
+    assert pool.run(operation) == "rows"
+    assert attempts[0] is not attempts[1]
+    assert pool.stats()["retries"] == 1
+
+
+def test_pool_run_retries_deadlocks_up_to_max_retries(make_pool):
+    pool = make_pool(max_retries=2)
+    attempts = []
+
+    def operation(conn):
+        attempts.append(conn)
+        raise pyodbc.Error("40001", "Transaction was deadlocked")
+
+    with pytest.raises(pyodbc.Error):
+        pool.run(operation)
+    assert len(attempts) == 3
+
+
+def test_pool_run_does_not_retry_query_errors(make_pool):
+    pool = make_pool(max_retries=2)
+    attempts = []
+
+    def operation(conn):
+        attempts.append(conn)
+        raise pyodbc.Error("42S02", "Invalid object name")
+
+    with pytest.raises(pyodbc.Error):
+        pool.run(operation)
+    assert len(attempts) == 1
+
+
+def test_pool_failed_connect_frees_its_slot():
+    def connect():
+        raise pyodbc.OperationalError("08001", "Server not found")
+
+    pool = SqlServerConnectionPool(connect=connect, min_size=1, max_size=1, checkout_timeout=0.05)
+
+    for _ in range(2):
+        with pytest.raises(pyodbc.OperationalError):
+            pool.getconn()
+    assert pool.stats()["size"] == 0
+
+
+def test_pool_close_rejects_checkouts_and_closes_returned_connections(make_pool):
+    pool = make_pool()
+    idle, busy = pool.getconn(), pool.getconn()
+    pool.putconn(idle)
+
+    pool.close()
+    pool.putconn(busy)
+
+    assert idle.closed and busy.closed
+    with pytest.raises(RuntimeError):
+        pool.getconn()